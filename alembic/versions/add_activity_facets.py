@@ -0,0 +1,163 @@
+"""add_activity_facets"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers
+revision = 'add_activity_facets'
+down_revision = 'add_organization_building_index'
+branch_labels = None
+depends_on = None
+
+# Ячейки зданий, затронутых изменёнными строками таблицы переходов {rows}
+LINK_CELLS = """
+    SELECT b.grid_cell FROM {rows} r
+    JOIN organizations o ON o.id = r.organization_id
+    JOIN buildings b ON b.id = o.building_id
+"""
+ORGANIZATION_CELLS = """
+    SELECT b.grid_cell FROM {rows} r
+    JOIN buildings b ON b.id = r.building_id
+"""
+# Организации со сменой здания (имя и прочие поля фасеты не меняют)
+MOVED_ORGANIZATION_CELLS = """
+    SELECT b.grid_cell FROM old_rows o
+    JOIN new_rows n ON n.id = o.id AND n.building_id IS DISTINCT FROM o.building_id
+    JOIN buildings b ON b.id IN (o.building_id, n.building_id)
+"""
+# Здания со сменой ячейки, в которых есть организации
+MOVED_BUILDING_CELLS = """
+    SELECT c.grid_cell FROM old_rows o
+    JOIN new_rows n ON n.id = o.id AND n.grid_cell IS DISTINCT FROM o.grid_cell
+    CROSS JOIN LATERAL (VALUES (o.grid_cell), (n.grid_cell)) AS c(grid_cell)
+    WHERE EXISTS (SELECT 1 FROM organizations org WHERE org.building_id = o.id)
+"""
+ALL_CELLS = """
+    SELECT b.grid_cell FROM buildings b
+    WHERE EXISTS (SELECT 1 FROM organizations o WHERE o.building_id = b.id)
+"""
+
+MARK = """
+        INSERT INTO facet_dirty_cells (grid_cell)
+        SELECT DISTINCT grid_cell FROM ({cells}) AS cells WHERE grid_cell IS NOT NULL
+        ON CONFLICT DO NOTHING;
+"""
+
+# Триггеры уровня оператора с таблицами переходов: массовая загрузка
+# помечает ячейки одним INSERT на оператор, а не на каждую строку
+TRIGGERS = [
+    # (таблица, функция, событие, таблицы переходов)
+    ('organization_activity', 'facets_mark_links', 'INSERT', 'NEW TABLE AS new_rows'),
+    ('organization_activity', 'facets_mark_links', 'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+    ('organization_activity', 'facets_mark_links', 'DELETE', 'OLD TABLE AS old_rows'),
+    ('organizations', 'facets_mark_organizations', 'INSERT', 'NEW TABLE AS new_rows'),
+    ('organizations', 'facets_mark_organizations', 'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+    ('organizations', 'facets_mark_organizations', 'DELETE', 'OLD TABLE AS old_rows'),
+    ('buildings', 'facets_mark_buildings', 'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+]
+TRUNCATED_TABLES = ['organization_activity', 'organizations', 'buildings']
+
+
+def upgrade():
+    op.create_table('activity_cell_counts',
+        sa.Column('grid_cell', sa.Integer(), nullable=False),
+        sa.Column('activity_id', sa.Integer(), nullable=False),
+        sa.Column('organizations', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('grid_cell', 'activity_id')
+    )
+    op.create_table('facet_dirty_cells',
+        sa.Column('grid_cell', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('grid_cell')
+    )
+
+    op.execute(f"""
+    CREATE OR REPLACE FUNCTION facets_mark_links() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            {MARK.format(cells=LINK_CELLS.format(rows='new_rows'))}
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            {MARK.format(cells=LINK_CELLS.format(rows='old_rows'))}
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """)
+    op.execute(f"""
+    CREATE OR REPLACE FUNCTION facets_mark_organizations() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            {MARK.format(cells=ORGANIZATION_CELLS.format(rows='new_rows'))}
+        ELSIF TG_OP = 'DELETE' THEN
+            {MARK.format(cells=ORGANIZATION_CELLS.format(rows='old_rows'))}
+        ELSE
+            {MARK.format(cells=MOVED_ORGANIZATION_CELLS)}
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """)
+    op.execute(f"""
+    CREATE OR REPLACE FUNCTION facets_mark_buildings() RETURNS trigger AS $$
+    BEGIN
+        {MARK.format(cells=MOVED_BUILDING_CELLS)}
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """)
+    # Перестройка дерева видов деятельности меняет счётчики предков везде
+    op.execute(f"""
+    CREATE OR REPLACE FUNCTION facets_mark_all() RETURNS trigger AS $$
+    BEGIN
+        {MARK.format(cells=ALL_CELLS)}
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """)
+    # После TRUNCATE связей или организаций не остаётся ни одной связи — счётчики пусты
+    op.execute("""
+    CREATE OR REPLACE FUNCTION facets_reset() RETURNS trigger AS $$
+    BEGIN
+        DELETE FROM activity_cell_counts;
+        DELETE FROM facet_dirty_cells;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """)
+
+    for table, function, event, transitions in TRIGGERS:
+        op.execute(f"""
+        CREATE TRIGGER {table}_facets_{event.lower()}
+        AFTER {event} ON {table}
+        REFERENCING {transitions}
+        FOR EACH STATEMENT EXECUTE FUNCTION {function}()
+        """)
+    op.execute("""
+    CREATE TRIGGER activities_facets
+    AFTER UPDATE OF parent_id OR DELETE ON activities
+    FOR EACH STATEMENT EXECUTE FUNCTION facets_mark_all()
+    """)
+    for table in TRUNCATED_TABLES:
+        op.execute(f"""
+        CREATE TRIGGER {table}_facets_truncate
+        AFTER TRUNCATE ON {table}
+        FOR EACH STATEMENT EXECUTE FUNCTION facets_reset()
+        """)
+
+    # Начальное заполнение: все ячейки с организациями грязные, фоновый
+    # пересчёт (FACETS_REFRESH_INTERVAL) заполнит activity_cell_counts
+    op.execute(MARK.format(cells=ALL_CELLS))
+
+
+def downgrade():
+    for table in TRUNCATED_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_facets_truncate ON {table}")
+    op.execute("DROP TRIGGER IF EXISTS activities_facets ON activities")
+    for table, _, event, _ in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_facets_{event.lower()} ON {table}")
+    for function in ['facets_reset', 'facets_mark_all', 'facets_mark_buildings',
+                     'facets_mark_organizations', 'facets_mark_links']:
+        op.execute(f"DROP FUNCTION IF EXISTS {function}()")
+    op.drop_table('facet_dirty_cells')
+    op.drop_table('activity_cell_counts')
@@ -0,0 +1,55 @@
+"""add_building_grid_cell"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers
+revision = 'add_building_grid_cell'
+down_revision = 'add_test_data'
+branch_labels = None
+depends_on = None
+
+# Параметры сетки должны совпадать с app/repository/spatial.py
+CELLS_PER_DEGREE = 100
+ROWS = 180 * CELLS_PER_DEGREE
+COLUMNS = 360 * CELLS_PER_DEGREE
+
+GRID_CELL_EXPR = f"""(
+    LEAST(GREATEST(FLOOR(({{lat}} + 90) * {CELLS_PER_DEGREE}), 0), {ROWS - 1}) * {COLUMNS}
+    + LEAST(GREATEST(FLOOR(({{lon}} + 180) * {CELLS_PER_DEGREE}), 0), {COLUMNS - 1})
+)::integer"""
+
+
+def upgrade():
+    op.add_column('buildings', sa.Column('grid_cell', sa.Integer(), nullable=True))
+
+    # Ячейка сетки пересчитывается триггером при любой вставке или смене координат
+    op.execute(f"""
+    CREATE OR REPLACE FUNCTION buildings_set_grid_cell() RETURNS trigger AS $$
+    BEGIN
+        NEW.grid_cell := {GRID_CELL_EXPR.format(lat='NEW.latitude', lon='NEW.longitude')};
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+    CREATE TRIGGER buildings_grid_cell
+    BEFORE INSERT OR UPDATE OF latitude, longitude ON buildings
+    FOR EACH ROW EXECUTE FUNCTION buildings_set_grid_cell()
+    """)
+
+    op.execute(f"UPDATE buildings SET grid_cell = {GRID_CELL_EXPR.format(lat='latitude', lon='longitude')}")
+
+    op.create_index(
+        'ix_buildings_grid_cell_coords',
+        'buildings',
+        ['grid_cell', 'latitude', 'longitude']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_buildings_grid_cell_coords', table_name='buildings')
+    op.execute("DROP TRIGGER IF EXISTS buildings_grid_cell ON buildings")
+    op.execute("DROP FUNCTION IF EXISTS buildings_set_grid_cell()")
+    op.drop_column('buildings', 'grid_cell')
@@ -0,0 +1,19 @@
+"""add_organization_building_index"""
+
+from alembic import op
+
+
+# revision identifiers
+revision = 'add_organization_building_index'
+down_revision = 'sync_id_sequences'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Организации здания: /in_building и агрегат организаций в /in_rect?include=organizations
+    op.create_index('ix_organizations_building_id', 'organizations', ['building_id'])
+
+
+def downgrade():
+    op.drop_index('ix_organizations_building_id', table_name='organizations')
@@ -0,0 +1,27 @@
+"""add_organization_documents"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers
+revision = 'add_organization_documents'
+down_revision = 'add_activity_facets'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Таблица заполняется командой python -m app.cli.rebuild_documents:
+    # документы рендерятся той же схемой, что и ответ API
+    op.create_table('organization_documents',
+        sa.Column('organization_id', sa.Integer(), nullable=False),
+        sa.Column('building_id', sa.Integer(), nullable=False),
+        sa.Column('document', sa.Text(), nullable=False),
+        sa.Column('rendered_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('organization_id')
+    )
+
+
+def downgrade():
+    op.drop_table('organization_documents')
@@ -0,0 +1,35 @@
+"""add_trgm_indexes"""
+
+from alembic import op
+
+
+# revision identifiers
+revision = 'add_trgm_indexes'
+down_revision = 'add_building_grid_cell'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # GIN-индексы по триграммам обслуживают ILIKE '%...%', оператор % и similarity()
+    op.create_index(
+        'ix_organizations_name_trgm',
+        'organizations',
+        ['name'],
+        postgresql_using='gin',
+        postgresql_ops={'name': 'gin_trgm_ops'}
+    )
+    op.create_index(
+        'ix_activities_name_trgm',
+        'activities',
+        ['name'],
+        postgresql_using='gin',
+        postgresql_ops={'name': 'gin_trgm_ops'}
+    )
+
+
+def downgrade():
+    op.drop_index('ix_activities_name_trgm', table_name='activities')
+    op.drop_index('ix_organizations_name_trgm', table_name='organizations')
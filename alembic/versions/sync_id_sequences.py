@@ -0,0 +1,25 @@
+"""sync_id_sequences"""
+
+from alembic import op
+
+
+# revision identifiers
+revision = 'sync_id_sequences'
+down_revision = 'add_trgm_indexes'
+branch_labels = None
+depends_on = None
+
+TABLES = ['buildings', 'activities', 'organizations', 'phones']
+
+
+def upgrade():
+    # Тестовые данные вставлены с явными id, последовательности остались на 1
+    for table in TABLES:
+        op.execute(f"""
+            SELECT setval(pg_get_serial_sequence('{table}', 'id'), max(id))
+            FROM {table} HAVING max(id) IS NOT NULL
+        """)
+
+
+def downgrade():
+    pass
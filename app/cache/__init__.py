@@ -0,0 +1,4 @@
+from .tiered import TieredCache, response_cache
+from .keys import ORGANIZATION_NAMESPACE, key_builder, organization_key_builder, organization_cache_key
+from .serialization import RawJSON, encode_json, decode_json, json_response
+from .decorator import cached
@@ -0,0 +1,120 @@
+from email.utils import formatdate, parsedate_to_datetime
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.cache.tiered import make_etag
+from app.monitoring.context import current_stats
+from app.config import settings
+from typing import Dict, List, Optional
+
+JSON_MEDIA_TYPE = "application/json"
+
+# Заголовки, которые сохраняет ответ 304 (RFC 9110, 15.4.5)
+NOT_MODIFIED_HEADERS = {b"etag", b"last-modified", b"cache-control", b"vary", b"expires", b"date"}
+
+
+def validator_headers(etag: bytes, modified_at: float) -> Dict[str, str]:
+    """ETag и Last-Modified закешированного ответа"""
+    return {"ETag": etag.decode(), "Last-Modified": formatdate(modified_at, usegmt=True)}
+
+
+def cache_control() -> str:
+    return (
+        f"public, max-age={settings.HTTP_CACHE_MAX_AGE}, s-maxage={settings.HTTP_CACHE_SHARED_MAX_AGE}"
+    )
+
+
+def is_not_modified(request: Headers, etag: Optional[str], last_modified: Optional[str]) -> bool:
+    """Проверка условного запроса: If-None-Match приоритетнее If-Modified-Since"""
+    if_none_match = request.get("if-none-match")
+    if if_none_match is not None:
+        if etag is None:
+            return False
+        candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in candidates or etag.removeprefix("W/") in candidates
+
+    if_modified_since = request.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+
+class ConditionalGetMiddleware:
+    """Условные GET для /api/organizations: ETag, Last-Modified, Cache-Control и 304.
+
+    Закешированные ответы уже несут валидаторы из записи кеша (см. cached),
+    поэтому совпавший If-None-Match отвечается 304 без обращения к БД.
+    Прочим JSON-ответам (пакетный, фильтр) ETag считается по телу: ответ
+    формируется, но не передаётся. Потоковые ответы (/export) не буферизуются.
+    Ответы из резервного снимка (БД недоступна) получают Cache-Control: no-store;
+    ответ, уже помеченный no-store (см. cached), отдаётся без валидаторов.
+    """
+
+    def __init__(self, app: ASGIApp, path_prefix: str = "/api/organizations"):
+        self.app = app
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in ("GET", "HEAD")
+            or not scope["path"].startswith(self.path_prefix)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        request = Headers(scope=scope)
+        start: Optional[Message] = None
+        body: List[bytes] = []
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if message["status"] != 200 or not headers.get("content-type", "").startswith(JSON_MEDIA_TYPE):
+                    passthrough = True
+                    await send(message)
+                    return
+                start = message
+                return
+
+            body.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            await send_response(b"".join(body))
+
+        async def send_response(content: bytes) -> None:
+            headers = MutableHeaders(raw=start["headers"])
+            stats = current_stats()
+            if headers.get("cache-control") == "no-store" or (stats is not None and stats.degraded):
+                # Ответ из резервного снимка: ни браузер, ни CDN не должны хранить
+                # его и подтверждать им свои копии после восстановления БД
+                for name in ("etag", "last-modified"):
+                    if name in headers:
+                        del headers[name]
+                headers["Cache-Control"] = "no-store"
+                await send(start)
+                await send({"type": "http.response.body", "body": content})
+                return
+
+            if "etag" not in headers:
+                headers["ETag"] = make_etag(content).decode()
+            headers.setdefault("Cache-Control", cache_control())
+            # Ответ зависит от ключа API: общий кеш не должен отдавать его без ключа
+            headers.setdefault("Vary", "X-API-Key")
+
+            if is_not_modified(request, headers.get("etag"), headers.get("last-modified")):
+                kept = [(name, value) for name, value in headers.raw if name.lower() in NOT_MODIFIED_HEADERS]
+                await send({"type": "http.response.start", "status": 304, "headers": kept})
+                await send({"type": "http.response.body", "body": b""})
+                return
+            await send(start)
+            await send({"type": "http.response.body", "body": content})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,52 @@
+from app.cache.keys import KeyBuilder, key_builder as default_key_builder
+from app.cache.serialization import encode_json, json_response
+from app.cache.tiered import response_cache
+from app.cache.conditional import validator_headers
+from app.repository.fallback import track_snapshot_reads
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, Optional
+
+TagsBuilder = Callable[[Any, Dict[str, Any]], Iterable[str]]
+
+
+def cached(
+    expire: int,
+    namespace: str = "",
+    key_builder: Optional[KeyBuilder] = None,
+    tags: Optional[TagsBuilder] = None
+):
+    """Кеширование ответа эндпоинта в двухуровневом кеше.
+
+    Эндпоинт возвращает уже провалидированную схему; она сериализуется
+    один раз, в кеш кладутся эти байты, и они же отдаются готовым Response —
+    без повторной валидации по response_model (он остаётся для OpenAPI).
+    Ответ получает сохранённые рядом с телом ETag и Last-Modified —
+    условный запрос ConditionalGetMiddleware отвечает 304 без БД.
+    tags(result, kwargs) возвращает теги сущностей, от которых зависит
+    ответ: запись в любую из них сбрасывает ключ (см. app.cache.tags).
+    Ответ из резервного снимка (БД недоступна) отдаётся с Cache-Control:
+    no-store и без валидаторов — и вычислившему его запросу, и ждущим его, —
+    но не кешируется.
+    """
+    builder = key_builder or default_key_builder
+
+    def wrapper(func: Callable):
+        @wraps(func)
+        async def inner(*args, **kwargs):
+            key = builder(func, f"{response_cache.prefix}:{namespace}", args=args, kwargs=kwargs)
+
+            async def compute():
+                with track_snapshot_reads() as reads:
+                    result = await func(*args, **kwargs)
+                if reads.used:
+                    return encode_json(result), None
+                return encode_json(result), set(tags(result, kwargs)) if tags else set()
+
+            entry = await response_cache.get_or_set(key, compute, expire)
+            if not entry.cacheable:
+                return json_response(entry.value, headers={"Cache-Control": "no-store"})
+            return json_response(entry.value, headers=validator_headers(entry.etag, entry.modified_at))
+
+        return inner
+
+    return wrapper
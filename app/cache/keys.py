@@ -0,0 +1,51 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request
+from starlette.responses import Response
+from app.cache.tiered import response_cache
+from typing import Any, Callable, Dict, Tuple
+import hashlib
+
+ORGANIZATION_NAMESPACE = "organization"
+
+KeyBuilder = Callable[..., str]
+
+
+def key_builder(
+    func: Callable[..., Any],
+    namespace: str = "",
+    *,
+    args: Tuple[Any, ...],
+    kwargs: Dict[str, Any],
+) -> str:
+    """Ключ кеша по имени эндпоинта и его параметрам.
+
+    Сессия БД и объекты запроса/ответа в ключ не входят: их repr меняется
+    от запроса к запросу.
+    """
+    params = sorted(
+        (name, value) for name, value in kwargs.items()
+        if not isinstance(value, (AsyncSession, Request, Response))
+    )
+    raw = f"{func.__module__}:{func.__name__}:{args}:{params}"
+    return f"{namespace}:{hashlib.md5(raw.encode()).hexdigest()}"  # noqa: S324
+
+
+def organization_key_builder(
+    func: Callable[..., Any],
+    namespace: str = "",
+    *,
+    args: Tuple[Any, ...],
+    kwargs: Dict[str, Any],
+) -> str:
+    """Предсказуемый ключ карточки организации — его читает и пакетный эндпоинт.
+
+    Урезанная карточка (fields=) хранится под своим ключом с набором полей.
+    """
+    fields = kwargs.get("fields")
+    if fields:
+        return f"{namespace}:{kwargs['org_id']}:{','.join(fields)}"
+    return f"{namespace}:{kwargs['org_id']}"
+
+
+def organization_cache_key(org_id: int) -> str:
+    return f"{response_cache.prefix}:{ORGANIZATION_NAMESPACE}:{org_id}"
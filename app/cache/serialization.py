@@ -0,0 +1,41 @@
+from fastapi.responses import Response
+from pydantic import BaseModel
+from app.monitoring.context import timed
+from typing import Any, Dict, Optional
+import orjson
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+class RawJSON:
+    """Уже сериализованный JSON: encode_json отдаёт его байты как есть"""
+
+    def __init__(self, raw: bytes):
+        self.raw = raw
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.dict()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def encode_json(value: Any) -> bytes:
+    """Сериализация уже провалидированного ответа (pydantic-модели, списки, dict) в JSON.
+
+    orjson сам кодирует datetime, UUID и т.п., поэтому jsonable_encoder
+    с его обходом всех полей не нужен.
+    """
+    if isinstance(value, RawJSON):
+        return value.raw
+    with timed("serialize"):
+        return orjson.dumps(value, default=_default)
+
+
+def decode_json(raw: bytes) -> Any:
+    return orjson.loads(raw)
+
+
+def json_response(raw: bytes, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Готовые байты JSON без повторной валидации и сериализации в FastAPI"""
+    return Response(content=raw, status_code=status_code, media_type=JSON_MEDIA_TYPE, headers=headers)
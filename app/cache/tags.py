@@ -0,0 +1,92 @@
+from app.repository.activity_tree import activity_tree
+from app.repository.spatial import bounding_boxes
+from typing import Iterable, List, Set
+import math
+
+# Теги описывают, от каких сущностей зависит закешированный ответ.
+# Запись инвалидирует ровно те ключи, которые помечены затронутыми тегами.
+SEARCH_TAG = "search"
+GEO_TAG = "geo"
+
+# Размер гео-плитки для тегов (в градусах) и сколько плиток допускается
+# на один ответ, прежде чем он помечается общим тегом geo
+GEO_TILE_DEGREES = 1.0
+GEO_MAX_TILES = 16
+
+
+def organization_tag(org_id: int) -> str:
+    return f"org:{org_id}"
+
+
+def building_tag(building_id: int) -> str:
+    return f"building:{building_id}"
+
+
+def activity_tag(activity_id: int) -> str:
+    return f"activity:{activity_id}"
+
+
+def _tile(latitude: float, longitude: float) -> tuple:
+    return math.floor(latitude / GEO_TILE_DEGREES), math.floor(longitude / GEO_TILE_DEGREES)
+
+
+def geo_tags(lat1: float, lon1: float, lat2: float, lon2: float) -> List[str]:
+    """Теги плиток, покрывающих прямоугольник, или общий тег geo для больших областей"""
+    min_lat, max_lat = sorted([lat1, lat2])
+    min_lon, max_lon = sorted([lon1, lon2])
+    first_row, first_col = _tile(min_lat, min_lon)
+    last_row, last_col = _tile(max_lat, max_lon)
+    if (last_row - first_row + 1) * (last_col - first_col + 1) > GEO_MAX_TILES:
+        return [GEO_TAG]
+    return [
+        f"tile:{row}:{col}"
+        for row in range(first_row, last_row + 1)
+        for col in range(first_col, last_col + 1)
+    ]
+
+
+def circle_geo_tags(latitude: float, longitude: float, radius: float) -> Set[str]:
+    """Теги плиток круга (у антимеридиана — с обеих сторон)"""
+    return {tag for box in bounding_boxes(latitude, longitude, radius) for tag in geo_tags(*box)}
+
+
+def point_geo_tags(latitude: float, longitude: float) -> List[str]:
+    """Теги, которые нужно сбросить при изменении данных в точке"""
+    row, col = _tile(latitude, longitude)
+    return [f"tile:{row}:{col}", GEO_TAG]
+
+
+def activity_subtree_tags(activity_ids: Iterable[int]) -> Set[str]:
+    """Теги активностей и всех их предков: выборка по предку включает поддерево"""
+    tags = set()
+    for activity_id in activity_ids:
+        tags.add(activity_tag(activity_id))
+        tags.update(activity_tag(parent_id) for parent_id in activity_tree.ancestors(activity_id))
+    return tags
+
+
+def building_tags(items: Iterable) -> Set[str]:
+    """Теги зданий организаций, попавших в ответ.
+
+    Ответ с fields= может не содержать здания — тогда от него и не зависит.
+    """
+    tags = set()
+    for item in items:
+        building_id = getattr(item, "building_id", None)
+        if building_id is None and getattr(item, "building", None) is not None:
+            building_id = item.building.id
+        if building_id is not None:
+            tags.add(building_tag(building_id))
+    return tags
+
+
+def tags_for_changes(changes) -> Set[str]:
+    """Все теги, которые нужно сбросить после записи (ChangeSet из WriteRepository)"""
+    tags = {organization_tag(org_id) for org_id in changes.organization_ids}
+    tags.update(building_tag(building_id) for building_id in changes.building_ids)
+    tags.update(activity_subtree_tags(changes.activity_ids))
+    for latitude, longitude in changes.points:
+        tags.update(point_geo_tags(latitude, longitude))
+    if changes.search:
+        tags.add(SEARCH_TAG)
+    return tags
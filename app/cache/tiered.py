@@ -0,0 +1,393 @@
+from redis import asyncio as aioredis
+from app.cache.lru import LRUCache
+from app.config import settings
+from app.monitoring.context import timed
+from app.monitoring.metrics import CACHE_OPERATION_DURATION
+from collections import Counter
+from typing import Awaitable, Callable, Collection, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Байты ответа и теги; теги None — значение не кешируется
+Computed = Tuple[bytes, Optional[Collection[str]]]
+
+
+class CacheEntry(NamedTuple):
+    value: bytes
+    expires_at: float  # Unix-время истечения
+    delta: float  # Сколько секунд заняло вычисление значения
+    etag: bytes  # Валидатор для If-None-Match (хеш значения, в кавычках)
+    modified_at: float  # Unix-время, с которого значение не менялось (Last-Modified)
+    # False — значение не кешировалось (теги None): только вычислившему запросу и ждущим его
+    cacheable: bool = True
+
+
+def make_etag(value: bytes) -> bytes:
+    """Сильный ETag по содержимому ответа"""
+    return b'"%s"' % hashlib.blake2b(value, digest_size=12).hexdigest().encode()
+
+
+class TieredCache:
+    """Двухуровневый кеш: LRU в памяти процесса перед общим Redis.
+
+    * промах по ключу вычисляется одной корутиной на процесс, остальные
+      ждут её результата (single-flight) — истёкший популярный ключ не
+      обрушивает на БД волну одинаковых запросов;
+    * TTL записей в Redis случайно растягивается/сжимается на CACHE_TTL_JITTER,
+      чтобы ключи, созданные одновременно, не истекали одновременно;
+    * запись может быть пересчитана до истечения с вероятностью, растущей
+      к концу её жизни (XFetch), — дорогие ключи обновляются заранее;
+    * каждый ключ помечается тегами сущностей, от которых он зависит
+      (множества Redis tag:<тег>); invalidate_tags удаляет помеченные ключи
+      и рассылает их через pub/sub, чтобы остальные процессы очистили
+      свой локальный уровень.
+    """
+
+    def __init__(
+        self,
+        prefix: str,
+        local_ttl: float,
+        local_max_entries: int,
+        ttl_jitter: float,
+        xfetch_beta: float,
+        enabled: bool = True
+    ):
+        self.prefix = prefix
+        self.enabled = enabled
+        self.local_ttl = local_ttl
+        self.ttl_jitter = ttl_jitter
+        self.xfetch_beta = xfetch_beta
+        self.local = LRUCache(local_max_entries)
+        self.redis: Optional[aioredis.Redis] = None
+        self.stats: Counter = Counter()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._background: Set[asyncio.Task] = set()
+
+    @property
+    def invalidation_channel(self) -> str:
+        return f"{self.prefix}:invalidate"
+
+    def connect(self, redis: aioredis.Redis) -> None:
+        self.redis = redis
+
+    async def get_or_set(self, key: str, compute: Callable[[], Awaitable[Computed]], ttl: int) -> CacheEntry:
+        """Запись ключа из кеша или результат compute() (байты и теги), сохранённый в оба уровня.
+
+        Вместе со значением хранятся его валидаторы (ETag, время изменения):
+        условный запрос отвечается 304 прямо по записи кеша.
+        """
+        if not self.enabled:
+            value, tags = await compute()
+            return self._make_entry(value, ttl, 0.0)._replace(cacheable=tags is not None)
+
+        entry = self.local.get(key)
+        if entry is not None:
+            self.stats["local_hits"] += 1
+            return entry
+        self.stats["local_misses"] += 1
+
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self.stats["coalesced"] += 1
+            try:
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise
+            # Вычислявший запрос был отменён — пробуем сами
+            return await self.get_or_set(key, compute, ttl)
+
+        flight = asyncio.get_running_loop().create_future()
+        self._inflight[key] = flight
+        try:
+            entry = await self._load(key, compute, ttl)
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as e:
+            flight.set_exception(e)
+            flight.exception()  # Исключение получено, даже если ждущих нет
+            raise
+        else:
+            flight.set_result(entry)
+            return entry
+        finally:
+            self._inflight.pop(key, None)
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        """Пакетное чтение: сначала локальный уровень, остальное одним MGET из Redis"""
+        if not self.enabled:
+            return [None] * len(keys)
+        values: List[Optional[bytes]] = [self._local_value(key) for key in keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+        self.stats["local_hits"] += len(keys) - len(missing)
+        self.stats["local_misses"] += len(missing)
+        if not missing or self.redis is None:
+            return values
+
+        try:
+            with timed("cache", CACHE_OPERATION_DURATION.labels("mget")):
+                raw = await self.redis.mget([keys[i] for i in missing])
+        except Exception:
+            logger.warning("Error reading %d keys from Redis", len(missing), exc_info=True)
+            self.stats["redis_errors"] += 1
+            return values
+
+        for i, item in zip(missing, raw):
+            entry = self._decode(item)
+            if entry is None or entry.expires_at <= time.time():
+                self.stats["redis_misses"] += 1
+                continue
+            self.stats["redis_hits"] += 1
+            self._remember(keys[i], entry)
+            values[i] = entry.value
+        return values
+
+    async def set_many(self, items: Dict[str, Computed], ttl: int) -> None:
+        """Пакетная запись в оба уровня одним конвейером Redis"""
+        if not self.enabled:
+            return
+        entries = {key: (self._make_entry(value, ttl, 0.0), tags) for key, (value, tags) in items.items()}
+        for key, (entry, _) in entries.items():
+            self._remember(key, entry)
+        if self.redis is None or not entries:
+            return
+        try:
+            with timed("cache", CACHE_OPERATION_DURATION.labels("set_many")):
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for key, (entry, tags) in entries.items():
+                        self._queue_set(pipe, key, entry, tags)
+                    await pipe.execute()
+        except Exception:
+            logger.warning("Error writing %d keys to Redis", len(entries), exc_info=True)
+            self.stats["redis_errors"] += 1
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Удаление всех ключей, помеченных любым из тегов, во всех процессах"""
+        tag_keys = [self._tag_key(tag) for tag in set(tags)]
+        if not tag_keys or self.redis is None:
+            return 0
+        try:
+            with timed("cache", CACHE_OPERATION_DURATION.labels("invalidate")):
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for tag_key in tag_keys:
+                        pipe.smembers(tag_key)
+                    members = await pipe.execute()
+
+                keys = sorted({key.decode() for group in members for key in group})
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.delete(*keys, *tag_keys)
+                    if keys:
+                        pipe.publish(self.invalidation_channel, json.dumps(keys))
+                    await pipe.execute()
+        except Exception:
+            logger.warning("Error invalidating tags %s", tag_keys, exc_info=True)
+            self.stats["redis_errors"] += 1
+            return 0
+
+        for key in keys:
+            self.local.delete(key)
+        self.stats["invalidated"] += len(keys)
+        return len(keys)
+
+    async def clear(self) -> int:
+        """Удаление всех ключей кеша (после массовой загрузки) во всех процессах"""
+        self.local.clear()
+        if self.redis is None:
+            return 0
+        deleted = 0
+        try:
+            batch: List[bytes] = []
+            async for key in self.redis.scan_iter(match=f"{self.prefix}:*", count=1000):
+                batch.append(key)
+                if len(batch) >= 1000:
+                    deleted += await self.redis.unlink(*batch)
+                    batch.clear()
+            if batch:
+                deleted += await self.redis.unlink(*batch)
+            await self.redis.publish(self.invalidation_channel, json.dumps("*"))
+        except Exception:
+            logger.warning("Error clearing cache", exc_info=True)
+            self.stats["redis_errors"] += 1
+        self.stats["invalidated"] += deleted
+        return deleted
+
+    def invalidate_tags_later(self, tags: Iterable[str], delay: float) -> None:
+        """Повторная инвалидация через delay секунд.
+
+        Запрос, начавший вычисление до коммита записи, может положить
+        в кеш старые данные уже после первой инвалидации.
+        """
+        tags = list(tags)
+
+        async def _run():
+            await asyncio.sleep(delay)
+            await self.invalidate_tags(tags)
+
+        task = asyncio.create_task(_run())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def listen_invalidations(self) -> None:
+        """Подписка на сброшенные другими процессами ключи (запускается фоновой задачей)"""
+        while True:
+            try:
+                pubsub = self.redis.pubsub()
+                await pubsub.subscribe(self.invalidation_channel)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    keys = json.loads(message["data"])
+                    if keys == "*":
+                        self.local.clear()
+                        continue
+                    for key in keys:
+                        self.local.delete(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Cache invalidation listener failed, reconnecting", exc_info=True)
+                # Пропущенные сообщения перекрываются коротким TTL локального уровня
+                self.local.clear()
+                await asyncio.sleep(1)
+
+    def stats_snapshot(self) -> Dict[str, Dict[str, int]]:
+        """Счётчики попаданий и промахов по уровням"""
+        return {
+            "local": {
+                "hits": self.stats["local_hits"],
+                "misses": self.stats["local_misses"],
+                "entries": len(self.local),
+            },
+            "redis": {
+                "hits": self.stats["redis_hits"],
+                "misses": self.stats["redis_misses"],
+                "early_refreshes": self.stats["early_refreshes"],
+                "errors": self.stats["redis_errors"],
+            },
+            "coalesced": self.stats["coalesced"],
+            "invalidated": self.stats["invalidated"],
+        }
+
+    # ========== Helper Methods ==========
+    async def _load(self, key: str, compute: Callable[[], Awaitable[Computed]], ttl: int) -> CacheEntry:
+        previous = await self._redis_get(key)
+        if previous is not None:
+            if not self._should_refresh(previous):
+                self.stats["redis_hits"] += 1
+                self._remember(key, previous)
+                return previous
+            self.stats["early_refreshes"] += 1
+        else:
+            self.stats["redis_misses"] += 1
+
+        started = time.monotonic()
+        value, tags = await compute()
+        entry = self._make_entry(value, ttl, time.monotonic() - started)
+        if tags is None:
+            # Значение только для этого запроса (и ждущих его), в кеш не кладётся
+            return entry._replace(cacheable=False)
+        if previous is not None and previous.etag == entry.etag:
+            # Досрочный пересчёт дал то же значение — время изменения прежнее
+            entry = entry._replace(modified_at=previous.modified_at)
+        await self._redis_set(key, entry, tags)
+        self._remember(key, entry)
+        return entry
+
+    async def _redis_get(self, key: str) -> Optional[CacheEntry]:
+        if self.redis is None:
+            return None
+        try:
+            with timed("cache", CACHE_OPERATION_DURATION.labels("get")):
+                return self._decode(await self.redis.get(key))
+        except Exception:
+            logger.warning("Error reading key '%s' from Redis", key, exc_info=True)
+            self.stats["redis_errors"] += 1
+            return None
+
+    async def _redis_set(self, key: str, entry: CacheEntry, tags: Collection[str]) -> None:
+        if self.redis is None:
+            return
+        try:
+            with timed("cache", CACHE_OPERATION_DURATION.labels("set")):
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    self._queue_set(pipe, key, entry, tags)
+                    await pipe.execute()
+        except Exception:
+            logger.warning("Error writing key '%s' to Redis", key, exc_info=True)
+            self.stats["redis_errors"] += 1
+
+    def _queue_set(self, pipe, key: str, entry: CacheEntry, tags: Collection[str]) -> None:
+        """Запись значения и его тегов в конвейер.
+
+        Множество тега живёт не меньше самого долгоживущего ключа в нём:
+        NX задаёт TTL новому множеству, GT только продлевает существующий.
+        """
+        ttl = self._redis_ttl(entry)
+        pipe.set(key, self._encode(entry), ex=ttl)
+        for tag in tags:
+            tag_key = self._tag_key(tag)
+            pipe.sadd(tag_key, key)
+            pipe.expire(tag_key, ttl, nx=True)
+            pipe.expire(tag_key, ttl, gt=True)
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}:tag:{tag}"
+
+    def _remember(self, key: str, entry: CacheEntry) -> None:
+        self.local.set(key, entry, min(self.local_ttl, entry.expires_at - time.time()))
+
+    def _local_value(self, key: str) -> Optional[bytes]:
+        entry = self.local.get(key)
+        return entry.value if entry is not None else None
+
+    def _make_entry(self, value: bytes, ttl: int, delta: float) -> CacheEntry:
+        jitter = random.uniform(-self.ttl_jitter, self.ttl_jitter)
+        now = time.time()
+        return CacheEntry(value, now + ttl * (1 + jitter), delta, make_etag(value), now)
+
+    def _should_refresh(self, entry: CacheEntry) -> bool:
+        """XFetch: now - delta * beta * ln(rand) >= expiry"""
+        if entry.delta <= 0:
+            return False
+        gap = -entry.delta * self.xfetch_beta * math.log(1.0 - random.random())
+        return time.time() + gap >= entry.expires_at
+
+    @staticmethod
+    def _redis_ttl(entry: CacheEntry) -> int:
+        return max(1, math.ceil(entry.expires_at - time.time()))
+
+    @staticmethod
+    def _encode(entry: CacheEntry) -> bytes:
+        return b"%.3f:%.4f:%.3f:%s:" % (entry.expires_at, entry.delta, entry.modified_at, entry.etag) + entry.value
+
+    @staticmethod
+    def _decode(raw: Optional[bytes]) -> Optional[CacheEntry]:
+        """Запись из Redis; записи прежнего формата (без валидаторов) считаются промахом"""
+        if raw is None:
+            return None
+        try:
+            expires_at, delta, modified_at, etag, value = raw.split(b":", 4)
+            if not etag.startswith(b'"'):
+                return None
+            return CacheEntry(value, float(expires_at), float(delta), etag, float(modified_at))
+        except ValueError:
+            return None
+
+
+response_cache = TieredCache(
+    prefix="organizations-api",
+    local_ttl=settings.CACHE_LOCAL_TTL,
+    local_max_entries=settings.CACHE_LOCAL_MAX_ENTRIES,
+    ttl_jitter=settings.CACHE_TTL_JITTER,
+    xfetch_beta=settings.CACHE_XFETCH_BETA,
+    enabled=settings.CACHE_ENABLED
+)
@@ -0,0 +1,104 @@
+"""Массовая загрузка справочника из CSV/NDJSON через COPY.
+
+CSV-файлы с заголовком:
+    buildings:     id,address,latitude,longitude
+    organizations: id,name,building_id
+    phones:        number,organization_id
+    links:         organization_id,activity_id
+NDJSON — в формате выгрузки app.cli.export (организация со зданием,
+телефонами и видами деятельности в одной строке).
+
+Пример:
+    python -m app.cli.bulk_import --ndjson organizations.ndjson --replace-relations --rejected rejected.ndjson
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+
+import asyncpg
+from redis import asyncio as aioredis
+
+from app.cache import response_cache
+from app.config import settings
+from app.cli.rebuild_documents import rebuild as rebuild_documents
+from app.services.bulk_import import BulkImporter
+
+logger = logging.getLogger(__name__)
+
+
+def asyncpg_dsn(url: str) -> str:
+    """DSN для asyncpg из URL SQLAlchemy (postgresql+asyncpg://...)"""
+    return url.replace("+asyncpg", "", 1)
+
+
+async def flush_cache() -> None:
+    redis = aioredis.from_url(
+        f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}",
+        decode_responses=False
+    )
+    response_cache.connect(redis)
+    try:
+        deleted = await response_cache.clear()
+        logger.info("Cache cleared: %d keys", deleted)
+    finally:
+        await redis.close()
+
+
+async def run(args: argparse.Namespace) -> int:
+    csv_sources = [
+        (table, path) for table, path in (
+            ("staging_buildings", args.buildings),
+            ("staging_organizations", args.organizations),
+            ("staging_phones", args.phones),
+            ("staging_links", args.links),
+        ) if path
+    ]
+
+    conn = await asyncpg.connect(asyncpg_dsn(settings.DATABASE_URL))
+    try:
+        importer = BulkImporter(conn, replace_relations=args.replace_relations)
+        report = await importer.run(csv_sources, args.ndjson, dry_run=args.dry_run)
+    finally:
+        await conn.close()
+
+    if args.rejected:
+        with open(args.rejected, "w", encoding="utf-8") as f:
+            for row in report.rejected:
+                f.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+
+    json.dump(report.summary(), sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+
+    if not args.dry_run and settings.ORGANIZATION_DOCUMENTS_ENABLED:
+        # Загрузка идёт в обход пути записи — документы перестраиваются целиком
+        logger.info("Organization documents rebuilt: %d", await rebuild_documents(settings.DOCUMENTS_REBUILD_BATCH))
+    if not args.dry_run and not args.keep_cache:
+        await flush_cache()
+    return 1 if report.rejected and args.strict else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Массовая загрузка справочника через COPY")
+    parser.add_argument("--buildings", help="CSV со зданиями")
+    parser.add_argument("--organizations", help="CSV с организациями")
+    parser.add_argument("--phones", help="CSV с телефонами")
+    parser.add_argument("--links", help="CSV со связями организация — вид деятельности")
+    parser.add_argument("--ndjson", action="append", default=[], help="NDJSON в формате выгрузки (можно несколько)")
+    parser.add_argument("--replace-relations", action="store_true",
+                        help="удалять телефоны и связи загружаемых организаций, которых нет в файлах")
+    parser.add_argument("--rejected", help="файл NDJSON для отбракованных строк")
+    parser.add_argument("--dry-run", action="store_true", help="проверить и посчитать изменения без записи")
+    parser.add_argument("--keep-cache", action="store_true", help="не сбрасывать кеш ответов после загрузки")
+    parser.add_argument("--strict", action="store_true", help="код возврата 1, если есть отбракованные строки")
+    args = parser.parse_args()
+    if not (args.ndjson or args.buildings or args.organizations or args.phones or args.links):
+        parser.error("не задан ни один источник")
+
+    logging.basicConfig(level=settings.LOG_LEVEL.upper(), format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
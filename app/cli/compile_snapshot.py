@@ -0,0 +1,39 @@
+"""Сборка снимка справочника для чтения при недоступной БД.
+
+Снимок — файл с колонками зданий, организаций, телефонов, видов
+деятельности и связей; воркеры отображают его в память (SNAPSHOT_PATH)
+и подхватывают новую версию без перезапуска. Публикация атомарна,
+поэтому запускать можно по расписанию на работающем сервисе.
+
+Пример:
+    python -m app.cli.compile_snapshot --output /var/lib/organizations/snapshot.bin
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from app.config import settings
+from app.db.database import AsyncSessionLocal
+from app.services.snapshot import compile_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+async def run(args: argparse.Namespace) -> None:
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as session:
+        counts = await compile_snapshot(session, args.output)
+    logger.info("Snapshot %s published in %.1fs: %s", args.output, time.perf_counter() - started, counts)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Сборка снимка справочника в файл")
+    parser.add_argument("--output", default=settings.SNAPSHOT_PATH, required=not settings.SNAPSHOT_PATH)
+    args = parser.parse_args()
+    logging.basicConfig(level=settings.LOG_LEVEL.upper(), format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Выгрузка справочника организаций в NDJSON.
+
+Пример:
+    python -m app.cli.export --output organizations.ndjson --updated-since 2024-01-01T00:00:00
+"""
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+
+from app.config import settings
+from app.db.database import AsyncSessionLocal
+from app.repository import Repository
+from app.services.export import export_ndjson
+
+
+async def run(args: argparse.Namespace) -> None:
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        async with AsyncSessionLocal() as session:
+            repo = Repository(session)
+            async for chunk in export_ndjson(repo, args.batch_size, args.updated_since, args.activity_id):
+                out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Выгрузка организаций в NDJSON")
+    parser.add_argument("--output", help="файл для записи (по умолчанию stdout)")
+    parser.add_argument("--updated-since", type=datetime.fromisoformat, help="только изменённые начиная с даты (ISO 8601)")
+    parser.add_argument("--activity-id", type=int, help="только организации из поддерева вида деятельности")
+    parser.add_argument("--batch-size", type=int, default=settings.EXPORT_BATCH_SIZE)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
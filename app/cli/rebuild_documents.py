@@ -0,0 +1,44 @@
+"""Перестройка read-model organization_documents с нуля.
+
+Нужна после включения ORGANIZATION_DOCUMENTS_ENABLED, после изменений
+в обход API (видов деятельности, ручных правок в БД) и после смены схемы
+карточки. Все документы заменяются одной транзакцией.
+
+Пример:
+    python -m app.cli.rebuild_documents --batch-size 2000
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from app.config import settings
+from app.db.database import AsyncSessionLocal
+from app.repository.documents import DocumentRepository
+
+logger = logging.getLogger(__name__)
+
+
+async def rebuild(batch_size: int) -> int:
+    async with AsyncSessionLocal() as session:
+        total = await DocumentRepository(session).rebuild(batch_size)
+        await session.commit()
+    return total
+
+
+async def run(args: argparse.Namespace) -> None:
+    started = time.perf_counter()
+    total = await rebuild(args.batch_size)
+    logger.info("Organization documents rebuilt: %d in %.1fs", total, time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Перестройка таблицы organization_documents")
+    parser.add_argument("--batch-size", type=int, default=settings.DOCUMENTS_REBUILD_BATCH)
+    args = parser.parse_args()
+    logging.basicConfig(level=settings.LOG_LEVEL.upper(), format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
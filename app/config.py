@@ -1,6 +1,6 @@
 import os
 from dotenv import load_dotenv
-from typing import Optional
+from typing import List, Optional
 
 load_dotenv()
 
@@ -9,6 +9,17 @@ class Settings:
     DATABASE_URL: str = os.getenv("DATABASE_URL")
     API_KEY: str = os.getenv("API_KEY")
     
+    # Реплики для чтения: URL через запятую; пусто — все запросы идут на primary
+    DATABASE_REPLICA_URLS: List[str] = [
+        url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+    ]
+    REPLICA_SELECTION: str = os.getenv("REPLICA_SELECTION", "round_robin")  # round_robin | least_connections
+    REPLICA_POOL_SIZE: int = int(os.getenv("REPLICA_POOL_SIZE", 5))
+    REPLICA_HEALTH_INTERVAL: float = float(os.getenv("REPLICA_HEALTH_INTERVAL", 5))  # В секундах
+    # Допустимое отставание в секундах (0 — не проверять); должно быть меньше
+    # CACHE_INVALIDATION_DELAY, иначе кеш может заполниться устаревшими данными
+    REPLICA_MAX_LAG: float = float(os.getenv("REPLICA_MAX_LAG", 1))
+
     # Настройки Redis
     REDIS_HOST: str = os.getenv("REDIS_HOST", "localhost")
     REDIS_PORT: int = int(os.getenv("REDIS_PORT", 6379))
@@ -16,6 +27,83 @@ class Settings:
     REDIS_PASSWORD: Optional[str] = os.getenv("REDIS_PASSWORD")
     REDIS_CACHE_TTL: int = int(os.getenv("REDIS_CACHE_TTL", 3600))  # В секундах
 
+    # Выключение кеша ответов целиком (для замеров и отладки)
+    CACHE_ENABLED: bool = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+
+    # Локальный уровень кеша (в памяти процесса) и защита от лавины промахов
+    CACHE_LOCAL_TTL: float = float(os.getenv("CACHE_LOCAL_TTL", 5))  # В секундах
+    CACHE_LOCAL_MAX_ENTRIES: int = int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", 10000))
+    CACHE_TTL_JITTER: float = float(os.getenv("CACHE_TTL_JITTER", 0.1))  # Доля TTL
+    CACHE_XFETCH_BETA: float = float(os.getenv("CACHE_XFETCH_BETA", 1.0))
+    CACHE_INVALIDATION_DELAY: float = float(os.getenv("CACHE_INVALIDATION_DELAY", 2))  # Повторный сброс тегов, в секундах
+
+    # HTTP-кеширование GET-ответов: Cache-Control для браузеров (max-age) и CDN (s-maxage).
+    # Запись сбрасывает только серверный кеш, поэтому по умолчанию клиенты перепроверяют ответ (304)
+    HTTP_CACHE_MAX_AGE: int = int(os.getenv("HTTP_CACHE_MAX_AGE", 0))  # В секундах
+    HTTP_CACHE_SHARED_MAX_AGE: int = int(os.getenv("HTTP_CACHE_SHARED_MAX_AGE", 30))  # В секундах
+
+    # Индекс иерархии видов деятельности
+    ACTIVITY_TREE_REFRESH_INTERVAL: float = float(os.getenv("ACTIVITY_TREE_REFRESH_INTERVAL", 60))  # В секундах
+
+    # Битовые индексы для GET /api/organizations/filter (в памяти процесса)
+    FILTER_INDEX_REFRESH_INTERVAL: float = float(os.getenv("FILTER_INDEX_REFRESH_INTERVAL", 60))  # В секундах
+    # Сколько кандидатов проверять на подстроку названия за запрос (страница может выйти неполной)
+    FILTER_MAX_CANDIDATES: int = int(os.getenv("FILTER_MAX_CANDIDATES", 20000))
+
+    # Read-model карточек (organization_documents): ведение путём записи и чтение
+    # карточки и /batch по первичному ключу; после включения — python -m app.cli.rebuild_documents
+    ORGANIZATION_DOCUMENTS_ENABLED: bool = os.getenv("ORGANIZATION_DOCUMENTS_ENABLED", "false").lower() == "true"
+    DOCUMENTS_REBUILD_BATCH: int = int(os.getenv("DOCUMENTS_REBUILD_BATCH", 1000))
+
+    # Геопоиск
+    NEAREST_MAX_RADIUS: int = int(os.getenv("NEAREST_MAX_RADIUS", 50000))  # В метрах
+
+    # Кластеры для карты: ячейка ~CLUSTER_CELL_PIXELS пикселей на экране; если зданий
+    # в области не больше CLUSTER_BUILDINGS_THRESHOLD, они отдаются по отдельности
+    CLUSTER_CELL_PIXELS: int = int(os.getenv("CLUSTER_CELL_PIXELS", 64))
+    CLUSTER_BUILDINGS_THRESHOLD: int = int(os.getenv("CLUSTER_BUILDINGS_THRESHOLD", 200))
+
+    # Фасеты: пересчёт изменившихся ячеек сетки (0 — не запускать в этом процессе)
+    FACETS_REFRESH_INTERVAL: float = float(os.getenv("FACETS_REFRESH_INTERVAL", 5))  # В секундах
+    FACETS_REFRESH_BATCH: int = int(os.getenv("FACETS_REFRESH_BATCH", 500))  # Ячеек за транзакцию
+    FACETS_BUILDINGS_LIMIT: int = int(os.getenv("FACETS_BUILDINGS_LIMIT", 50))
+
+    # Снимок справочника в файле (python -m app.cli.compile_snapshot): при недоступности БД
+    # карточки, /batch, /in_building и /by_activity отвечаются из него; пусто — выключено
+    SNAPSHOT_PATH: str = os.getenv("SNAPSHOT_PATH", "")
+    SNAPSHOT_CHECK_INTERVAL: float = float(os.getenv("SNAPSHOT_CHECK_INTERVAL", 5))  # Проверка новой версии, в секундах
+    # Сколько секунд после ошибки соединения с БД читать сразу из снимка, не дожидаясь таймаутов
+    SNAPSHOT_FALLBACK_PERIOD: float = float(os.getenv("SNAPSHOT_FALLBACK_PERIOD", 5))
+
+    # Выгрузка справочника
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", 500))
+
+    # Профилирование SQL по запросам: заголовок Server-Timing, поиск N+1,
+    # EXPLAIN ANALYZE медленных SELECT (только для отладки — планы выполняют запрос повторно)
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILING_SLOW_QUERY_MS: float = float(os.getenv("PROFILING_SLOW_QUERY_MS", 100))
+    PROFILING_EXPLAIN_LIMIT: int = int(os.getenv("PROFILING_EXPLAIN_LIMIT", 3))  # Планов на запрос
+    PROFILING_REPEAT_THRESHOLD: int = int(os.getenv("PROFILING_REPEAT_THRESHOLD", 3))  # Повторов одной формы для N+1
+
+    # Прогрев кеша при старте: /ready отвечает 200 только после него
+    WARMUP_ENABLED: bool = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+    WARMUP_CONCURRENCY: int = int(os.getenv("WARMUP_CONCURRENCY", 8))  # Параллельных запросов к БД
+    WARMUP_TIMEOUT: float = float(os.getenv("WARMUP_TIMEOUT", 120))  # В секундах; по истечении — готов без прогрева
+    # Горячие ключи: явные списки ID и/или топ-N из access-лога (uvicorn/nginx)
+    WARMUP_ORGANIZATION_IDS: List[int] = [
+        int(value) for value in os.getenv("WARMUP_ORGANIZATION_IDS", "").split(",") if value.strip()
+    ]
+    WARMUP_BUILDING_IDS: List[int] = [
+        int(value) for value in os.getenv("WARMUP_BUILDING_IDS", "").split(",") if value.strip()
+    ]
+    WARMUP_ACCESS_LOG: Optional[str] = os.getenv("WARMUP_ACCESS_LOG")
+    WARMUP_TOP_N: int = int(os.getenv("WARMUP_TOP_N", 200))
+
+    # Создание таблиц по моделям при старте (вместо миграций — только для разработки);
+    # DB_DROP_ON_STARTUP дополнительно удаляет все таблицы, только вместе с DEBUG
+    DB_INIT_ON_STARTUP: bool = os.getenv("DB_INIT_ON_STARTUP", "false").lower() == "true"
+    DB_DROP_ON_STARTUP: bool = os.getenv("DB_DROP_ON_STARTUP", "false").lower() == "true"
+
     # Опциональные параметры с дефолтными значениями
     DEBUG: bool = os.getenv("DEBUG", "false").lower() == "true"
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "info")
@@ -1,6 +1,7 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from app.config import settings
+from app.db.replicas import ReadRouter, create_replicas
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,6 +23,15 @@ AsyncSessionLocal = async_sessionmaker(
     autoflush=False
 )
 
+# Чтение: реплики из DATABASE_REPLICA_URLS с откатом на primary
+read_router = ReadRouter(
+    primary=AsyncSessionLocal,
+    replicas=create_replicas(settings.DATABASE_REPLICA_URLS, settings.REPLICA_POOL_SIZE, echo=settings.DEBUG),
+    strategy=settings.REPLICA_SELECTION,
+    max_lag=settings.REPLICA_MAX_LAG,
+    health_interval=settings.REPLICA_HEALTH_INTERVAL
+)
+
 async def get_db() -> AsyncSession:
     """Получение сессии базы данных"""
     async with AsyncSessionLocal() as session:
@@ -33,13 +43,22 @@ async def get_db() -> AsyncSession:
         finally:
             await session.close()
 
+async def get_read_db() -> AsyncSession:
+    """Сессия для чтения (реплика или primary); для записи — только get_db"""
+    async with read_router.session() as session:
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
+
 async def init_db():
     """Инициализация структуры базы данных"""
 
     logger.info("Initializing database tables...")
 
     async with engine.begin() as conn:
-        if settings.DEBUG:
+        if settings.DEBUG and settings.DB_DROP_ON_STARTUP:
             logger.warning("Dropping all tables (DEBUG mode)")
             await conn.run_sync(Base.metadata.drop_all)
 
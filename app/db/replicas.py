@@ -0,0 +1,152 @@
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+import asyncio
+import itertools
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+ROUND_ROBIN = "round_robin"
+LEAST_CONNECTIONS = "least_connections"
+
+# Ключ session.info: момент, с которого сессия ждёт соединение (метрика ожидания пула)
+CONNECTION_REQUESTED = "connection_requested_at"
+
+# Отставание 0, если всё полученное WAL уже применено: иначе на простаивающем
+# primary pg_last_xact_replay_timestamp() устаревает и реплика казалась бы отстающей
+HEALTH_QUERY = text("""
+    SELECT pg_is_in_recovery() AS in_recovery,
+           CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+           END AS lag
+""")
+
+
+class Replica:
+    """Реплика для чтения: свой движок и пул, признак здоровья, число активных сессий"""
+
+    def __init__(self, name: str, engine: AsyncEngine):
+        self.name = name
+        self.engine = engine
+        self.sessionmaker = async_sessionmaker(
+            bind=engine, class_=AsyncSession, expire_on_commit=False, autoflush=False
+        )
+        self.healthy = True
+        self.in_use = 0
+        self.lag: Optional[float] = None
+
+
+class ReadRouter:
+    """Распределение читающих сессий по репликам с откатом на primary.
+
+    * реплика выбирается по кругу или по наименьшему числу активных сессий;
+    * реплика, на которой не удалось открыть соединение, сразу исключается,
+      а запрос уходит на следующую реплику или на primary;
+    * фоновая проверка (run_health_checks) исключает реплики, которые
+      недоступны, вышли из режима восстановления или отстают больше max_lag,
+      и возвращает восстановившиеся.
+    """
+
+    def __init__(
+        self,
+        primary: async_sessionmaker,
+        replicas: List[Replica],
+        strategy: str = ROUND_ROBIN,
+        max_lag: float = 0.0,
+        health_interval: float = 5.0
+    ):
+        if strategy not in (ROUND_ROBIN, LEAST_CONNECTIONS):
+            raise ValueError(f"Unknown replica selection strategy: {strategy}")
+        self.primary = primary
+        self.replicas = replicas
+        self.strategy = strategy
+        self.max_lag = max_lag
+        self.health_interval = health_interval
+        self._round_robin = itertools.count()
+
+    def candidates(self) -> List[Replica]:
+        """Здоровые реплики в порядке попыток"""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return []
+        if self.strategy == LEAST_CONNECTIONS:
+            return sorted(healthy, key=lambda replica: replica.in_use)
+        start = next(self._round_robin) % len(healthy)
+        return healthy[start:] + healthy[:start]
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[AsyncSession]:
+        """Сессия на реплике, а если здоровых нет — на primary"""
+        for replica in self.candidates():
+            session = replica.sessionmaker()
+            try:
+                # Соединение открывается сразу: недоступная реплика обнаружится
+                # до выполнения запросов, и сессию можно взять на следующей
+                session.info[CONNECTION_REQUESTED] = time.perf_counter()
+                await session.connection()
+            except (OperationalError, DBAPIError, OSError):
+                await session.close()
+                self.eject(replica, "connection failed")
+                continue
+
+            replica.in_use += 1
+            try:
+                yield session
+            except OperationalError:
+                # Соединение потеряно посреди запроса — реплику до проверки не используем
+                self.eject(replica, "connection lost")
+                raise
+            finally:
+                replica.in_use -= 1
+                await session.close()
+            return
+
+        async with self.primary() as session:
+            yield session
+
+    def eject(self, replica: Replica, reason: str) -> None:
+        if replica.healthy:
+            logger.warning("Replica %s ejected: %s", replica.name, reason)
+        replica.healthy = False
+
+    async def check(self, replica: Replica) -> None:
+        try:
+            async with replica.engine.connect() as conn:
+                row = (await asyncio.wait_for(conn.execute(HEALTH_QUERY), timeout=self.health_interval)).one()
+        except Exception as e:
+            self.eject(replica, f"health check failed: {e!r}")
+            return
+
+        replica.lag = float(row.lag)
+        if not row.in_recovery:
+            self.eject(replica, "not in recovery (promoted?)")
+        elif self.max_lag and replica.lag > self.max_lag:
+            self.eject(replica, f"replication lag {replica.lag:.1f}s")
+        else:
+            if not replica.healthy:
+                logger.info("Replica %s is back (lag %.1fs)", replica.name, replica.lag)
+            replica.healthy = True
+
+    async def run_health_checks(self) -> None:
+        """Периодическая проверка реплик (запускается фоновой задачей)"""
+        while True:
+            await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+            await asyncio.sleep(self.health_interval)
+
+    async def dispose(self) -> None:
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+def create_replicas(urls: List[str], pool_size: int, echo: bool = False) -> List[Replica]:
+    return [
+        Replica(
+            f"replica{i}",
+            create_async_engine(url, echo=echo, pool_size=pool_size, pool_pre_ping=True)
+        )
+        for i, url in enumerate(urls, start=1)
+    ]
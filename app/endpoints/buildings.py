@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import get_db
+from app.repository.writer import WriteRepository
+from app.schemas.organization import Building, BuildingCreate, BuildingUpdate
+from app.services.writes import commit_changes
+
+
+router = APIRouter(prefix="/api/buildings", tags=["Buildings"])
+
+
+@router.post("", response_model=Building, status_code=status.HTTP_201_CREATED)
+async def create_building(
+    data: BuildingCreate,
+    db: AsyncSession = Depends(get_db)
+    ):
+    """Создание здания"""
+    writer = WriteRepository(db)
+    building = await writer.create_building(data.dict())
+    await commit_changes(db, writer.changes)
+    return Building.from_orm(building)
+
+@router.patch("/{building_id}", response_model=Building)
+async def update_building(
+    building_id: int,
+    data: BuildingUpdate,
+    db: AsyncSession = Depends(get_db)
+    ):
+    """Изменение адреса или координат здания"""
+    writer = WriteRepository(db)
+    building = await writer.update_building(building_id, data.dict(exclude_unset=True, exclude_none=True))
+    await commit_changes(db, writer.changes)
+    return Building.from_orm(building)
+
+@router.delete("/{building_id}", status_code=status.HTTP_204_NO_CONTENT, response_class=Response)
+async def delete_building(
+    building_id: int,
+    db: AsyncSession = Depends(get_db)
+    ):
+    """Удаление здания (только без организаций)"""
+    writer = WriteRepository(db)
+    await writer.delete_building(building_id)
+    await commit_changes(db, writer.changes)
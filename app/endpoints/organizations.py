@@ -1,10 +1,33 @@
-from fastapi import APIRouter, Depends, Query
-from fastapi_cache.decorator import cache
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.database import get_db
+from app.db.database import get_db, get_read_db
 from app.repository import Repository
-from app.schemas.organization import OrganizationBase, OrganizationFull, OrganizationWithActivities, BuildingInRect
-from typing import List
+from app.repository.repository import SearchFilters
+from app.repository.documents import DocumentRepository
+from app.repository.facets import FacetRepository
+from app.repository.clusters import ClusterRepository, cluster_cell_size
+from app.repository.fallback import SnapshotFallback
+from app.repository.snapshot import SnapshotDocuments, SnapshotRepository
+from app.repository.writer import WriteRepository
+from app.schemas.organization import (
+    OrganizationBase, OrganizationFull, OrganizationWithActivities, BuildingInRect, BuildingWithOrganizations,
+    OrganizationDistance,
+    OrganizationBatchItem, OrganizationCreate, OrganizationUpdate, Phone, PhoneBase, Facets, Clusters
+)
+from app.schemas.pagination import Page
+from app.schemas.fields import Fields, parse_fields, organization_schema, organization_distance_schema
+from app.services.export import export_ndjson
+from app.services.batch import get_organizations_batch
+from app.services.filtering import filter_organizations
+from app.repository.filter_index import filter_index
+from app.services.writes import commit_changes
+from app.cache import ORGANIZATION_NAMESPACE, cached, encode_json, json_response, organization_key_builder
+from app.cache.tags import (
+    SEARCH_TAG, GEO_TAG, organization_tag, building_tag, activity_tag, geo_tags, circle_geo_tags, building_tags
+)
+from typing import List, Literal, Optional, Set, Union
+from datetime import datetime
 from app.config import settings
 from app.dependencies import verify_api_key
 
@@ -13,67 +36,431 @@ from app.dependencies import verify_api_key
 router = APIRouter(prefix="/api/organizations", tags=["Organizations"])
 
 
-@router.get("/in_building/{building_id}", response_model=List[OrganizationBase])
-@cache(expire=settings.REDIS_CACHE_TTL)
+PAGE_LIMIT = Query(20, ge=1, le=100, description="Размер страницы")
+PAGE_CURSOR = Query(None, description="Курсор следующей страницы из next_cursor")
+
+
+def organization_fields(
+    fields: Optional[str] = Query(
+        None, description="Поля организации через запятую, например id,name,phones (по умолчанию — обычный ответ)"
+    )
+) -> Optional[Fields]:
+    """Набор полей ответа из параметра fields= (входит в ключ кеша)"""
+    try:
+        return parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+
+FIELDS = Depends(organization_fields)
+
+
+
+@router.get("/in_building/{building_id}", response_model=Page[OrganizationBase])
+@cached(
+    expire=settings.REDIS_CACHE_TTL,
+    tags=lambda result, kw: [building_tag(kw["building_id"])]
+)
 async def get_orgs_in_building(
     building_id: int,
-    db: AsyncSession = Depends(get_db)
+    limit: int = PAGE_LIMIT,
+    cursor: Optional[str] = PAGE_CURSOR,
+    fields: Optional[Fields] = FIELDS,
+    db: AsyncSession = Depends(get_read_db)
     ):
     """Cписок всех организаций находящихся в конкретном здании"""
-    repo = Repository(db)
-    return await repo.get_organizations_in_building(building_id)
+    repo = SnapshotFallback(Repository(db), SnapshotRepository)
+    page = await repo.get_organizations_in_building(building_id, limit, cursor, fields)
+    return Page[organization_schema(fields) if fields else OrganizationBase].from_orm(page)
 
-@router.get("/by_activity/{activity_id}", response_model=List[OrganizationBase])
-@cache(expire=settings.REDIS_CACHE_TTL)
+@router.get("/by_activity/{activity_id}", response_model=Page[OrganizationBase])
+@cached(
+    expire=settings.REDIS_CACHE_TTL,
+    tags=lambda result, kw: {activity_tag(kw["activity_id"]), *building_tags(result.items)}
+)
 async def get_orgs_by_activity(
     activity_id: int,
-    db: AsyncSession = Depends(get_db)
+    limit: int = PAGE_LIMIT,
+    cursor: Optional[str] = PAGE_CURSOR,
+    fields: Optional[Fields] = FIELDS,
+    db: AsyncSession = Depends(get_read_db)
     ):
     """Cписок всех организаций, которые относятся к указанному виду деятельности"""
-    repo = Repository(db)
-    return await repo.get_organizations_by_activity(activity_id)
+    repo = SnapshotFallback(Repository(db), SnapshotRepository)
+    page = await repo.get_organizations_by_activity(activity_id, limit, cursor, fields)
+    return Page[organization_schema(fields) if fields else OrganizationBase].from_orm(page)
 
-@router.get("/in_rect", response_model=List[BuildingInRect])
-@cache(expire=settings.REDIS_CACHE_TTL)
+@router.get("/in_rect", response_model=Page[Union[BuildingWithOrganizations, BuildingInRect]])
+@cached(
+    expire=settings.REDIS_CACHE_TTL,
+    tags=lambda result, kw: geo_tags(kw["lat1"], kw["lon1"], kw["lat2"], kw["lon2"])
+)
 async def get_orgs_in_rect(
     lat1: float = Query(..., ge=-90, le=90),
     lon1: float = Query(..., ge=-180, le=180),
     lat2: float = Query(..., ge=-90, le=90),
     lon2: float = Query(..., ge=-180, le=180),
-    db: AsyncSession = Depends(get_db)
+    limit: int = PAGE_LIMIT,
+    cursor: Optional[str] = PAGE_CURSOR,
+    include: Optional[Literal["organizations"]] = Query(None, description="organizations — вместе с организациями зданий"),
+    db: AsyncSession = Depends(get_read_db)
     ):
     """Cписок организаций, которые находятся в заданном прямоугольной области 
     относительно указанной точки на карте.
     Cписок зданий"""
     repo = Repository(db)
-    return await repo.get_organizations_in_rect(lat1, lon1, lat2, lon2)
+    with_organizations = include == "organizations"
+    page = await repo.get_organizations_in_rect(
+        lat1, lon1, lat2, lon2, limit, cursor, include_organizations=with_organizations
+    )
+    schema = BuildingWithOrganizations if with_organizations else BuildingInRect
+    return Page[schema].from_orm(page)
+
+@router.get("/clusters", response_model=Clusters)
+@cached(
+    expire=settings.REDIS_CACHE_TTL,
+    tags=lambda result, kw: geo_tags(kw["lat1"], kw["lon1"], kw["lat2"], kw["lon2"])
+)
+async def get_clusters(
+    lat1: float = Query(..., ge=-90, le=90),
+    lon1: float = Query(..., ge=-180, le=180),
+    lat2: float = Query(..., ge=-90, le=90),
+    lon2: float = Query(..., ge=-180, le=180),
+    zoom: int = Query(..., ge=0, le=22, description="Зум веб-карты"),
+    activity_id: Optional[int] = Query(None, description="Только организации из поддерева вида деятельности"),
+    db: AsyncSession = Depends(get_read_db)
+    ):
+    """Кластеры зданий области для карты: центроид, число зданий и организаций по ячейкам,
+    размер которых зависит от зума. Если зданий немного — сами здания"""
+    cell_size = cluster_cell_size(zoom, settings.CLUSTER_CELL_PIXELS)
+    repo = ClusterRepository(db)
+    clusters, buildings = await repo.clusters(
+        (lat1, lon1, lat2, lon2), cell_size, settings.CLUSTER_BUILDINGS_THRESHOLD, activity_id
+    )
+    return Clusters(zoom=zoom, cell_size=cell_size, clusters=clusters, buildings=buildings)
+
+@router.get("/near", response_model=List[OrganizationDistance])
+@cached(
+    expire=settings.REDIS_CACHE_TTL,
+    tags=lambda result, kw: circle_geo_tags(kw["lat"], kw["lon"], kw["radius"])
+)
+async def get_orgs_near(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius: float = Query(..., gt=0, le=settings.NEAREST_MAX_RADIUS, description="Радиус в метрах"),
+    activity_id: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=100),
+    fields: Optional[Fields] = FIELDS,
+    db: AsyncSession = Depends(get_read_db)
+    ):
+    """Организации в радиусе от точки, отсортированные по расстоянию"""
+    repo = Repository(db)
+    rows = await repo.get_organizations_near(lat, lon, radius, limit, activity_id, fields)
+    schema = organization_distance_schema(fields) if fields else OrganizationDistance
+    return [schema.from_orm(row) for row in rows]
+
+@router.get("/nearest", response_model=List[OrganizationDistance])
+@cached(expire=settings.REDIS_CACHE_TTL, tags=lambda result, kw: [GEO_TAG])
+async def get_orgs_nearest(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    activity_id: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=100),
+    fields: Optional[Fields] = FIELDS,
+    db: AsyncSession = Depends(get_read_db)
+    ):
+    """Ближайшие к точке организации (k ближайших соседей)"""
+    repo = Repository(db)
+    rows = await repo.get_nearest_organizations(lat, lon, limit, activity_id, fields)
+    schema = organization_distance_schema(fields) if fields else OrganizationDistance
+    return [schema.from_orm(row) for row in rows]
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_organizations(
+    updated_since: Optional[datetime] = Query(None, description="Только изменённые начиная с даты"),
+    activity_id: Optional[int] = Query(None, description="Только организации из поддерева вида деятельности"),
+    db: AsyncSession = Depends(get_read_db)
+    ):
+    """Потоковая выгрузка всех организаций со связями в формате NDJSON"""
+    repo = Repository(db)
+    return StreamingResponse(
+        export_ndjson(repo, settings.EXPORT_BATCH_SIZE, updated_since, activity_id),
+        media_type="application/x-ndjson"
+    )
+
+@router.get("/batch", response_model=List[OrganizationBatchItem])
+async def get_organizations_by_ids(
+    ids: List[int] = Query(..., min_items=1, max_items=100, description="ID организаций: ?ids=1&ids=2"),
+    db: AsyncSession = Depends(get_read_db)
+    ):
+    """Пакетное получение организаций по списку ID (в порядке запроса, с отметкой ненайденных)"""
+    repo = SnapshotFallback(Repository(db), SnapshotRepository)
+    return json_response(await get_organizations_batch(repo, ids))
+
+def facet_tags(result, kw) -> List[str]:
+    rect = [kw[name] for name in ("lat1", "lon1", "lat2", "lon2")]
+    tags = geo_tags(*rect) if None not in rect else [GEO_TAG]
+    if kw["name"] is not None:
+        tags.append(SEARCH_TAG)
+    return tags
+
+@router.get("/facets", response_model=Facets)
+@cached(expire=settings.REDIS_CACHE_TTL, tags=facet_tags)
+async def get_facets(
+    lat1: Optional[float] = Query(None, ge=-90, le=90),
+    lon1: Optional[float] = Query(None, ge=-180, le=180),
+    lat2: Optional[float] = Query(None, ge=-90, le=90),
+    lon2: Optional[float] = Query(None, ge=-180, le=180),
+    name: Optional[str] = Query(None, min_length=2, max_length=100, description="Фильтр по названию организации"),
+    fuzzy: bool = Query(False, description="Поиск с учетом опечаток"),
+    db: AsyncSession = Depends(get_read_db)
+    ):
+    """Число организаций по видам деятельности (с учётом поддерева) и по зданиям
+    для области и/или названия. Без области — по всему справочнику, без зданий"""
+    rect = (lat1, lon1, lat2, lon2)
+    if None in rect and any(value is not None for value in rect):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="lat1, lon1, lat2, lon2 must be given together"
+        )
+    rect = rect if None not in rect else None
+    repo = FacetRepository(db)
+    activities = await repo.activity_counts(rect, name, fuzzy)
+    buildings = (
+        await repo.building_counts(rect, settings.FACETS_BUILDINGS_LIMIT, name, fuzzy) if rect is not None else []
+    )
+    return Facets(activities=activities, buildings=buildings)
+
+@router.get("/filter", response_model=Page[OrganizationBase])
+async def get_orgs_filtered(
+    activity_id: Optional[int] = Query(None, description="Вид деятельности (с учётом поддерева)"),
+    lat1: Optional[float] = Query(None, ge=-90, le=90),
+    lon1: Optional[float] = Query(None, ge=-180, le=180),
+    lat2: Optional[float] = Query(None, ge=-90, le=90),
+    lon2: Optional[float] = Query(None, ge=-180, le=180),
+    name: Optional[str] = Query(None, min_length=3, max_length=100, description="Подстрока названия (от 3 символов)"),
+    limit: int = PAGE_LIMIT,
+    cursor: Optional[str] = PAGE_CURSOR,
+    fields: Optional[Fields] = FIELDS,
+    db: AsyncSession = Depends(get_read_db)
+    ):
+    """Организации по любому сочетанию вида деятельности, области и названия.
+    Фильтры пересекаются битовым индексом в памяти; порядок — по ячейкам сетки"""
+    rect = (lat1, lon1, lat2, lon2)
+    if None in rect and any(value is not None for value in rect):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="lat1, lon1, lat2, lon2 must be given together"
+        )
+    repo = Repository(db)
+    page = await filter_organizations(
+        repo, filter_index, fields or tuple(OrganizationBase.__fields__), limit, cursor,
+        activity_id, rect if None not in rect else None, name
+    )
+    return json_response(encode_json(Page[organization_schema(fields) if fields else OrganizationBase].from_orm(page)))
+
+def search_tags(result, kw) -> Set[str]:
+    tags = {SEARCH_TAG}
+    rect = [kw[name] for name in ("lat1", "lon1", "lat2", "lon2")]
+    if None not in rect:
+        tags.update(geo_tags(*rect))
+    if kw["radius"] is not None:
+        tags.update(circle_geo_tags(kw["lat"], kw["lon"], kw["radius"]))
+    tags.update(building_tags(result.items))
+    return tags
+
+@router.get("/search", response_model=Page[OrganizationBase])
+@cached(expire=settings.REDIS_CACHE_TTL, tags=search_tags)
+async def search(
+    name: Optional[str] = Query(None, min_length=2, max_length=100, description="Подстрока названия организации"),
+    fuzzy: bool = Query(False, description="Поиск с учетом опечаток (название и виды деятельности)"),
+    activity_id: List[int] = Query([], max_items=20, description="Виды деятельности с поддеревом: ?activity_id=1&activity_id=2"),
+    activity: List[str] = Query([], max_items=5, description="Названия видов деятельности: все подходящие узлы с поддеревом"),
+    building_id: Optional[int] = None,
+    lat1: Optional[float] = Query(None, ge=-90, le=90),
+    lon1: Optional[float] = Query(None, ge=-180, le=180),
+    lat2: Optional[float] = Query(None, ge=-90, le=90),
+    lon2: Optional[float] = Query(None, ge=-180, le=180),
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
+    radius: Optional[float] = Query(None, gt=0, le=settings.NEAREST_MAX_RADIUS, description="Радиус в метрах"),
+    order: Optional[Literal["id", "relevance", "distance"]] = Query(
+        None, description="По умолчанию relevance при name, иначе distance при радиусе, иначе id"
+    ),
+    limit: int = PAGE_LIMIT,
+    cursor: Optional[str] = PAGE_CURSOR,
+    fields: Optional[Fields] = FIELDS,
+    db: AsyncSession = Depends(get_read_db)
+    ):
+    """Поиск организаций по любому сочетанию фильтров (условия объединяются через И,
+    несколько видов деятельности — через ИЛИ) одним запросом к БД"""
+    rect = (lat1, lon1, lat2, lon2)
+    point = (lat, lon, radius)
+    for group, names in ((rect, "lat1, lon1, lat2, lon2"), (point, "lat, lon, radius")):
+        if None in group and any(value is not None for value in group):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"{names} must be given together"
+            )
+    if any(len(value.strip()) < 2 for value in activity):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="activity must be at least 2 characters"
+        )
+
+    filters = SearchFilters(
+        name=name,
+        fuzzy=fuzzy,
+        activity_ids=activity_id,
+        activity_names=[value.strip() for value in activity],
+        building_id=building_id,
+        rect=rect if None not in rect else None,
+        point=point if None not in point else None
+    )
+    if order is None:
+        order = "relevance" if name is not None else "distance" if filters.point is not None else "id"
+    elif order == "relevance" and name is None:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="order=relevance requires name")
+    elif order == "distance" and filters.point is None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="order=distance requires lat, lon, radius"
+        )
+
+    repo = Repository(db)
+    page = await repo.search_organizations(filters, order, limit, cursor, fields)
+    return Page[organization_schema(fields) if fields else OrganizationBase].from_orm(page)
 
 @router.get("/{org_id}", response_model=OrganizationFull)
-@cache(expire=settings.REDIS_CACHE_TTL)
+@cached(
+    expire=settings.REDIS_CACHE_TTL,
+    namespace=ORGANIZATION_NAMESPACE,
+    key_builder=organization_key_builder,
+    tags=lambda result, kw: {organization_tag(kw["org_id"]), *building_tags([result])}
+)
 async def get_organization(
     org_id: int,
-    db: AsyncSession = Depends(get_db)
+    fields: Optional[Fields] = FIELDS,
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Вывод информации об организации по её идентификатору"""
-    repo = Repository(db)
-    return await repo.get_organization(org_id)
+    if fields is None and settings.ORGANIZATION_DOCUMENTS_ENABLED:
+        # Документа может не быть, пока таблица не перестроена, — тогда из таблиц
+        document = await SnapshotFallback(DocumentRepository(db), SnapshotDocuments).get(org_id)
+        if document is not None:
+            return document
+    repo = SnapshotFallback(Repository(db), SnapshotRepository)
+    org = await repo.get_organization(org_id, fields)
+    if org is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Organization not found")
+    return (organization_schema(fields) if fields else OrganizationFull).from_orm(org)
 
-@router.get("/search/by_activity_name", response_model=List[OrganizationWithActivities])
-@cache(expire=settings.REDIS_CACHE_TTL)
+@router.get("/search/by_activity_name", response_model=Page[OrganizationWithActivities])
+@cached(
+    expire=settings.REDIS_CACHE_TTL,
+    tags=lambda result, kw: {SEARCH_TAG, *building_tags(result.items)}
+)
 async def search_organizations(
     activity_name: str = Query(..., min_length=2, max_length=100),
-    db: AsyncSession = Depends(get_db)
+    limit: int = PAGE_LIMIT,
+    cursor: Optional[str] = PAGE_CURSOR,
+    fuzzy: bool = Query(False, description="Поиск с учетом опечаток"),
+    fields: Optional[Fields] = FIELDS,
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Поиск по виду деятельности"""
     repo = Repository(db)
-    return await repo.search_organizations_by_activity(activity_name)
+    page = await repo.search_organizations_by_activity(activity_name, limit, cursor, fuzzy, fields)
+    return Page[organization_schema(fields) if fields else OrganizationWithActivities].from_orm(page)
 
-@router.get("/search/by_name/{org_name}", response_model=List[OrganizationBase])
-@cache(expire=settings.REDIS_CACHE_TTL)
+@router.get("/search/by_name/{org_name}", response_model=Page[OrganizationBase])
+@cached(
+    expire=settings.REDIS_CACHE_TTL,
+    tags=lambda result, kw: {SEARCH_TAG, *building_tags(result.items)}
+)
 async def search_organizations_by_name(
     org_name: str,
-    db: AsyncSession = Depends(get_db)
+    limit: int = PAGE_LIMIT,
+    cursor: Optional[str] = PAGE_CURSOR,
+    fuzzy: bool = Query(False, description="Поиск с учетом опечаток"),
+    fields: Optional[Fields] = FIELDS,
+    db: AsyncSession = Depends(get_read_db)
     ):
-    """Поиск организаций по названию (регистронезависимый)"""
+    """Поиск организаций по названию (регистронезависимый), наиболее похожие первыми"""
     repo = Repository(db)
-    return await repo.search_organizations_by_name(org_name)
+    page = await repo.search_organizations_by_name(org_name, limit, cursor, fuzzy, fields)
+    return Page[organization_schema(fields) if fields else OrganizationBase].from_orm(page)
+
+# ========== Запись ==========
+@router.post("", response_model=OrganizationFull, status_code=status.HTTP_201_CREATED)
+async def create_organization(
+    data: OrganizationCreate,
+    db: AsyncSession = Depends(get_db)
+    ):
+    """Создание организации с телефонами и видами деятельности"""
+    writer = WriteRepository(db)
+    org = await writer.create_organization(data.name, data.building_id, data.phones, data.activity_ids)
+    await commit_changes(db, writer.changes)
+    return OrganizationFull.from_orm(org)
+
+@router.patch("/{org_id}", response_model=OrganizationFull)
+async def update_organization(
+    org_id: int,
+    data: OrganizationUpdate,
+    db: AsyncSession = Depends(get_db)
+    ):
+    """Изменение названия или здания организации"""
+    writer = WriteRepository(db)
+    org = await writer.update_organization(org_id, data.dict(exclude_unset=True, exclude_none=True))
+    await commit_changes(db, writer.changes)
+    return OrganizationFull.from_orm(org)
+
+@router.delete("/{org_id}", status_code=status.HTTP_204_NO_CONTENT, response_class=Response)
+async def delete_organization(
+    org_id: int,
+    db: AsyncSession = Depends(get_db)
+    ):
+    """Удаление организации"""
+    writer = WriteRepository(db)
+    await writer.delete_organization(org_id)
+    await commit_changes(db, writer.changes)
+
+@router.post("/{org_id}/phones", response_model=Phone, status_code=status.HTTP_201_CREATED)
+async def add_phone(
+    org_id: int,
+    data: PhoneBase,
+    db: AsyncSession = Depends(get_db)
+    ):
+    """Добавление телефона организации"""
+    writer = WriteRepository(db)
+    phone = await writer.add_phone(org_id, data.number)
+    await commit_changes(db, writer.changes)
+    return Phone.from_orm(phone)
+
+@router.delete("/{org_id}/phones/{phone_id}", status_code=status.HTTP_204_NO_CONTENT, response_class=Response)
+async def delete_phone(
+    org_id: int,
+    phone_id: int,
+    db: AsyncSession = Depends(get_db)
+    ):
+    """Удаление телефона организации"""
+    writer = WriteRepository(db)
+    await writer.delete_phone(org_id, phone_id)
+    await commit_changes(db, writer.changes)
+
+@router.put("/{org_id}/activities/{activity_id}", status_code=status.HTTP_204_NO_CONTENT, response_class=Response)
+async def link_activity(
+    org_id: int,
+    activity_id: int,
+    db: AsyncSession = Depends(get_db)
+    ):
+    """Привязка вида деятельности к организации"""
+    writer = WriteRepository(db)
+    await writer.link_activity(org_id, activity_id)
+    await commit_changes(db, writer.changes)
+
+@router.delete("/{org_id}/activities/{activity_id}", status_code=status.HTTP_204_NO_CONTENT, response_class=Response)
+async def unlink_activity(
+    org_id: int,
+    activity_id: int,
+    db: AsyncSession = Depends(get_db)
+    ):
+    """Отвязка вида деятельности от организации"""
+    writer = WriteRepository(db)
+    await writer.unlink_activity(org_id, activity_id)
+    await commit_changes(db, writer.changes)
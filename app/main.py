@@ -1,14 +1,26 @@
-from fastapi_cache import FastAPICache
-from fastapi_cache.backends.redis import RedisBackend
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
 from redis import asyncio as aioredis
+from sqlalchemy.exc import IntegrityError
 from app.db import database
-from app.endpoints import organizations
+from app.endpoints import organizations, buildings
 from app.dependencies import dependencies
+from app.repository.pagination import InvalidCursor
+from app.repository.exceptions import EntityNotFound, EntityConflict
+from app.repository.snapshot import snapshot_store
+from app.cache import response_cache
+from app.cache.conditional import ConditionalGetMiddleware
+from app.services.facets import run_facet_refresh
+from app.services.warmup import run_warmup, warmup_state
+from app.monitoring import (
+    PrometheusMiddleware, ProfilingMiddleware, instrument_cache, instrument_engine, instrument_replicas,
+    metrics_response
+)
 from app.config import settings
 from contextlib import asynccontextmanager
 from typing import AsyncIterator
+import asyncio
 import logging
 
 # Настройка логирования
@@ -27,12 +39,48 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     redis = aioredis.from_url(
         f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}",
         encoding="utf8",
-        decode_responses=True
+        decode_responses=False  # В кеше хранятся bytes
     )
-    FastAPICache.init(RedisBackend(redis), prefix="fastapi-cache")
+    response_cache.connect(redis)
+    invalidation_listener = asyncio.create_task(response_cache.listen_invalidations())
     logger.info("Redis cache initialized")
     logger.info("Starting application in %s mode", settings.APP_ENV)
-    await database.init_db()
+    if settings.DB_INIT_ON_STARTUP:
+        await database.init_db()
+
+    # Прогрев кеша: до его завершения /ready отвечает 503
+    warmup = None
+    if settings.WARMUP_ENABLED:
+        warmup = asyncio.create_task(run_warmup(
+            database.read_router.session,
+            settings.WARMUP_ORGANIZATION_IDS,
+            settings.WARMUP_BUILDING_IDS,
+            settings.WARMUP_ACCESS_LOG,
+            settings.WARMUP_TOP_N,
+            settings.WARMUP_CONCURRENCY,
+            settings.WARMUP_TIMEOUT,
+            cache_enabled=settings.CACHE_ENABLED
+        ))
+    else:
+        warmup_state.ready = True
+
+    # Пересчёт фасетов по изменившимся ячейкам
+    facet_refresh = None
+    if settings.FACETS_REFRESH_INTERVAL > 0:
+        facet_refresh = asyncio.create_task(run_facet_refresh(
+            database.AsyncSessionLocal, settings.FACETS_REFRESH_INTERVAL, settings.FACETS_REFRESH_BATCH
+        ))
+
+    # Резервный снимок для чтения при недоступной БД: отображается сразу,
+    # чтобы повреждённый файл был виден в логе при старте, а не при аварии
+    if settings.SNAPSHOT_PATH and snapshot_store.current() is None:
+        logger.warning("Snapshot %s is not available yet, reads have no fallback", settings.SNAPSHOT_PATH)
+
+    # Проверка реплик для чтения
+    replica_health = None
+    if database.read_router.replicas:
+        replica_health = asyncio.create_task(database.read_router.run_health_checks())
+        logger.info("Read replicas: %d", len(database.read_router.replicas))
 
     if settings.DEBUG:
         logger.warning("Приложение запущено в DEBUG режиме!")
@@ -42,6 +90,15 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
 
     # Shutdown логика (при необходимости)
     logger.info("Shutting down application")
+    invalidation_listener.cancel()
+    if warmup is not None:
+        warmup.cancel()
+    if replica_health is not None:
+        replica_health.cancel()
+    if facet_refresh is not None:
+        facet_refresh.cancel()
+    await database.read_router.dispose()
+    await redis.close()
 
 app = FastAPI(
     title="Organization Directory API",
@@ -49,6 +106,7 @@ app = FastAPI(
     version="1.0.0",
     debug=settings.DEBUG,
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     dependencies=[Depends(dependencies.verify_api_key)] if not settings.DEBUG else None
 )
 
@@ -61,8 +119,41 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Условные GET (ETag/Last-Modified → 304) и Cache-Control для эндпоинтов организаций
+app.add_middleware(ConditionalGetMiddleware)
+
+# Профилирование SQL (Server-Timing, N+1, планы медленных запросов).
+# Добавляется раньше — значит, работает внутри PrometheusMiddleware
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware, engine=database.engine)
+
+# Метрики Prometheus: HTTP по маршрутам, SQL, пул соединений, кеш
+app.add_middleware(PrometheusMiddleware)
+instrument_engine(database.engine)
+instrument_replicas(database.read_router)
+instrument_cache(response_cache)
+
 # Подключение роутеров
 app.include_router(organizations.router)
+app.include_router(buildings.router)
+
+@app.exception_handler(InvalidCursor)
+async def invalid_cursor_handler(request, exc: InvalidCursor):
+    """Повреждённый курсор пагинации — ошибка клиента"""
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+@app.exception_handler(EntityNotFound)
+async def entity_not_found_handler(request, exc: EntityNotFound):
+    return JSONResponse(status_code=404, content={"detail": str(exc)})
+
+@app.exception_handler(EntityConflict)
+async def entity_conflict_handler(request, exc: EntityConflict):
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
+
+@app.exception_handler(IntegrityError)
+async def integrity_error_handler(request, exc: IntegrityError):
+    """Нарушение ограничений БД, не пойманное проверками (например, гонка двух записей)"""
+    return JSONResponse(status_code=409, content={"detail": "Data integrity violation"})
 
 @app.get("/health")
 async def health_check():
@@ -73,3 +164,19 @@ async def health_check():
         "debug": settings.DEBUG,
         "redis_status": "enabled" if settings.REDIS_HOST else "disabled"
     }
+
+@app.get("/ready")
+async def readiness_check():
+    """Готовность принимать трафик: 503, пока идёт прогрев кеша"""
+    state = warmup_state.snapshot()
+    return JSONResponse(status_code=200 if state["ready"] else 503, content=state)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Счётчики попаданий и промахов кеша по уровням"""
+    return response_cache.stats_snapshot()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики в формате Prometheus"""
+    return metrics_response()
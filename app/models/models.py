@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Float, Table, DateTime
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Float, Table, DateTime, Index
 from sqlalchemy.orm import relationship, declarative_base
 from datetime import datetime
 
@@ -12,6 +12,36 @@ organization_activity = Table(
     Column('activity_id', Integer, ForeignKey('activities.id'), primary_key=True)
 )
 
+# Предрасчитанные фасеты: число организаций в ячейке сетки по каждому узлу
+# дерева видов деятельности (с учётом поддерева). Ведутся триггерами через
+# facet_dirty_cells и фоновым пересчётом, см. app.repository.facets
+activity_cell_counts = Table(
+    'activity_cell_counts',
+    Base.metadata,
+    Column('grid_cell', Integer, primary_key=True),
+    Column('activity_id', Integer, primary_key=True),
+    Column('organizations', Integer, nullable=False)
+)
+
+# Ячейки, в которых данные изменились после последнего пересчёта фасетов
+facet_dirty_cells = Table(
+    'facet_dirty_cells',
+    Base.metadata,
+    Column('grid_cell', Integer, primary_key=True)
+)
+
+# Read-model: готовая карточка организации (JSON OrganizationFull) на строку.
+# Ведётся путём записи при ORGANIZATION_DOCUMENTS_ENABLED, см. app.repository.documents.
+# Без внешнего ключа: документ удаляется в той же транзакции после удаления организации
+organization_documents = Table(
+    'organization_documents',
+    Base.metadata,
+    Column('organization_id', Integer, primary_key=True),
+    Column('building_id', Integer, nullable=False),
+    Column('document', Text, nullable=False),
+    Column('rendered_at', DateTime, nullable=False, default=datetime.now)
+)
+
 class Building(Base):
     __tablename__ = 'buildings'
 
@@ -19,8 +49,14 @@ class Building(Base):
     address = Column(String, unique=True, index=True)
     latitude = Column(Float)
     longitude = Column(Float)
+    # Номер ячейки пространственной сетки, заполняется триггером в БД
+    grid_cell = Column(Integer)
     organizations = relationship("Organization", back_populates="building")
 
+    __table_args__ = (
+        Index('ix_buildings_grid_cell_coords', 'grid_cell', 'latitude', 'longitude'),
+    )
+
 class Activity(Base):
     __tablename__ = 'activities'
 
@@ -46,12 +82,16 @@ class Activity(Base):
         back_populates="activities"
     )
 
+    __table_args__ = (
+        Index('ix_activities_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
+
 class Organization(Base):
     __tablename__ = 'organizations'
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
-    building_id = Column(Integer, ForeignKey('buildings.id'))
+    building_id = Column(Integer, ForeignKey('buildings.id'), index=True)
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
 
@@ -63,6 +103,10 @@ class Organization(Base):
         back_populates="organizations"
     )
 
+    __table_args__ = (
+        Index('ix_organizations_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
+
 
 class Phone(Base):
     __tablename__ = 'phones'
@@ -0,0 +1,5 @@
+from .context import RequestStats, current_stats
+from .metrics import instrument_cache, metrics_response
+from .database import instrument_engine, instrument_replicas
+from .middleware import PrometheusMiddleware
+from .profiler import ProfilingMiddleware
@@ -0,0 +1,61 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, DefaultDict, Iterator, List, NamedTuple, Optional
+import time
+
+
+class StatementTiming(NamedTuple):
+    statement: str
+    parameters: Any
+    duration: float  # В секундах
+
+
+@dataclass
+class RequestStats:
+    """Счётчики текущего запроса; заполняются событиями движка и кеша"""
+    route: str
+    queries: int = 0
+    # Суммарное время по компонентам (db, cache, serialize), в секундах
+    timings: DefaultDict[str, float] = field(default_factory=lambda: defaultdict(float))
+    # Заполняется только в режиме профилирования (PROFILING_ENABLED)
+    statements: Optional[List[StatementTiming]] = None
+    # Ответ собран из резервного снимка (БД недоступна) — его нельзя кешировать
+    degraded: bool = False
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    """Статистика запроса, в контексте которого выполняется код (None вне HTTP-запроса)"""
+    return _request_stats.get()
+
+
+def start_request(route: str):
+    return _request_stats.set(RequestStats(route))
+
+
+def finish_request(token) -> None:
+    _request_stats.reset(token)
+
+
+def detach_request() -> None:
+    """Отвязка фоновой задачи от запроса, в контексте которого она создана"""
+    _request_stats.set(None)
+
+
+@contextmanager
+def timed(component: str, histogram=None) -> Iterator[None]:
+    """Замер блока: в гистограмму Prometheus и в сумму компонента текущего запроса"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if histogram is not None:
+            histogram.observe(elapsed)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.timings[component] += elapsed
@@ -0,0 +1,97 @@
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import Pool
+from app.db.replicas import CONNECTION_REQUESTED
+from app.monitoring.context import StatementTiming, current_stats
+from app.monitoring.metrics import (
+    DB_QUERIES, DB_QUERY_DURATION, DB_POOL_CHECKOUT_DURATION, DB_POOL_CONNECTION_HELD, POOL_COLLECTOR,
+    instrument_read_router
+)
+from typing import Any, Dict
+import time
+
+# Запросы вне HTTP-запроса (фоновые задачи, прогрев, CLI)
+BACKGROUND_ROUTE = "background"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = current_stats()
+    route = stats.route if stats is not None else BACKGROUND_ROUTE
+    DB_QUERIES.labels(route).inc()
+    DB_QUERY_DURATION.labels(route).observe(elapsed)
+    if stats is not None:
+        stats.queries += 1
+        stats.timings["db"] += elapsed
+        if stats.statements is not None:
+            stats.statements.append(StatementTiming(statement, parameters, elapsed))
+
+
+def _handle_error(exception_context):
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def _instrument_pool(name: str, pool) -> None:
+    held = DB_POOL_CONNECTION_HELD.labels(name)
+
+    @event.listens_for(pool, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+
+    @event.listens_for(pool, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        if checked_out_at is not None:
+            held.observe(time.perf_counter() - checked_out_at)
+
+    _pool_waits[pool] = DB_POOL_CHECKOUT_DURATION.labels(name)
+    POOL_COLLECTOR.add(name, pool)
+
+
+# Ожидание соединения: у пула нет события «начали ждать», поэтому начало отмечается
+# в сессии до получения соединения (do_orm_execute без открытой транзакции или явное
+# открытие в ReadRouter), а конец — событием after_begin с уже выданным соединением
+_pool_waits: Dict[Pool, Any] = {}
+
+
+def _before_orm_execute(orm_execute_state):
+    session = orm_execute_state.session
+    if not session.in_transaction():
+        session.info[CONNECTION_REQUESTED] = time.perf_counter()
+
+
+def _after_begin(session, transaction, connection):
+    requested = session.info.pop(CONNECTION_REQUESTED, None)
+    histogram = _pool_waits.get(connection.engine.pool)
+    if requested is not None and histogram is not None:
+        histogram.observe(time.perf_counter() - requested)
+
+
+def instrument_engine(engine: AsyncEngine, name: str = "primary") -> None:
+    """Подключение метрик запросов и пула к движку (один раз на процесс)"""
+    sync_engine = engine.sync_engine
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+    if not event.contains(Session, "after_begin", _after_begin):
+        event.listen(Session, "do_orm_execute", _before_orm_execute)
+        event.listen(Session, "after_begin", _after_begin)
+
+    _instrument_pool(name, sync_engine.pool)
+
+
+def instrument_replicas(router) -> None:
+    """Метрики пулов всех реплик и их состояния"""
+    for replica in router.replicas:
+        instrument_engine(replica.engine, name=replica.name)
+    instrument_read_router(router)
@@ -0,0 +1,132 @@
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from starlette.responses import Response
+from typing import Iterator
+
+# Границы корзин под API с кешем: попадания — единицы миллисекунд,
+# промахи с запросами к БД — десятки и сотни
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP-запросы", ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса", ["method", "route"],
+    buckets=LATENCY_BUCKETS
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP-запросы в обработке", ["method", "route"]
+)
+
+DB_QUERIES = Counter(
+    "db_queries_total", "SQL-запросы по маршрутам", ["route"]
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "Время выполнения SQL-запроса", ["route"],
+    buckets=LATENCY_BUCKETS
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "Число SQL-запросов на HTTP-запрос", ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+)
+DB_REPEATED_STATEMENTS = Counter(
+    "db_repeated_statements_total", "Формы SQL, повторённые за запрос (вероятный N+1; при PROFILING_ENABLED)", ["route"]
+)
+DB_POOL_CHECKOUT_DURATION = Histogram(
+    "db_pool_checkout_seconds", "Ожидание соединения из пула", ["pool"],
+    buckets=LATENCY_BUCKETS
+)
+DB_POOL_CONNECTION_HELD = Histogram(
+    "db_pool_connection_held_seconds", "Время удержания соединения из пула", ["pool"],
+    buckets=LATENCY_BUCKETS
+)
+
+CACHE_OPERATION_DURATION = Histogram(
+    "cache_redis_operation_seconds", "Время операций с Redis", ["operation"],
+    buckets=LATENCY_BUCKETS
+)
+
+SNAPSHOT_FALLBACK_READS = Counter(
+    "snapshot_fallback_reads_total", "Чтения из резервного снимка при недоступной БД", ["method"]
+)
+
+
+class PoolCollector:
+    """Состояние пулов соединений на момент сбора метрик (по движку на метку pool)"""
+
+    def __init__(self):
+        self.pools = {}
+
+    def add(self, name: str, pool) -> None:
+        self.pools[name] = pool
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        families = [
+            (GaugeMetricFamily("db_pool_size", "Размер пула", labels=["pool"]), "size"),
+            (GaugeMetricFamily("db_pool_checked_out", "Выданные соединения", labels=["pool"]), "checkedout"),
+            (GaugeMetricFamily("db_pool_checked_in", "Свободные соединения в пуле", labels=["pool"]), "checkedin"),
+            (GaugeMetricFamily("db_pool_overflow", "Соединения сверх размера пула", labels=["pool"]), "overflow"),
+        ]
+        for family, method in families:
+            for name, pool in self.pools.items():
+                # У NullPool/StaticPool нет счётчиков QueuePool
+                if hasattr(pool, method):
+                    family.add_metric([name], getattr(pool, method)())
+            yield family
+
+
+POOL_COLLECTOR = PoolCollector()
+REGISTRY.register(POOL_COLLECTOR)
+
+
+class ReplicaCollector:
+    """Состояние реплик для чтения: здоровье, отставание, активные сессии"""
+
+    def __init__(self, router):
+        self.router = router
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        healthy = GaugeMetricFamily("db_replica_healthy", "Реплика принимает запросы", labels=["replica"])
+        lag = GaugeMetricFamily("db_replica_lag_seconds", "Отставание реплики", labels=["replica"])
+        in_use = GaugeMetricFamily("db_replica_sessions", "Активные сессии на реплике", labels=["replica"])
+        for replica in self.router.replicas:
+            healthy.add_metric([replica.name], int(replica.healthy))
+            in_use.add_metric([replica.name], replica.in_use)
+            if replica.lag is not None:
+                lag.add_metric([replica.name], replica.lag)
+        yield from (healthy, lag, in_use)
+
+
+class CacheCollector:
+    """Счётчики TieredCache.stats в формате Prometheus"""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def collect(self) -> Iterator:
+        stats = self.cache.stats
+        requests = CounterMetricFamily("cache_requests", "Обращения к кешу", labels=["tier", "result"])
+        for tier in ("local", "redis"):
+            requests.add_metric([tier, "hit"], stats[f"{tier}_hits"])
+            requests.add_metric([tier, "miss"], stats[f"{tier}_misses"])
+        yield requests
+        for name, doc, key in (
+            ("cache_coalesced", "Запросы, дождавшиеся чужого вычисления ключа", "coalesced"),
+            ("cache_early_refreshes", "Досрочные пересчёты (XFetch)", "early_refreshes"),
+            ("cache_invalidated_keys", "Сброшенные инвалидацией ключи", "invalidated"),
+            ("cache_redis_errors", "Ошибки Redis", "redis_errors"),
+        ):
+            yield CounterMetricFamily(name, doc, value=stats[key])
+        yield GaugeMetricFamily("cache_local_entries", "Ключи в локальном уровне", value=len(self.cache.local))
+
+
+def instrument_cache(cache) -> None:
+    REGISTRY.register(CacheCollector(cache))
+
+
+def instrument_read_router(router) -> None:
+    REGISTRY.register(ReplicaCollector(router))
+
+
+def metrics_response() -> Response:
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
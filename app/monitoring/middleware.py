@@ -0,0 +1,59 @@
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.monitoring.context import current_stats, start_request, finish_request
+from app.monitoring.metrics import (
+    HTTP_REQUESTS, HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_PROGRESS, DB_QUERIES_PER_REQUEST
+)
+import time
+
+# Все пути без маршрута (404, сканеры) идут под одной меткой,
+# иначе каждый случайный URL создаёт новый временной ряд
+UNMATCHED_ROUTE = "unmatched"
+
+
+def route_template(scope: Scope) -> str:
+    """Шаблон пути маршрута (/api/organizations/{org_id}) вместо фактического URL"""
+    for route in scope["app"].routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return UNMATCHED_ROUTE
+
+
+class PrometheusMiddleware:
+    """Метрики HTTP-запросов по шаблонам маршрутов.
+
+    ASGI-middleware, а не BaseHTTPMiddleware: потоковые ответы (/export)
+    проходят без буферизации, а время включает отдачу всего тела.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(scope)
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method, route)
+        in_progress.inc()
+        token = start_request(route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUEST_DURATION.labels(method, route).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(method, route, str(status_code)).inc()
+            DB_QUERIES_PER_REQUEST.labels(route).observe(current_stats().queries)
+            in_progress.dec()
+            finish_request(token)
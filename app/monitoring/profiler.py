@@ -0,0 +1,119 @@
+from collections import Counter
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.config import settings
+from app.monitoring.context import RequestStats, StatementTiming, current_stats, detach_request
+from app.monitoring.metrics import DB_REPEATED_STATEMENTS
+from typing import List, Sequence, Set, Tuple
+import asyncio
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+_PARAMETER_LIST = re.compile(r"(?:%s|\$\d+|\?)(?:\s*,\s*(?:%s|\$\d+|\?))*")
+_WHITESPACE = re.compile(r"\s+")
+_READ_ONLY = re.compile(r"^\s*(select|with)\b", re.IGNORECASE)
+_DATA_MODIFYING = re.compile(r"\b(insert|update|delete|merge)\b", re.IGNORECASE)
+
+
+def statement_shape(statement: str) -> str:
+    """Форма запроса без значений: списки параметров IN разной длины сводятся к одному"""
+    return _WHITESPACE.sub(" ", _PARAMETER_LIST.sub("?", statement)).strip()
+
+
+def repeated_shapes(statements: Sequence[StatementTiming], threshold: int) -> List[Tuple[str, int]]:
+    """Формы, выполненные за запрос не меньше threshold раз — вероятный N+1"""
+    counts = Counter(statement_shape(item.statement) for item in statements)
+    return [(shape, count) for shape, count in counts.most_common() if count >= threshold]
+
+
+def server_timing(stats: RequestStats) -> bytes:
+    """Значение заголовка Server-Timing: db, cache, serialize в миллисекундах"""
+    parts = [b'db;dur=%.1f;desc="%d queries"' % (stats.timings["db"] * 1000, stats.queries)]
+    for component in ("cache", "serialize"):
+        parts.append(b"%s;dur=%.1f" % (component.encode(), stats.timings[component] * 1000))
+    return b", ".join(parts)
+
+
+def slow_statements(statements: Sequence[StatementTiming], threshold: float, limit: int) -> List[StatementTiming]:
+    """Самые медленные читающие запросы дольше threshold секунд, без повторов формы"""
+    seen: Set[str] = set()
+    result = []
+    for item in sorted(statements, key=lambda item: item.duration, reverse=True):
+        if item.duration < threshold or len(result) >= limit:
+            break
+        shape = statement_shape(item.statement)
+        # EXPLAIN ANALYZE выполняет запрос — только для SELECT без изменяющих CTE
+        if shape in seen or not _READ_ONLY.match(item.statement) or _DATA_MODIFYING.search(item.statement):
+            continue
+        seen.add(shape)
+        result.append(item)
+    return result
+
+
+async def explain_statements(engine: AsyncEngine, route: str, statements: Sequence[StatementTiming]) -> None:
+    """Запись в лог планов EXPLAIN ANALYZE для медленных запросов (вне обработки HTTP-запроса)"""
+    detach_request()
+    for item in statements:
+        try:
+            async with engine.connect() as conn:
+                result = await conn.exec_driver_sql(
+                    "EXPLAIN (ANALYZE, BUFFERS) " + item.statement, item.parameters
+                )
+                plan = "\n".join(row[0] for row in result)
+                await conn.rollback()
+        except Exception:
+            logger.warning("EXPLAIN failed for slow statement on %s", route, exc_info=True)
+            continue
+        logger.warning(
+            "Slow statement on %s (%.1f ms):\n%s\n%s", route, item.duration * 1000, item.statement, plan
+        )
+
+
+class ProfilingMiddleware:
+    """Профилирование SQL каждого запроса (включается PROFILING_ENABLED).
+
+    Подключается внутри PrometheusMiddleware и дополняет её статистику
+    запроса списком выполненных statement'ов. В ответ добавляется
+    Server-Timing (время БД, Redis и сериализации), повторяющиеся формы
+    запросов логируются как вероятный N+1, а планы медленных SELECT
+    снимаются фоновой задачей, не задерживая ответ.
+    """
+
+    def __init__(self, app: ASGIApp, engine: AsyncEngine):
+        self.app = app
+        self.engine = engine
+        self._background: Set[asyncio.Task] = set()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        stats = current_stats()
+        if scope["type"] != "http" or stats is None:
+            await self.app(scope, receive, send)
+            return
+
+        stats.statements = []
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"server-timing", server_timing(stats))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self._report(stats)
+
+    def _report(self, stats: RequestStats) -> None:
+        for shape, count in repeated_shapes(stats.statements, settings.PROFILING_REPEAT_THRESHOLD):
+            DB_REPEATED_STATEMENTS.labels(stats.route).inc()
+            logger.warning("Probable N+1 on %s: %d executions of %s", stats.route, count, shape)
+
+        slow = slow_statements(
+            stats.statements, settings.PROFILING_SLOW_QUERY_MS / 1000, settings.PROFILING_EXPLAIN_LIMIT
+        )
+        if slow:
+            task = asyncio.create_task(explain_statements(self.engine, stats.route, slow))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
@@ -1 +1,2 @@
-from .repository import Repository
\ No newline at end of file
+from .repository import Repository
+from .activity_tree import ActivityTree, activity_tree
\ No newline at end of file
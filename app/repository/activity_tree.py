@@ -0,0 +1,152 @@
+from sqlalchemy.future import select
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Activity
+from app.config import settings
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+Version = Tuple[int, int, int]
+
+
+class ActivityTree:
+    """Индекс иерархии видов деятельности в памяти процесса.
+
+    Таблица activities загружается целиком одним запросом. Узлы обходятся
+    в глубину (эйлеров обход): все потомки узла образуют непрерывный отрезок
+    [tin, tout) массива обхода, поэтому поддерево каждого узла
+    предвычисляется один раз и дальше выдаётся за O(1) без обращений к БД.
+    """
+
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self._parent: Dict[int, Optional[int]] = {}
+        self._tin: Dict[int, int] = {}
+        self._tout: Dict[int, int] = {}
+        self._subtree: Dict[int, Tuple[int, ...]] = {}
+        self._version: Optional[Version] = None
+        self._checked_at: float = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._version is not None
+
+    @property
+    def version(self) -> Optional[Version]:
+        return self._version
+
+    def invalidate(self) -> None:
+        """Принудительная проверка версии при следующем обращении"""
+        self._checked_at = 0.0
+
+    async def ensure_fresh(self, session: AsyncSession) -> "ActivityTree":
+        """Перезагрузка индекса, если изменилась версия таблицы activities.
+
+        Версия проверяется не чаще одного раза в refresh_interval секунд,
+        в остальное время метод не обращается к БД.
+        """
+        if self.loaded and time.monotonic() - self._checked_at < self.refresh_interval:
+            return self
+
+        async with self._lock:
+            if self.loaded and time.monotonic() - self._checked_at < self.refresh_interval:
+                return self
+
+            version = await self._fetch_version(session)
+            if version != self._version:
+                result = await session.execute(select(Activity.id, Activity.parent_id))
+                self._build(result.all())
+                self._version = version
+                logger.info("Activity tree loaded: %d nodes", len(self._parent))
+            self._checked_at = time.monotonic()
+
+        return self
+
+    def nodes(self) -> List[int]:
+        """ID всех узлов дерева"""
+        return list(self._subtree)
+
+    def roots(self) -> List[int]:
+        """ID корневых узлов"""
+        return [aid for aid, pid in self._parent.items() if pid not in self._parent]
+
+    def subtree(self, activity_id: int) -> Tuple[int, ...]:
+        """ID узла и всех его потомков"""
+        return self._subtree.get(activity_id, ())
+
+    def descendants(self, activity_id: int) -> Tuple[int, ...]:
+        """ID всех потомков узла (без самого узла)"""
+        return self._subtree.get(activity_id, ())[1:]
+
+    def ancestors(self, activity_id: int) -> List[int]:
+        """ID предков узла от ближайшего к корню"""
+        result = []
+        parent_id = self._parent.get(activity_id)
+        while parent_id is not None and parent_id not in result:
+            result.append(parent_id)
+            parent_id = self._parent.get(parent_id)
+        return result
+
+    def is_descendant(self, activity_id: int, ancestor_id: int) -> bool:
+        """Проверка вложенности по интервалам эйлерова обхода"""
+        if activity_id not in self._tin or ancestor_id not in self._tin:
+            return False
+        return self._tin[ancestor_id] <= self._tin[activity_id] < self._tout[ancestor_id]
+
+    # ========== Helper Methods ==========
+    @staticmethod
+    async def _fetch_version(session: AsyncSession) -> Version:
+        """Дешёвый отпечаток таблицы: число строк, максимальный ID и связи"""
+        result = await session.execute(
+            select(
+                func.count(Activity.id),
+                func.coalesce(func.max(Activity.id), 0),
+                func.coalesce(func.sum(Activity.id * func.coalesce(Activity.parent_id, 0)), 0)
+            )
+        )
+        count, max_id, links = result.one()
+        return int(count), int(max_id), int(links)
+
+    def _build(self, rows) -> None:
+        parent: Dict[int, Optional[int]] = {}
+        children: Dict[int, List[int]] = {}
+        for activity_id, parent_id in rows:
+            parent[activity_id] = parent_id
+            children.setdefault(activity_id, [])
+        for activity_id, parent_id in parent.items():
+            if parent_id in parent:
+                children[parent_id].append(activity_id)
+
+        roots = [aid for aid, pid in parent.items() if pid not in parent]
+        order: List[int] = []
+        tin: Dict[int, int] = {}
+        tout: Dict[int, int] = {}
+
+        # Итеративный обход в глубину, чтобы не упираться в лимит рекурсии
+        for root in sorted(roots):
+            stack = [(root, False)]
+            while stack:
+                node, exiting = stack.pop()
+                if exiting:
+                    tout[node] = len(order)
+                    continue
+                if node in tin:
+                    continue
+                tin[node] = len(order)
+                order.append(node)
+                stack.append((node, True))
+                for child in sorted(children[node], reverse=True):
+                    stack.append((child, False))
+
+        self._parent = parent
+        self._tin = tin
+        self._tout = tout
+        self._subtree = {node: tuple(order[tin[node]:tout[node]]) for node in tin}
+
+
+activity_tree = ActivityTree(settings.ACTIVITY_TREE_REFRESH_INTERVAL)
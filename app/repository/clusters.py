@@ -0,0 +1,82 @@
+from sqlalchemy.future import select
+from sqlalchemy import BigInteger, cast, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Building, Organization
+from app.repository.activity_tree import activity_tree
+from app.repository.repository import Repository
+from app.repository.spatial import rect_filter
+from typing import Optional, Sequence, Tuple
+
+Rect = Tuple[float, float, float, float]
+
+# Размер тайла веб-карты в пикселях: на зуме z тайл покрывает 360 / 2**z градусов долготы
+TILE_PIXELS = 256
+
+
+def cluster_cell_size(zoom: int, cell_pixels: int) -> float:
+    """Сторона ячейки кластеризации в градусах для зума (ячейка ~cell_pixels пикселей на экране)"""
+    return 360.0 / 2 ** zoom * cell_pixels / TILE_PIXELS
+
+
+class ClusterRepository:
+    """Агрегаты зданий области для карты на мелком масштабе.
+
+    Здания группируются по ячейкам сетки размера cell_size, выровненной
+    по нулевому меридиану и экватору: при сдвиге карты здание остаётся в той
+    же ячейке и кластеры не «прыгают». Агрегация выполняется в БД одним
+    запросом, отсечение области — по индексу grid_cell.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def clusters(
+        self, rect: Rect, cell_size: float, threshold: int, activity_id: Optional[int] = None
+    ) -> Tuple[Sequence, Sequence]:
+        """(кластеры, здания): здания по отдельности, если их в области не больше threshold.
+
+        Кластер — строка (latitude, longitude, buildings, organizations)
+        с центроидом зданий ячейки; здание — (id, address, latitude,
+        longitude, organizations). Учитываются только здания с организациями
+        (с activity_id — из поддерева вида деятельности).
+        """
+        buildings = (await self._buildings(rect, activity_id)).subquery()
+        row = func.floor(buildings.c.latitude / cell_size)
+        column = func.floor(buildings.c.longitude / cell_size)
+        result = await self.session.execute(
+            select(
+                func.avg(buildings.c.latitude).label("latitude"),
+                func.avg(buildings.c.longitude).label("longitude"),
+                func.count().label("buildings"),
+                cast(func.sum(buildings.c.organizations), BigInteger).label("organizations")
+            )
+            .group_by(row, column)
+            .order_by(row, column)
+        )
+        clusters = result.all()
+        if sum(cluster.buildings for cluster in clusters) > threshold:
+            return clusters, []
+
+        result = await self.session.execute(select(buildings).order_by(buildings.c.id))
+        return [], result.all()
+
+    # ========== Helper Methods ==========
+    async def _buildings(self, rect: Rect, activity_id: Optional[int]):
+        """Здания области с числом (подходящих) организаций"""
+        min_lat, max_lat = sorted([rect[0], rect[2]])
+        min_lon, max_lon = sorted([rect[1], rect[3]])
+        query = (
+            select(
+                Building.id, Building.address, Building.latitude, Building.longitude,
+                func.count(Organization.id).label("organizations")
+            )
+            .join(Organization, Organization.building_id == Building.id)
+            .where(rect_filter(
+                Building.grid_cell, Building.latitude, Building.longitude, min_lat, min_lon, max_lat, max_lon
+            ))
+            .group_by(Building.id)
+        )
+        if activity_id is not None:
+            tree = await activity_tree.ensure_fresh(self.session)
+            query = query.where(Repository._has_activities(tree.subtree(activity_id) or (activity_id,)))
+        return query
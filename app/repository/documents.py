@@ -0,0 +1,128 @@
+from sqlalchemy.future import select
+from sqlalchemy import delete, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Organization
+from app.models.models import organization_documents
+from app.repository import Repository
+from app.cache.serialization import RawJSON, encode_json
+from app.schemas.organization import OrganizationFull
+from datetime import datetime
+from typing import Collection, Dict, List, Optional, Sequence
+
+
+class OrganizationDocument(RawJSON):
+    """Готовая карточка организации; building_id — для тегов кеша"""
+
+    def __init__(self, raw: bytes, building_id: int):
+        super().__init__(raw)
+        self.building_id = building_id
+
+
+class DocumentRepository:
+    """Read-model organization_documents: карточка организации одной строкой.
+
+    Документ — JSON схемы OrganizationFull, отрендеренный тем же кодом, что
+    и обычный ответ, поэтому чтение по первичному ключу отдаёт байты без
+    сборки из пяти таблиц. Документы обновляет путь записи (refresh в
+    транзакции записи) и полная перестройка (rebuild).
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get(self, org_id: int) -> Optional[OrganizationDocument]:
+        result = await self.session.execute(
+            select(organization_documents.c.document, organization_documents.c.building_id)
+            .where(organization_documents.c.organization_id == org_id)
+        )
+        row = result.first()
+        return OrganizationDocument(row.document.encode(), row.building_id) if row is not None else None
+
+    async def get_many(self, org_ids: Collection[int]) -> Dict[int, OrganizationDocument]:
+        if not org_ids:
+            return {}
+        result = await self.session.execute(
+            select(
+                organization_documents.c.organization_id,
+                organization_documents.c.document,
+                organization_documents.c.building_id
+            ).where(organization_documents.c.organization_id.in_(org_ids))
+        )
+        return {row.organization_id: OrganizationDocument(row.document.encode(), row.building_id) for row in result}
+
+    async def refresh(self, org_ids: Collection[int], building_ids: Collection[int] = ()) -> int:
+        """Перерендер документов организаций org_ids и всех организаций зданий building_ids.
+
+        Вызывается в транзакции записи после flush: документ меняется
+        атомарно с данными. Документы удалённых организаций удаляются.
+        """
+        ids = set(org_ids)
+        if building_ids:
+            result = await self.session.execute(
+                select(Organization.id).where(Organization.building_id.in_(building_ids))
+            )
+            ids.update(result.scalars())
+        if not ids:
+            return 0
+
+        result = await self.session.execute(
+            select(Organization)
+            .options(
+                joinedload(Organization.building),
+                selectinload(Organization.phones),
+                selectinload(Organization.activities)
+            )
+            .where(Organization.id.in_(ids))
+            .execution_options(populate_existing=True)
+        )
+        rows = self._render(result.unique().scalars().all())
+        if rows:
+            statement = pg_insert(organization_documents)
+            await self.session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[organization_documents.c.organization_id],
+                    set_={
+                        "building_id": statement.excluded.building_id,
+                        "document": statement.excluded.document,
+                        "rendered_at": statement.excluded.rendered_at,
+                    }
+                ),
+                rows
+            )
+        missing = ids.difference(row["organization_id"] for row in rows)
+        if missing:
+            await self.session.execute(
+                delete(organization_documents).where(organization_documents.c.organization_id.in_(missing))
+            )
+        return len(rows)
+
+    async def rebuild(self, batch_size: int) -> int:
+        """Перестройка таблицы с нуля; коммит — за вызывающим кодом.
+
+        Все документы заменяются в одной транзакции: до коммита читатели
+        видят прежние документы.
+        """
+        await self.session.execute(delete(organization_documents))
+        total = 0
+        async for batch in Repository(self.session).stream_organizations(batch_size):
+            rows = self._render(batch)
+            if rows:
+                await self.session.execute(insert(organization_documents), rows)
+            total += len(rows)
+        return total
+
+    # ========== Helper Methods ==========
+    @staticmethod
+    def _render(organizations: Sequence[Organization]) -> List[dict]:
+        now = datetime.now()
+        return [
+            {
+                "organization_id": org.id,
+                "building_id": org.building_id,
+                "document": encode_json(OrganizationFull.from_orm(org)).decode(),
+                "rendered_at": now,
+            }
+            for org in organizations
+        ]
@@ -0,0 +1,6 @@
+class EntityNotFound(LookupError):
+    """Запрошенная или связанная сущность не существует"""
+
+
+class EntityConflict(ValueError):
+    """Изменение нарушает ограничения данных (уникальность, зависимые записи)"""
@@ -0,0 +1,182 @@
+from sqlalchemy.future import select
+from sqlalchemy import BigInteger, cast, delete, distinct, func, insert, or_, union_all
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Building, Organization, Activity
+from app.models.models import organization_activity, activity_cell_counts, facet_dirty_cells
+from app.repository.repository import Repository
+from app.repository.spatial import rect_filter, inner_cells, cell_block_filter
+from typing import List, Optional, Sequence, Tuple
+
+Rect = Tuple[float, float, float, float]
+
+
+class FacetRepository:
+    """Число организаций по узлам дерева видов деятельности и по зданиям.
+
+    Счётчик узла учитывает всё его поддерево, организация с несколькими
+    видами из одного поддерева считается один раз. Ячейки сетки, целиком
+    лежащие в области и не изменившиеся после пересчёта, берутся из
+    activity_cell_counts; граничные ячейки, «грязные» ячейки и поиск по
+    названию считаются по связям организаций — ответ всегда точный.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def activity_counts(
+        self, rect: Optional[Rect] = None, name: Optional[str] = None, fuzzy: bool = False
+    ) -> Sequence:
+        """Строки (id, name, parent_id, level, organizations) для узлов с ненулевым счётчиком"""
+        bounds = self._bounds(rect) if rect is not None else None
+        dirty = select(facet_dirty_cells.c.grid_cell)
+        parts = []
+        if name is not None:
+            # Условие по названию есть только у организаций — предрасчёт не поможет
+            conditions = [Repository._name_match(Organization.name, name, fuzzy)[0]]
+            if bounds is not None:
+                conditions.append(self._rect_condition(bounds))
+            parts.append(self._live_counts(conditions))
+        elif bounds is not None:
+            block = inner_cells(*bounds)
+            live = [self._rect_condition(bounds)]
+            if block is not None:
+                live.append(or_(~cell_block_filter(Building.grid_cell, *block), Building.grid_cell.in_(dirty)))
+                parts.append(self._stored_counts([cell_block_filter(activity_cell_counts.c.grid_cell, *block)]))
+            parts.append(self._live_counts(live))
+        else:
+            parts.append(self._stored_counts([]))
+            parts.append(self._live_counts([or_(Building.grid_cell.in_(dirty), Building.grid_cell.is_(None))]))
+
+        counts = union_all(*parts).subquery()
+        totals = (
+            select(counts.c.activity_id, cast(func.sum(counts.c.organizations), BigInteger).label("organizations"))
+            .group_by(counts.c.activity_id)
+            .subquery()
+        )
+        result = await self.session.execute(
+            select(Activity.id, Activity.name, Activity.parent_id, Activity.level, totals.c.organizations)
+            .join(totals, totals.c.activity_id == Activity.id)
+            .order_by(Activity.level, totals.c.organizations.desc(), Activity.id)
+        )
+        return result.all()
+
+    async def building_counts(
+        self, rect: Rect, limit: int, name: Optional[str] = None, fuzzy: bool = False
+    ) -> Sequence:
+        """Строки (id, address, organizations): здания области с наибольшим числом организаций"""
+        organizations = func.count(Organization.id).label("organizations")
+        query = (
+            select(Building.id, Building.address, organizations)
+            .join(Organization, Organization.building_id == Building.id)
+            .where(self._rect_condition(self._bounds(rect)))
+            .group_by(Building.id, Building.address)
+            .order_by(organizations.desc(), Building.id)
+            .limit(limit)
+        )
+        if name is not None:
+            query = query.where(Repository._name_match(Organization.name, name, fuzzy)[0])
+        result = await self.session.execute(query)
+        return result.all()
+
+    async def refresh(self, batch_size: int) -> int:
+        """Пересчёт до batch_size грязных ячеек; коммит — за вызывающим кодом.
+
+        Ячейки забираются с SKIP LOCKED, поэтому несколько экземпляров
+        приложения пересчитывают разные ячейки. Пока транзакция не
+        закоммичена, читатели видят ячейку грязной и считают её по связям.
+        """
+        claimed = (
+            select(facet_dirty_cells.c.grid_cell)
+            .order_by(facet_dirty_cells.c.grid_cell)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        result = await self.session.execute(
+            delete(facet_dirty_cells)
+            .where(facet_dirty_cells.c.grid_cell.in_(claimed))
+            .returning(facet_dirty_cells.c.grid_cell)
+        )
+        cells: List[int] = result.scalars().all()
+        if not cells:
+            return 0
+
+        await self.session.execute(
+            delete(activity_cell_counts).where(activity_cell_counts.c.grid_cell.in_(cells))
+        )
+        closure = self._activity_closure()
+        await self.session.execute(
+            insert(activity_cell_counts).from_select(
+                ["grid_cell", "activity_id", "organizations"],
+                select(Building.grid_cell, closure.c.ancestor_id, func.count(distinct(Organization.id)))
+                .select_from(organization_activity)
+                .join(Organization, Organization.id == organization_activity.c.organization_id)
+                .join(Building, Building.id == Organization.building_id)
+                .join(closure, closure.c.activity_id == organization_activity.c.activity_id)
+                .where(Building.grid_cell.in_(cells))
+                .group_by(Building.grid_cell, closure.c.ancestor_id)
+            )
+        )
+        return len(cells)
+
+    # ========== Helper Methods ==========
+    def _live_counts(self, conditions: list):
+        """Счётчики узлов по связям организаций, отобранных conditions"""
+        closure = self._activity_closure()
+        return (
+            select(
+                closure.c.ancestor_id.label("activity_id"),
+                func.count(distinct(Organization.id)).label("organizations")
+            )
+            .select_from(organization_activity)
+            .join(Organization, Organization.id == organization_activity.c.organization_id)
+            .join(Building, Building.id == Organization.building_id)
+            .join(closure, closure.c.activity_id == organization_activity.c.activity_id)
+            .where(*conditions)
+            .group_by(closure.c.ancestor_id)
+        )
+
+    @staticmethod
+    def _stored_counts(conditions: list):
+        """Предрасчитанные счётчики чистых ячеек, отобранных conditions.
+
+        Каждая организация лежит ровно в одной ячейке, поэтому сумма по
+        ячейкам не считает организацию дважды.
+        """
+        return (
+            select(
+                activity_cell_counts.c.activity_id,
+                func.sum(activity_cell_counts.c.organizations).label("organizations")
+            )
+            .where(
+                *conditions,
+                activity_cell_counts.c.grid_cell.not_in(select(facet_dirty_cells.c.grid_cell))
+            )
+            .group_by(activity_cell_counts.c.activity_id)
+        )
+
+    @staticmethod
+    def _bounds(rect: Rect) -> Rect:
+        """(lat1, lon1, lat2, lon2) в порядке (min_lat, min_lon, max_lat, max_lon)"""
+        min_lat, max_lat = sorted([rect[0], rect[2]])
+        min_lon, max_lon = sorted([rect[1], rect[3]])
+        return min_lat, min_lon, max_lat, max_lon
+
+    @staticmethod
+    def _rect_condition(bounds: Rect):
+        return rect_filter(Building.grid_cell, Building.latitude, Building.longitude, *bounds)
+
+    @staticmethod
+    def _activity_closure():
+        """Пары (предок, узел) дерева видов деятельности, включая (узел, узел).
+
+        UNION вместо UNION ALL: цикл в parent_id не зациклит запрос.
+        """
+        child = aliased(Activity)
+        closure = (
+            select(Activity.id.label("ancestor_id"), Activity.id.label("activity_id"))
+            .cte("activity_closure", recursive=True)
+        )
+        return closure.union(
+            select(closure.c.ancestor_id, child.id).where(child.parent_id == closure.c.activity_id)
+        )
@@ -0,0 +1,98 @@
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from app.repository.snapshot import snapshot_store
+from app.monitoring.context import current_stats
+from app.monitoring.metrics import SNAPSHOT_FALLBACK_READS
+from app.config import settings
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Iterator, Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Ошибки соединения с БД (отказ, разрыв, таймаут подключения) в отличие от ошибок запроса
+CONNECTION_ERRORS = (OperationalError, InterfaceError, OSError, asyncio.TimeoutError)
+
+# До какого момента (time.monotonic) читать сразу из снимка после ошибки соединения
+_unavailable_until = 0.0
+
+
+class SnapshotReads:
+    """Отметка о чтениях из снимка внутри области track_snapshot_reads"""
+
+    def __init__(self):
+        self.used = False
+
+
+_snapshot_reads: ContextVar[Optional[SnapshotReads]] = ContextVar("snapshot_reads", default=None)
+
+
+@contextmanager
+def track_snapshot_reads() -> Iterator[SnapshotReads]:
+    """Область, в которой отмечаются чтения из снимка.
+
+    Работает и вне HTTP-запроса (прогрев кеша); отметка общая для задач,
+    созданных внутри области, и передаётся объемлющей области.
+    """
+    parent = _snapshot_reads.get()
+    reads = SnapshotReads()
+    token = _snapshot_reads.set(reads)
+    try:
+        yield reads
+    finally:
+        _snapshot_reads.reset(token)
+        if reads.used and parent is not None:
+            parent.used = True
+
+
+def is_database_unavailable(error: BaseException) -> bool:
+    if isinstance(error, DBAPIError) and error.connection_invalidated:
+        return True
+    return isinstance(error, CONNECTION_ERRORS)
+
+
+class SnapshotFallback:
+    """Репозиторий БД с откатом на снимок (SNAPSHOT_PATH) при недоступности БД.
+
+    Методы primary, которые есть и у fallback (класс, создаваемый по снимку),
+    при ошибке соединения повторяются на снимке; остальное проксируется как есть.
+    После ошибки SNAPSHOT_FALLBACK_PERIOD секунд чтения идут сразу в снимок,
+    не дожидаясь таймаутов подключения. Чтение из снимка отмечается
+    в области track_snapshot_reads и в статистике запроса (degraded): такой
+    ответ не попадает в кеш — после восстановления БД он был бы устаревшим.
+    """
+
+    def __init__(self, primary: Any, fallback: Callable[[Any], Any]):
+        self._primary = primary
+        self._fallback = fallback
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._primary, name)
+        if not asyncio.iscoroutinefunction(attribute) or not hasattr(self._fallback, name):
+            return attribute
+
+        @wraps(attribute)
+        async def call(*args, **kwargs):
+            global _unavailable_until
+            snapshot = snapshot_store.current()
+            if snapshot is None or time.monotonic() >= _unavailable_until:
+                try:
+                    return await attribute(*args, **kwargs)
+                except Exception as e:
+                    if snapshot is None or not is_database_unavailable(e):
+                        raise
+                    _unavailable_until = time.monotonic() + settings.SNAPSHOT_FALLBACK_PERIOD
+                    logger.warning("Database is unavailable (%r), reading from snapshot %s", e, snapshot.path)
+            SNAPSHOT_FALLBACK_READS.labels(name).inc()
+            reads = _snapshot_reads.get()
+            if reads is not None:
+                reads.used = True
+            stats = current_stats()
+            if stats is not None:
+                stats.degraded = True
+            return getattr(self._fallback(snapshot), name)(*args, **kwargs)
+
+        return call
@@ -0,0 +1,409 @@
+from sqlalchemy.future import select
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Building, Organization
+from app.models.models import organization_activity
+from app.repository.activity_tree import activity_tree
+from app.repository.snapshot import Snapshot, SnapshotWriter, snapshot_store
+from app.repository.spatial import GRID_COLUMNS, GRID_ROWS, covering_cell_ranges, inner_cells
+from app.config import settings
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from collections.abc import Mapping as MappingABC
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+import asyncio
+import sys
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+Version = Tuple
+Rect = Tuple[float, float, float, float]
+Key = Tuple[int, int]
+
+# Организации без координат здания: в начале порядка, в область не попадают
+NO_CELL = -1
+
+
+def trigrams(text: str) -> set:
+    """Триграммы строки в нижнем регистре (без дополнения пробелами)"""
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def bitmap_of(ordinals: Iterable[int], size: int) -> int:
+    """Битовая карта (int, бит i — порядковый номер i) из списка номеров"""
+    bits = bytearray((size + 7) // 8)
+    for ordinal in ordinals:
+        bits[ordinal >> 3] |= 1 << (ordinal & 7)
+    return int.from_bytes(bits, "little")
+
+
+def range_mask(start: int, end: int) -> int:
+    """Биты порядковых номеров [start, end)"""
+    return ((1 << (end - start)) - 1) << start if end > start else 0
+
+
+class FilterColumns(NamedTuple):
+    """Данные индекса; организации — в порядке (ячейка сетки, id)"""
+    ids: Sequence[int]
+    cells: Sequence[int]
+    latitudes: Sequence[float]
+    longitudes: Sequence[float]
+    names: Sequence[str]  # В нижнем регистре
+    activities: Mapping[int, int]  # Вид деятельности -> карта организаций поддерева
+    dense: Mapping[str, int]  # Частые триграммы -> карта
+    sparse: Mapping[str, Sequence[int]]  # Редкие триграммы -> номера по возрастанию
+
+
+def build_filter_columns(rows: Sequence, links: Sequence, subtrees: Dict[int, Tuple[int, ...]]) -> FilterColumns:
+    """Колонки индекса из строк (id, name, grid_cell, latitude, longitude),
+    связей (организация, вид деятельности) и поддеревьев видов деятельности"""
+    rows = sorted(rows, key=lambda row: (NO_CELL if row.grid_cell is None else row.grid_cell, row.id))
+    size = len(rows)
+    ids = array("q", (row.id for row in rows))
+    names = [(row.name or "").lower() for row in rows]
+    ordinal = {org_id: i for i, org_id in enumerate(ids)}
+
+    linked: Dict[int, List[int]] = {}
+    for org_id, activity_id in links:
+        if org_id in ordinal:
+            linked.setdefault(activity_id, []).append(ordinal[org_id])
+    direct = {activity_id: bitmap_of(ordinals, size) for activity_id, ordinals in linked.items()}
+    activities: Dict[int, int] = {}
+    for activity_id, subtree in subtrees.items():
+        bitmap = 0
+        for node in subtree:
+            bitmap |= direct.get(node, 0)
+        if bitmap:
+            activities[activity_id] = bitmap
+
+    postings: Dict[str, array] = defaultdict(partial(array, "I"))
+    for i, name in enumerate(names):
+        for trigram in trigrams(name):
+            postings[trigram].append(i)
+    # Карта занимает size / 8 байт, список — 4 байта на организацию:
+    # картой хранятся триграммы, которые встречаются чаще чем у 1/32 организаций
+    return FilterColumns(
+        ids=ids,
+        cells=array("q", (NO_CELL if row.grid_cell is None else row.grid_cell for row in rows)),
+        latitudes=array("d", (row.latitude or 0.0 for row in rows)),
+        longitudes=array("d", (row.longitude or 0.0 for row in rows)),
+        names=names,
+        activities=activities,
+        dense={t: bitmap_of(p, size) for t, p in postings.items() if len(p) * 32 >= size},
+        sparse={t: p for t, p in postings.items() if len(p) * 32 < size}
+    )
+
+
+def write_filter_columns(writer: SnapshotWriter, columns: FilterColumns) -> None:
+    """Секции filter.* снимка: колонки, карты (байты фиксированной ширины
+    подряд, ключи отсортированы) и списки номеров редких триграмм"""
+    width = (len(columns.ids) + 7) // 8
+    writer.add("filter.id", array("q", columns.ids))
+    writer.add("filter.cell", array("q", columns.cells))
+    writer.add("filter.latitude", array("d", columns.latitudes))
+    writer.add("filter.longitude", array("d", columns.longitudes))
+    writer.add_strings("filter.name", columns.names)
+
+    activity_ids = sorted(columns.activities)
+    writer.add("filter.activity", array("q", activity_ids))
+    writer.add("filter.activity.bitmaps", array("B", b"".join(
+        columns.activities[activity_id].to_bytes(width, "little") for activity_id in activity_ids
+    )))
+    dense = sorted(columns.dense)
+    writer.add_strings("filter.dense", dense)
+    writer.add("filter.dense.bitmaps", array("B", b"".join(
+        columns.dense[trigram].to_bytes(width, "little") for trigram in dense
+    )))
+    sparse = sorted(columns.sparse)
+    writer.add_strings("filter.sparse", sparse)
+    writer.add_relation("filter.sparse.postings", [list(columns.sparse[trigram]) for trigram in sparse])
+
+
+class SortedMapping(MappingABC):
+    """Отображение поверх отсортированных ключей снимка: значение строится
+    по позиции ключа при обращении"""
+
+    def __init__(self, keys: Sequence, value: Callable[[int], Any]):
+        self.keys = keys
+        self.value = value
+
+    def __getitem__(self, key):
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return self.value(i)
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator:
+        return iter(self.keys)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+def read_filter_columns(snapshot: Snapshot) -> FilterColumns:
+    """Колонки индекса поверх секций снимка, без копирования в память процесса.
+
+    Карта вида деятельности или частой триграммы превращается в int
+    при обращении (size / 8 байт на запрос).
+    """
+    sections = snapshot.sections
+    width = (len(sections["filter.id"]) + 7) // 8
+
+    def bitmaps(name: str) -> Callable[[int], int]:
+        data = sections[name]
+        return lambda i: int.from_bytes(data[i * width:(i + 1) * width], "little")
+
+    return FilterColumns(
+        ids=sections["filter.id"],
+        cells=sections["filter.cell"],
+        latitudes=sections["filter.latitude"],
+        longitudes=sections["filter.longitude"],
+        names=snapshot.strings("filter.name"),
+        activities=SortedMapping(sections["filter.activity"], bitmaps("filter.activity.bitmaps")),
+        dense=SortedMapping(snapshot.strings("filter.dense"), bitmaps("filter.dense.bitmaps")),
+        sparse=SortedMapping(
+            snapshot.strings("filter.sparse"), partial(snapshot.related, "filter.sparse.postings")
+        )
+    )
+
+
+class FilterSnapshot:
+    """Неизменяемый снимок индекса: запрос работает с одним снимком,
+    даже если параллельно собирается новый.
+
+    Организации пронумерованы подряд в порядке (ячейка сетки, id), поэтому
+    ячейка — непрерывный отрезок номеров, а фильтр по области собирается
+    из масок отрезков без хранения карт по ячейкам. Виды деятельности
+    хранятся картами по поддереву. Частые триграммы названий — картами,
+    редкие — отсортированными списками номеров (карта строится при запросе).
+    Колонки либо собираются в памяти процесса (build), либо читаются
+    из общего для всех воркеров снимка справочника (read_filter_columns).
+    """
+
+    def __init__(self, columns: FilterColumns):
+        self.size = len(columns.ids)
+        self.ids = columns.ids
+        self.cells = columns.cells
+        self.latitudes = columns.latitudes
+        self.longitudes = columns.longitudes
+        self.names = columns.names
+        self.activities = columns.activities
+        self.dense = columns.dense
+        self.sparse = columns.sparse
+
+    @classmethod
+    def build(cls, rows: Sequence, links: Sequence, subtrees: Dict[int, Tuple[int, ...]]) -> "FilterSnapshot":
+        return cls(build_filter_columns(rows, links, subtrees))
+
+    def filter(
+        self,
+        activity_id: Optional[int],
+        rect: Optional[Rect],
+        name: Optional[str],
+        after: Optional[Key],
+        limit: int,
+        max_candidates: Optional[int] = None
+    ) -> Tuple[List[int], Optional[Key]]:
+        """ID организаций страницы и ключ курсора следующей (None — последняя).
+
+        Подстрока проверяется не больше чем у max_candidates кандидатов:
+        если лимит исчерпан раньше, чем набралась страница, возвращается
+        неполная (возможно, пустая) страница с курсором на продолжение.
+        """
+        bitmap = range_mask(0, self.size)
+        if after is not None:
+            bitmap &= ~range_mask(0, self._start(after))
+        if activity_id is not None:
+            bitmap &= self.activities.get(activity_id, 0)
+        if name is not None and bitmap:
+            bitmap &= self._name_bitmap(name)
+        if rect is not None and bitmap:
+            bitmap &= self._rect_bitmap(*rect)
+
+        # Триграммы дают кандидатов: подстрока проверяется только для
+        # номеров, которые доходят до страницы
+        term = name.lower() if name is not None else None
+        page: List[int] = []
+        checked = 0
+        for i in self._ordinals(bitmap):
+            if term is None or term in self.names[i]:
+                page.append(i)
+                if len(page) > limit:
+                    page = page[:limit]
+                    return self._ids(page), self._key(page[-1])
+            checked += 1
+            if max_candidates is not None and checked >= max_candidates:
+                return self._ids(page), self._key(i)
+        return self._ids(page), None
+
+    # ========== Helper Methods ==========
+    @staticmethod
+    def _ordinals(bitmap: int) -> Iterator[int]:
+        """Номера установленных бит по возрастанию.
+
+        Карта один раз переводится в байты и просматривается словами по
+        64 бита: операции над целой картой на каждый бит дали бы O(N²).
+        """
+        words = array("Q", bitmap.to_bytes((bitmap.bit_length() + 63) // 64 * 8, sys.byteorder))
+        for w, word in enumerate(words):
+            while word:
+                lowest = word & -word
+                yield (w << 6) + lowest.bit_length() - 1
+                word ^= lowest
+
+    def _ids(self, ordinals: List[int]) -> List[int]:
+        return [self.ids[i] for i in ordinals]
+
+    def _key(self, ordinal: int) -> Key:
+        return self.cells[ordinal], self.ids[ordinal]
+
+    def _start(self, after: Key) -> int:
+        """Первый номер с ключом (ячейка, id) больше after"""
+        cell, org_id = after
+        lo = bisect_left(self.cells, cell)
+        hi = bisect_right(self.cells, cell, lo)
+        return bisect_right(self.ids, org_id, lo, hi)
+
+    def _cells(self, first: int, last: int) -> Tuple[int, int]:
+        """Отрезок номеров организаций в ячейках [first, last]"""
+        lo = bisect_left(self.cells, first)
+        return lo, bisect_right(self.cells, last, lo)
+
+    def _name_bitmap(self, name: str) -> int:
+        bitmap = range_mask(0, self.size)
+        for trigram in trigrams(name):
+            if trigram in self.dense:
+                bitmap &= self.dense[trigram]
+            elif trigram in self.sparse:
+                bitmap &= bitmap_of(self.sparse[trigram], self.size)
+            else:
+                return 0
+        return bitmap
+
+    def _rect_bitmap(self, lat1: float, lon1: float, lat2: float, lon2: float) -> int:
+        """Организации в прямоугольнике: внутренние ячейки целиком,
+        в граничных — проверка координат"""
+        min_lat, max_lat = sorted([lat1, lat2])
+        min_lon, max_lon = sorted([lon1, lon2])
+        block = inner_cells(min_lat, min_lon, max_lat, max_lon)
+        bitmap = 0
+        edge: List[int] = []
+        for start, end in covering_cell_ranges(min_lat, min_lon, max_lat, max_lon, max_ranges=GRID_ROWS):
+            row = start // GRID_COLUMNS
+            parts = [(start, end)]
+            if block is not None and block[0] <= row <= block[1]:
+                inner_start, inner_end = row * GRID_COLUMNS + block[2], row * GRID_COLUMNS + block[3]
+                bitmap |= range_mask(*self._cells(inner_start, inner_end))
+                parts = [(start, inner_start - 1), (inner_end + 1, end)]
+            for first, last in parts:
+                if first > last:
+                    continue
+                lo, hi = self._cells(first, last)
+                edge.extend(
+                    i for i in range(lo, hi)
+                    if min_lat <= self.latitudes[i] <= max_lat and min_lon <= self.longitudes[i] <= max_lon
+                )
+        return bitmap | bitmap_of(edge, self.size)
+
+
+class FilterIndex:
+    """Битовые индексы организаций в памяти процесса для комбинированных фильтров.
+
+    Вид деятельности (с поддеревом), область и подстрока названия
+    пересекаются как битовые карты, из БД затем догружается только
+    страница найденных ID. Если настроен снимок справочника (SNAPSHOT_PATH),
+    индекс читается из его секций filter.* — одна копия на хост вместо
+    сборки в каждом воркере, данные на момент сборки снимка. Иначе снимок
+    индекса собирается в памяти процесса и перестраивается целиком, когда
+    меняется отпечаток таблиц; версия проверяется не чаще раза
+    в refresh_interval секунд, и пока новый снимок собирается, запросы
+    отвечают по старому.
+    """
+
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self._snapshot: Optional[FilterSnapshot] = None
+        self._source: Optional[Snapshot] = None
+        self._version: Optional[Version] = None
+        self._checked_at: float = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._snapshot is not None
+
+    def invalidate(self) -> None:
+        """Принудительная проверка версии при следующем обращении"""
+        self._checked_at = 0.0
+
+    async def ensure_fresh(self, session: AsyncSession) -> FilterSnapshot:
+        """Актуальный снимок; первый вызов ждёт загрузки, следующие — нет"""
+        source = snapshot_store.current()
+        if source is not None:
+            if source is not self._source:
+                self._snapshot = FilterSnapshot(read_filter_columns(source))
+                self._source = source
+                self._version = None
+            return self._snapshot
+
+        if self.loaded and (
+            time.monotonic() - self._checked_at < self.refresh_interval or self._lock.locked()
+        ):
+            return self._snapshot
+
+        async with self._lock:
+            if self.loaded and time.monotonic() - self._checked_at < self.refresh_interval:
+                return self._snapshot
+
+            tree = await activity_tree.ensure_fresh(session)
+            version = await self._fetch_version(session)
+            if version != self._version:
+                rows = (await session.execute(
+                    select(
+                        Organization.id, Organization.name,
+                        Building.grid_cell, Building.latitude, Building.longitude
+                    ).outerjoin(Building, Building.id == Organization.building_id)
+                )).all()
+                links = (await session.execute(
+                    select(organization_activity.c.organization_id, organization_activity.c.activity_id)
+                )).all()
+                subtrees = {activity_id: tree.subtree(activity_id) for activity_id in tree.nodes()}
+                # Сборка — чистый Python на сотни миллисекунд: не держим цикл событий
+                self._snapshot = await asyncio.to_thread(FilterSnapshot.build, rows, links, subtrees)
+                self._source = None
+                self._version = version
+                logger.info(
+                    "Filter index loaded: %d organizations, %d trigram bitmaps",
+                    self._snapshot.size, len(self._snapshot.dense)
+                )
+            self._checked_at = time.monotonic()
+
+        return self._snapshot
+
+    # ========== Helper Methods ==========
+    @staticmethod
+    async def _fetch_version(session: AsyncSession) -> Version:
+        """Отпечаток организаций, связей и координат зданий.
+
+        Смена дерева видов деятельности отслеживается через activity_tree.
+        """
+        organizations = await session.execute(select(
+            func.count(Organization.id), func.max(Organization.id), func.max(Organization.updated_at)
+        ))
+        links = await session.execute(select(
+            func.count(),
+            func.sum(organization_activity.c.organization_id * organization_activity.c.activity_id)
+        ).select_from(organization_activity))
+        buildings = await session.execute(select(
+            func.count(Building.id),
+            func.sum(Building.latitude + Building.longitude + func.coalesce(Building.grid_cell, 0))
+        ))
+        return (*organizations.one(), *links.one(), *buildings.one(), activity_tree.version)
+
+
+filter_index = FilterIndex(settings.FILTER_INDEX_REFRESH_INTERVAL)
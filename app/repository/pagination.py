@@ -0,0 +1,51 @@
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence, Tuple, TypeVar
+import base64
+import binascii
+import json
+
+T = TypeVar("T")
+
+
+class InvalidCursor(ValueError):
+    """Курсор пагинации повреждён или не подходит к запросу"""
+
+
+class Page(NamedTuple):
+    items: Sequence[Any]
+    next_cursor: Optional[str]
+
+
+def encode_cursor(*values: Any) -> str:
+    """Непрозрачный курсор из значений ключа последней строки страницы"""
+    raw = json.dumps(values, separators=(",", ":"), ensure_ascii=False).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], *types: type) -> Optional[Tuple[Any, ...]]:
+    """Разбор курсора с проверкой числа и типов значений ключа"""
+    if cursor is None:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+    if not isinstance(values, list) or len(values) != len(types):
+        raise InvalidCursor("Invalid cursor")
+    result = []
+    for value, type_ in zip(values, types):
+        if type_ is float and isinstance(value, int) and not isinstance(value, bool):
+            value = float(value)
+        if type(value) is not type_:
+            raise InvalidCursor("Invalid cursor")
+        result.append(value)
+    return tuple(result)
+
+
+def make_page(rows: List[T], limit: int, key: Callable[[T], Tuple[Any, ...]]) -> Page:
+    """Страница из limit + 1 выбранных строк: лишняя строка означает, что есть продолжение"""
+    if len(rows) <= limit:
+        return Page(rows, None)
+    items = rows[:limit]
+    return Page(items, encode_cursor(*key(items[-1])))
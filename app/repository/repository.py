@@ -1,132 +1,437 @@
 from sqlalchemy.future import select
-from sqlalchemy import text, and_
-from sqlalchemy.orm import selectinload, joinedload
+from sqlalchemy import text, and_, or_, func, literal_column, type_coerce, JSON
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import aliased, selectinload, joinedload, contains_eager, load_only
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import Building, Organization, Activity
-from typing import List, Optional, Sequence
+from app.models.models import organization_activity
+from app.repository.activity_tree import activity_tree
+from app.repository.spatial import rect_filter, circle_filter, haversine_distance
+from app.repository.pagination import Page, decode_cursor, make_page
+from app.config import settings
+from typing import AsyncIterator, Collection, List, NamedTuple, Optional, Sequence, Tuple
+from datetime import datetime
 import math
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Начальный радиус поиска ближайших организаций (в метрах)
+NEAREST_START_RADIUS = 500
+
+# Загрузка связей организации: связь грузится, только если попадает в ответ
+RELATION_LOADERS = {
+    "building": joinedload(Organization.building),
+    "phones": selectinload(Organization.phones),
+    "activities": selectinload(Organization.activities),
+}
+ORGANIZATION_COLUMNS = ("name", "building_id", "created_at", "updated_at")
+
+
+class OrganizationDistance(NamedTuple):
+    organization: Organization
+    distance: float
+
+
+class SearchFilters(NamedTuple):
+    """Фильтры единого поиска; незаданные (None/пустые) не применяются"""
+    name: Optional[str] = None
+    fuzzy: bool = False
+    activity_ids: Sequence[int] = ()
+    activity_names: Sequence[str] = ()
+    building_id: Optional[int] = None
+    rect: Optional[Tuple[float, float, float, float]] = None  # lat1, lon1, lat2, lon2
+    point: Optional[Tuple[float, float, float]] = None  # lat, lon, радиус в метрах
+
+
 class Repository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def get_organizations_in_building(self, building_id: int) -> Sequence[Organization]:
+    async def get_organizations_in_building(
+        self, building_id: int, limit: int, cursor: Optional[str] = None, fields: Optional[Collection[str]] = None
+    ) -> Page:
         """Получение организаций в здании"""
-        result = await self.session.execute(
+        query = (
             select(Organization)
+            .options(*self._organization_options(fields))
             .where(Organization.building_id == building_id)
         )
-        return result.unique().scalars().all()
+        return await self._paginate_by_id(query, Organization.id, limit, cursor)
 
-    async def get_organizations_by_activity(self, activity_id: int) -> Sequence[Organization]:
+    async def get_organizations_by_activity(
+        self, activity_id: int, limit: int, cursor: Optional[str] = None, fields: Optional[Collection[str]] = None
+    ) -> Page:
         """Получение организаций по виду деятельности (с учетом иерархии)"""
-        activity_ids = [activity_id] + await self._get_child_activity_ids(activity_id)
-        result = await self.session.execute(
+        activity_ids = await self._get_activity_subtree_ids(activity_id)
+        query = (
             select(Organization)
-            .options(
-                joinedload(Organization.building),
-                selectinload(Organization.phones),
-                selectinload(Organization.activities)
-            )
-            .join(Organization.activities)
-            .where(Activity.id.in_(activity_ids))
+            .options(*self._organization_options(fields))
+            .where(self._has_activities(activity_ids))
         )
-        return result.unique().scalars().all()
+        return await self._paginate_by_id(query, Organization.id, limit, cursor)
 
-    async def get_organization(self, org_id: int) -> Optional[Organization]:
-        """Получение организации по ID"""
+    async def get_organization(
+        self, org_id: int, fields: Optional[Collection[str]] = None
+    ) -> Optional[Organization]:
+        """Получение организации по ID (fields — загружаемые поля, по умолчанию вся карточка)"""
         result = await self.session.execute(
             select(Organization)
-            .options(
-                joinedload(Organization.building),
-                selectinload(Organization.phones),
-                selectinload(Organization.activities).joinedload(Activity.children)
-            )
+            .options(*self._organization_options(fields, ("building", "phones", "activities")))
             .where(Organization.id == org_id)
         )
-        res = result.scalars().first()
-        logger.info("REQ")
-        logger.info(res)
-        return res
+        return result.scalars().first()
 
-    async def search_organizations_by_activity(self, activity_name: str):
+    async def get_organizations_by_ids(
+        self, org_ids: Sequence[int], fields: Optional[Collection[str]] = None
+    ) -> Sequence[Organization]:
+        """Получение нескольких организаций одним набором IN-запросов"""
+        if not org_ids:
+            return []
+        options = self._organization_options(fields) if fields is not None else [
+            joinedload(Organization.building),
+            selectinload(Organization.phones),
+            selectinload(Organization.activities).joinedload(Activity.children)
+        ]
+        result = await self.session.execute(
+            select(Organization)
+            .options(*options)
+            .where(Organization.id.in_(org_ids))
+        )
+        return result.unique().scalars().all()
+
+    async def search_organizations_by_activity(
+        self,
+        activity_name: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        fuzzy: bool = False,
+        fields: Optional[Collection[str]] = None
+    ) -> Page:
         """Поиск организаций по виду деятельности (с учетом иерархии)"""
-        # Находим корневую активность и всех её потомков
+        # Находим наиболее похожую по названию активность
+        condition, rank = self._name_match(Activity.name, activity_name, fuzzy)
         root_activity = await self.session.execute(
-            select(Activity)
-            .where(Activity.name.ilike(f"%{activity_name}%"))
+            select(Activity.id)
+            .where(condition)
+            .order_by(rank.desc(), Activity.id)
+            .limit(1)
         )
-        root_activity = root_activity.scalars().first()
+        root_activity_id = root_activity.scalar()
 
-        if not root_activity:
-            return []
+        if root_activity_id is None:
+            return Page([], None)
 
-        # Получаем все ID активностей в иерархии
-        activity_ids = await self._get_child_activity_ids(root_activity.id)
+        # Найденная активность вместе со всем поддеревом (как в /search?activity=)
+        activity_ids = await self._get_activity_subtree_ids(root_activity_id)
 
         # Ищем организации, связанные с этими активностями
-        result = await self.session.execute(
+        query = (
             select(Organization)
+            .options(*self._organization_options(fields, ("building", "activities")))
+            .where(self._has_activities(activity_ids))
+        )
+        return await self._paginate_by_id(query, Organization.id, limit, cursor)
+
+    async def search_organizations(
+        self,
+        filters: SearchFilters,
+        order: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        fields: Optional[Collection[str]] = None
+    ) -> Page:
+        """Поиск по любому сочетанию фильтров одним SQL-запросом.
+
+        Поддеревья видов деятельности (по ID и по названию — все подходящие
+        узлы, а не первый) разворачиваются рекурсивным CTE в том же запросе.
+        order: id, relevance (по названию) или distance (от точки); ключ
+        страницы — пара (значение порядка, id).
+        """
+        conditions = []
+        rank = distance = None
+        if filters.name is not None:
+            condition, rank = self._name_match(Organization.name, filters.name, filters.fuzzy)
+            conditions.append(condition)
+        if filters.activity_ids or filters.activity_names:
+            subtree = self._activity_subtree(filters.activity_ids, filters.activity_names, filters.fuzzy)
+            conditions.append(Organization.id.in_(
+                select(organization_activity.c.organization_id)
+                .where(organization_activity.c.activity_id.in_(select(subtree.c.id)))
+            ))
+        if filters.building_id is not None:
+            conditions.append(Organization.building_id == filters.building_id)
+        if filters.rect is not None:
+            min_lat, max_lat = sorted([filters.rect[0], filters.rect[2]])
+            min_lon, max_lon = sorted([filters.rect[1], filters.rect[3]])
+            conditions.append(rect_filter(
+                Building.grid_cell, Building.latitude, Building.longitude, min_lat, min_lon, max_lat, max_lon
+            ))
+        if filters.point is not None:
+            latitude, longitude, radius = filters.point
+            distance = haversine_distance(Building.latitude, Building.longitude, latitude, longitude)
+            conditions.append(circle_filter(
+                Building.grid_cell, Building.latitude, Building.longitude, latitude, longitude, radius
+            ))
+            conditions.append(distance <= radius)
+
+        query = select(Organization).options(*self._organization_options(fields)).where(*conditions)
+        if filters.rect is not None or filters.point is not None:
+            query = query.join(Building, Building.id == Organization.building_id)
+
+        if order == "relevance":
+            return await self._paginate_by_key(query, rank, limit, cursor, descending=True)
+        if order == "distance":
+            return await self._paginate_by_key(query, distance, limit, cursor)
+        return await self._paginate_by_id(query, Organization.id, limit, cursor)
+
+    async def get_organizations_in_rect(
+        self,
+        lat1: float,
+        lon1: float,
+        lat2: float,
+        lon2: float,
+        limit: int,
+        cursor: Optional[str] = None,
+        include_organizations: bool = False
+    ) -> Page:
+        """Здания в прямоугольной области (строки id, address).
+
+        Выбираются только возвращаемые колонки. С include_organizations
+        каждая строка получает колонку organizations — JSON-массив
+        организаций здания, собранный в том же запросе коррелированным
+        подзапросом (считается только для зданий текущей страницы).
+        """
+        min_lat, max_lat = sorted([lat1, lat2])
+        min_lon, max_lon = sorted([lon1, lon2])
+        columns = [Building.id, Building.address]
+        if include_organizations:
+            columns.append(self._organizations_json().label("organizations"))
+        query = select(*columns).where(rect_filter(
+            Building.grid_cell, Building.latitude, Building.longitude,
+            min_lat, min_lon, max_lat, max_lon
+        ))
+        return await self._paginate_by_id(query, Building.id, limit, cursor, rows=True)
+
+    async def get_organizations_near(
+        self,
+        latitude: float,
+        longitude: float,
+        radius: float,
+        limit: int,
+        activity_id: Optional[int] = None,
+        fields: Optional[Collection[str]] = None
+    ) -> List[OrganizationDistance]:
+        """Организации в радиусе radius метров от точки, ближайшие первыми.
+
+        Кандидаты отсекаются описанным прямоугольником (у антимеридиана —
+        двумя) по индексу сетки, точное расстояние считается по формуле
+        гаверсинусов в БД.
+        """
+        distance = haversine_distance(Building.latitude, Building.longitude, latitude, longitude)
+
+        query = (
+            select(Organization, distance)
+            .join(Organization.building)
             .options(
-                joinedload(Organization.building),
-                selectinload(Organization.activities)
+                contains_eager(Organization.building),
+                *self._organization_options(fields, ("phones",), relations=("phones", "activities"))
+            )
+            .where(
+                circle_filter(Building.grid_cell, Building.latitude, Building.longitude, latitude, longitude, radius),
+                distance <= radius
             )
-            .join(Organization.activities)
-            .where(Activity.id.in_(activity_ids))
+            .order_by(distance, Organization.id)
+            .limit(limit)
         )
+        if activity_id is not None:
+            activity_ids = await self._get_activity_subtree_ids(activity_id)
+            query = query.where(self._has_activities(activity_ids))
 
-        return result.unique().scalars().all()
+        result = await self.session.execute(query)
+        return [OrganizationDistance(org, dist) for org, dist in result.all()]
 
-    async def get_organizations_in_rect(self, lat1: float, lon1: float, lat2: float, lon2: float) -> Sequence[Organization]:
-        """Поиск организаций в прямоугольной области"""
-        min_lat, max_lat = sorted([lat1, lat2])
-        min_lon, max_lon = sorted([lon1, lon2])        
-        result = await self.session.execute(
-            select(Building)
+    async def get_nearest_organizations(
+        self,
+        latitude: float,
+        longitude: float,
+        limit: int,
+        activity_id: Optional[int] = None,
+        fields: Optional[Collection[str]] = None
+    ) -> List[OrganizationDistance]:
+        """k ближайших организаций: радиус поиска расширяется, пока не наберётся limit"""
+        radius = NEAREST_START_RADIUS
+        while True:
+            rows = await self.get_organizations_near(latitude, longitude, radius, limit, activity_id, fields)
+            if len(rows) >= limit or radius >= settings.NEAREST_MAX_RADIUS:
+                return rows
+            radius = min(radius * 4, settings.NEAREST_MAX_RADIUS)
+
+    async def stream_organizations(
+        self,
+        batch_size: int,
+        updated_since: Optional[datetime] = None,
+        activity_id: Optional[int] = None
+    ) -> AsyncIterator[Sequence[Organization]]:
+        """Потоковая выгрузка организаций пачками по batch_size.
+
+        Строки читаются серверным курсором, связи догружаются selectinload
+        отдельно для каждой пачки, после чего пачка (с телефонами и зданиями)
+        удаляется из сессии — память не растёт с размером справочника.
+        """
+        query = (
+            select(Organization)
             .options(
-                joinedload(Building.organizations)
-                .selectinload(Organization.phones),
-                joinedload(Building.organizations)
-                .selectinload(Organization.activities)
+                joinedload(Organization.building),
+                selectinload(Organization.phones),
+                selectinload(Organization.activities)
             )
-            .where(and_(
-                Building.latitude.between(min_lat, max_lat),
-                Building.longitude.between(min_lon, max_lon)
-            ))
+            .order_by(Organization.id)
+            .execution_options(yield_per=batch_size)
         )
-        return result.unique().scalars().all()
+        if updated_since is not None:
+            query = query.where(Organization.updated_at >= updated_since)
+        if activity_id is not None:
+            activity_ids = await self._get_activity_subtree_ids(activity_id)
+            query = query.where(self._has_activities(activity_ids))
+
+        result = await self.session.stream_scalars(query)
+        async for batch in result.partitions():
+            yield batch
+            # expunge_all() заменил бы карту идентичности, которой пользуется
+            # открытый результат, — убираем из сессии только объекты пачки
+            for org in batch:
+                for obj in (org, org.building, *org.phones):
+                    if obj is not None and obj in self.session:
+                        self.session.expunge(obj)
 
     # ========== Helper Methods ==========
-    async def _get_child_activity_ids(self, parent_id: int, max_level: int = 3) -> List[int]:
-        """Рекурсивное получение ID дочерних активностей (до 3 уровня)"""
-        async def _get_children(pid: int, level: int = 1) -> List[int]:
-            if level > max_level:
-                return []
-
-            result = await self.session.execute(
-                select(Activity.id)
-                .where(Activity.parent_id == pid)
-            )
-            child_ids = result.scalars().all()
-            all_ids = child_ids.copy()
+    async def _get_activity_subtree_ids(self, activity_id: int) -> Sequence[int]:
+        """ID активности и всех её потомков из индекса иерархии"""
+        tree = await activity_tree.ensure_fresh(self.session)
+        return tree.subtree(activity_id) or (activity_id,)
 
-            for cid in child_ids:
-                all_ids.extend(await _get_children(cid, level + 1))
+    async def search_organizations_by_name(
+        self,
+        name: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        fuzzy: bool = False,
+        fields: Optional[Collection[str]] = None
+    ) -> Page:
+        """Поиск организаций по названию, наиболее похожие первыми.
 
-            return all_ids
+        Ключ страницы — пара (релевантность, id), поэтому продолжение
+        выдачи не зависит от смещения и не пересчитывает предыдущие страницы.
+        """
+        condition, rank = self._name_match(Organization.name, name, fuzzy)
+        query = (
+            select(Organization)
+            .options(*self._organization_options(fields))
+            .where(condition)
+        )
+        return await self._paginate_by_key(query, rank, limit, cursor, descending=True)
 
-        return await _get_children(parent_id)
+    async def _paginate_by_key(
+        self, query, key, limit: int, cursor: Optional[str], descending: bool = False
+    ) -> Page:
+        """Keyset-пагинация организаций по паре (key, id): key — вещественное
+        выражение (релевантность, расстояние), id разрешает равенства"""
+        query = query.add_columns(key)
+        after = decode_cursor(cursor, float, int)
+        if after is not None:
+            after_key, after_id = after
+            query = query.where(or_(
+                key < after_key if descending else key > after_key,
+                and_(key == after_key, Organization.id > after_id)
+            ))
 
-    async def search_organizations_by_name(self, name: str) -> Sequence[Organization]:
-        """Поиск организаций по частичному совпадению названия"""
         result = await self.session.execute(
-            select(Organization)
-            .options(
-                joinedload(Organization.building)
-            )
-            .where(Organization.name.ilike(f"%{name}%"))
+            query.order_by(key.desc() if descending else key, Organization.id).limit(limit + 1)
         )
-        return result.unique().scalars().all()
+        page = make_page(result.unique().all(), limit, lambda row: (row[1], row[0].id))
+        return Page([org for org, _ in page.items], page.next_cursor)
+
+    async def _paginate_by_id(
+        self, query, id_column, limit: int, cursor: Optional[str], rows: bool = False
+    ) -> Page:
+        """Keyset-пагинация по возрастанию id: БД отдаёт не больше limit + 1 строк.
+
+        rows=True — запрос выбирает колонки, а не сущность; элементы страницы — строки Row.
+        """
+        after = decode_cursor(cursor, int)
+        if after is not None:
+            query = query.where(id_column > after[0])
+
+        result = await self.session.execute(query.order_by(id_column).limit(limit + 1))
+        items = result.all() if rows else result.unique().scalars().all()
+        return make_page(items, limit, lambda row: (row.id,))
+
+    @staticmethod
+    def _organization_options(
+        fields: Optional[Collection[str]],
+        default: Collection[str] = (),
+        relations: Collection[str] = tuple(RELATION_LOADERS)
+    ) -> list:
+        """Опции загрузки организации под поля ответа.
+
+        fields=None — ответ по умолчанию: грузятся связи default, колонки все.
+        Иначе грузятся только запрошенные колонки (id всегда) и связи;
+        relations ограничивает связи, которые метод грузит через RELATION_LOADERS.
+        """
+        if fields is None:
+            return [RELATION_LOADERS[name] for name in default]
+        columns = [getattr(Organization, name) for name in ORGANIZATION_COLUMNS if name in fields]
+        options = [load_only(Organization.id, *columns)]
+        options.extend(RELATION_LOADERS[name] for name in relations if name in fields)
+        return options
+
+    @staticmethod
+    def _organizations_json():
+        """JSON-массив организаций здания (id, name, building_id) для внешнего запроса по Building"""
+        organization = func.json_build_object(
+            "id", Organization.id, "name", Organization.name, "building_id", Organization.building_id
+        )
+        aggregated = (
+            select(func.coalesce(
+                func.json_agg(aggregate_order_by(organization, Organization.id)),
+                literal_column("'[]'::json")
+            ))
+            .where(Organization.building_id == Building.id)
+            .scalar_subquery()
+        )
+        return type_coerce(aggregated, JSON)
+
+    @staticmethod
+    def _has_activities(activity_ids: Sequence[int]):
+        """Условие: организация связана хотя бы с одной из активностей (без дублей строк)"""
+        return Organization.id.in_(
+            select(organization_activity.c.organization_id)
+            .where(organization_activity.c.activity_id.in_(activity_ids))
+        )
+
+    @staticmethod
+    def _activity_subtree(activity_ids: Sequence[int], activity_names: Sequence[str], fuzzy: bool):
+        """Рекурсивный CTE (id): узлы с указанными ID или подходящими названиями и все их потомки.
+
+        UNION вместо UNION ALL: цикл в parent_id не зациклит запрос.
+        """
+        roots = [Activity.id.in_(activity_ids)] if activity_ids else []
+        roots.extend(Repository._name_match(Activity.name, name, fuzzy)[0] for name in activity_names)
+        subtree = select(Activity.id).where(or_(*roots)).cte("activity_subtree", recursive=True)
+        child = aliased(Activity)
+        return subtree.union(select(child.id).where(child.parent_id == subtree.c.id))
+
+    @staticmethod
+    def _name_match(column, term: str, fuzzy: bool):
+        """Условие поиска по названию и его релевантность (pg_trgm).
+
+        Обычный режим — подстрока через ILIKE, в режиме fuzzy — похожесть
+        терма на слово названия (term <% column, записано как column %> term),
+        которая прощает опечатки и не штрафует длинные названия; релевантность
+        тогда — word_similarity. Оба варианта обслуживаются GIN-индексом
+        gin_trgm_ops.
+        """
+        if fuzzy:
+            return column.op('%>')(term), func.word_similarity(term, column)
+        return column.ilike(f"%{term}%"), func.similarity(column, term)
@@ -0,0 +1,384 @@
+from app.repository.pagination import Page, decode_cursor, make_page
+from app.config import settings
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence as SequenceABC
+from datetime import datetime, timedelta
+from heapq import merge
+from typing import Collection, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+# Формат файла снимка: заголовок, таблица секций и секции — массивы фиксированной
+# ширины (int64 или float64), выровненные по 8 байтам. Строки хранятся таблицей:
+# <имя>.offsets (n + 1 смещений) и <имя>.data (UTF-8 подряд). Связи один-ко-многим —
+# <связь>.offsets по строкам владельца и массив порядковых номеров. Порядковый номер —
+# позиция строки в своей таблице; таблицы отсортированы по id.
+MAGIC = b"ORGSNAP\x00"
+FORMAT_VERSION = 2
+HEADER = struct.Struct("<8sII1s7xd")  # magic, версия, число секций, порядок байт, created_at
+SECTION = struct.Struct("<32s1s7xQQ")  # имя, typecode, смещение, размер в байтах
+ALIGNMENT = 8
+NONE = -1  # Порядковый номер «нет значения» (здание организации, родитель вида деятельности)
+
+BYTEORDER = b"<" if sys.byteorder == "little" else b">"
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_microseconds(value: Optional[datetime]) -> int:
+    """Наивное время модели в микросекунды от эпохи (без перевода часовых поясов)"""
+    return (value - EPOCH) // timedelta(microseconds=1) if value is not None else 0
+
+
+class SnapshotWriter:
+    """Сборка файла снимка из колонок.
+
+    Файл пишется рядом с целевым под временным именем и подменяется
+    через os.replace: читатели видят либо старый снимок, либо новый целиком.
+    """
+
+    def __init__(self):
+        self.sections: List[Tuple[str, array]] = []
+
+    def add(self, name: str, values: array) -> None:
+        self.sections.append((name, values))
+
+    def add_strings(self, name: str, values: Iterable[Optional[str]]) -> None:
+        offsets = array("q", [0])
+        data = bytearray()
+        for value in values:
+            data += (value or "").encode()
+            offsets.append(len(data))
+        self.add(f"{name}.offsets", offsets)
+        self.add(f"{name}.data", array("B", data))
+
+    def add_relation(self, name: str, groups: Sequence[Sequence[int]]) -> None:
+        """Связь один-ко-многим: groups[i] — порядковые номера, связанные со строкой i"""
+        offsets = array("q", [0])
+        targets = array("q")
+        for group in groups:
+            targets.extend(group)
+            offsets.append(len(targets))
+        self.add(f"{name}.offsets", offsets)
+        self.add(name, targets)
+
+    def write(self, path: str) -> int:
+        """Атомарная публикация файла; возвращает его размер"""
+        offset = self._align(HEADER.size + SECTION.size * len(self.sections))
+        table = []
+        for name, values in self.sections:
+            size = len(values) * values.itemsize
+            table.append(SECTION.pack(name.encode(), values.typecode.encode(), offset, size))
+            offset = self._align(offset + size)
+
+        temporary = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, "wb") as f:
+                f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(self.sections), BYTEORDER, time.time()))
+                f.write(b"".join(table))
+                for (_, values), entry in zip(self.sections, table):
+                    f.seek(SECTION.unpack(entry)[2])
+                    values.tofile(f)
+                f.truncate(offset)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return offset
+
+    @staticmethod
+    def _align(offset: int) -> int:
+        return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class InvalidSnapshot(ValueError):
+    """Файл снимка повреждён или собран другой версией формата"""
+
+
+class Snapshot:
+    """Снимок, отображённый в память только для чтения.
+
+    Секции — memoryview поверх mmap без копирования: все процессы-воркеры,
+    открывшие один файл, делят одни и те же страницы page cache.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.path = path
+        self.identity = (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        self.sections = self._read_sections()
+
+        self.building_ids = self.sections["building.id"]
+        self.organization_ids = self.sections["organization.id"]
+        self.activity_ids = self.sections["activity.id"]
+        self.organization_buildings = self.sections["organization.building"]
+
+    @property
+    def organizations(self) -> int:
+        return len(self.organization_ids)
+
+    def string(self, name: str, ordinal: int) -> str:
+        offsets = self.sections[f"{name}.offsets"]
+        return self.sections[f"{name}.data"][offsets[ordinal]:offsets[ordinal + 1]].tobytes().decode()
+
+    def strings(self, name: str) -> "SnapshotStrings":
+        return SnapshotStrings(self, name)
+
+    def related(self, name: str, ordinal: int) -> memoryview:
+        """Порядковые номера, связанные со строкой ordinal связью name"""
+        offsets = self.sections[f"{name}.offsets"]
+        return self.sections[name][offsets[ordinal]:offsets[ordinal + 1]]
+
+    @staticmethod
+    def find(ids: memoryview, value: int) -> Optional[int]:
+        """Порядковый номер строки по id (двоичный поиск в отсортированной колонке)"""
+        i = bisect_left(ids, value)
+        return i if i < len(ids) and ids[i] == value else None
+
+    # ========== Helper Methods ==========
+    def _read_sections(self) -> Dict[str, memoryview]:
+        view = memoryview(self._mmap)
+        if len(view) < HEADER.size:
+            raise InvalidSnapshot(f"{self.path}: file is too short")
+        magic, version, count, byteorder, self.created_at = HEADER.unpack_from(view)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise InvalidSnapshot(f"{self.path}: unsupported snapshot format")
+        if byteorder != BYTEORDER:
+            raise InvalidSnapshot(f"{self.path}: snapshot was built on a platform with another byte order")
+
+        sections = {}
+        for i in range(count):
+            name, typecode, offset, size = SECTION.unpack_from(view, HEADER.size + SECTION.size * i)
+            if offset + size > len(view):
+                raise InvalidSnapshot(f"{self.path}: section {name!r} is out of bounds")
+            sections[name.rstrip(b"\0").decode()] = view[offset:offset + size].cast(typecode.decode())
+        return sections
+
+
+class SnapshotStrings(SequenceABC):
+    """Таблица строк снимка как последовательность (строка декодируется при обращении)"""
+
+    def __init__(self, snapshot: Snapshot, name: str):
+        self.snapshot = snapshot
+        self.name = name
+
+    def __getitem__(self, ordinal: int) -> str:
+        if not 0 <= ordinal < len(self):
+            raise IndexError(ordinal)
+        return self.snapshot.string(self.name, ordinal)
+
+    def __len__(self) -> int:
+        return len(self.snapshot.sections[f"{self.name}.offsets"]) - 1
+
+
+class SnapshotStore:
+    """Текущий снимок из файла path с атомарной подменой.
+
+    Раз в check_interval секунд сверяется идентичность файла (inode, mtime,
+    размер); если опубликован новый, он отображается и заменяет текущий
+    одним присваиванием. Запросы, начатые на старом снимке, дочитывают его:
+    отображение удалённого файла живёт, пока на него есть ссылки.
+    Повреждённый файл не заменяет рабочий снимок.
+    """
+
+    def __init__(self, path: str, check_interval: float):
+        self.path = path
+        self.check_interval = check_interval
+        self._snapshot: Optional[Snapshot] = None
+        self._checked_at: Optional[float] = None
+
+    def current(self) -> Optional[Snapshot]:
+        """Актуальный снимок или None (снимок не настроен или ещё не опубликован)"""
+        if not self.path:
+            return None
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            self._reload()
+        return self._snapshot
+
+    # ========== Helper Methods ==========
+    def _reload(self) -> None:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        identity = (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if self._snapshot is not None and self._snapshot.identity == identity:
+            return
+        try:
+            snapshot = Snapshot(self.path)
+        except (OSError, ValueError, KeyError):
+            logger.exception("Failed to open snapshot %s, keeping the previous one", self.path)
+            return
+        self._snapshot = snapshot
+        logger.info("Snapshot loaded: %s, %d organizations", self.path, snapshot.organizations)
+
+
+class SnapshotBuilding(NamedTuple):
+    id: int
+    address: str
+    latitude: float
+    longitude: float
+
+
+class SnapshotActivity(NamedTuple):
+    id: int
+    name: str
+    category: str
+    parent_id: Optional[int]
+    level: int
+
+
+class SnapshotPhone(NamedTuple):
+    id: int
+    number: str
+    organization_id: int
+
+
+class SnapshotOrganization(NamedTuple):
+    id: int
+    name: str
+    building_id: Optional[int]
+    building: Optional[SnapshotBuilding]
+    activities: List[SnapshotActivity]
+    phones: List[SnapshotPhone]
+    created_at: datetime
+    updated_at: datetime
+
+
+class SnapshotRepository:
+    """Чтение организаций из снимка с теми же методами, что у Repository.
+
+    Объекты — именованные кортежи с атрибутами моделей, поэтому схемы
+    ответов строятся из них так же, как из ORM (from_orm). fields не
+    влияет на чтение: кортеж собирается целиком, лишнее отбросит схема.
+    """
+
+    def __init__(self, snapshot: Snapshot):
+        self.snapshot = snapshot
+
+    def get_organization(self, org_id: int, fields: Optional[Collection[str]] = None) -> Optional[SnapshotOrganization]:
+        ordinal = self.snapshot.find(self.snapshot.organization_ids, org_id)
+        return self._organization(ordinal) if ordinal is not None else None
+
+    def get_organizations_by_ids(
+        self, org_ids: Sequence[int], fields: Optional[Collection[str]] = None
+    ) -> List[SnapshotOrganization]:
+        organizations = (self.get_organization(org_id) for org_id in dict.fromkeys(org_ids))
+        return [org for org in organizations if org is not None]
+
+    def get_organizations_in_building(
+        self, building_id: int, limit: int, cursor: Optional[str] = None, fields: Optional[Collection[str]] = None
+    ) -> Page:
+        building = self.snapshot.find(self.snapshot.building_ids, building_id)
+        ordinals = self.snapshot.related("building.organizations", building) if building is not None else []
+        return self._page([ordinals], limit, cursor)
+
+    def get_organizations_by_activity(
+        self, activity_id: int, limit: int, cursor: Optional[str] = None, fields: Optional[Collection[str]] = None
+    ) -> Page:
+        return self._page(
+            [self.snapshot.related("activity.organizations", node) for node in self._subtree(activity_id)],
+            limit, cursor
+        )
+
+    # ========== Helper Methods ==========
+    def _page(self, groups: List[Sequence[int]], limit: int, cursor: Optional[str]) -> Page:
+        """Страница по id из отсортированных списков порядковых номеров.
+
+        Порядковые номера организаций идут по возрастанию id, поэтому
+        списки сливаются без сортировки и читаются только до limit + 1.
+        """
+        after = decode_cursor(cursor, int)
+        start = bisect_right(self.snapshot.organization_ids, after[0]) if after is not None else 0
+        ordinals: List[int] = []
+        for ordinal in merge(*(group[bisect_left(group, start):] for group in groups)):
+            if ordinals and ordinals[-1] == ordinal:
+                continue  # Организация в нескольких узлах поддерева
+            ordinals.append(ordinal)
+            if len(ordinals) > limit:
+                break
+        return make_page([self._organization(ordinal) for ordinal in ordinals], limit, lambda org: (org.id,))
+
+    def _subtree(self, activity_id: int) -> List[int]:
+        """Порядковые номера узла и всех его потомков (обход с защитой от циклов)"""
+        root = self.snapshot.find(self.snapshot.activity_ids, activity_id)
+        if root is None:
+            return []
+        seen = {root}
+        stack = [root]
+        while stack:
+            for child in self.snapshot.related("activity.children", stack.pop()):
+                if child not in seen:
+                    seen.add(child)
+                    stack.append(child)
+        return list(seen)
+
+    def _organization(self, ordinal: int) -> SnapshotOrganization:
+        snapshot = self.snapshot
+        org_id = snapshot.organization_ids[ordinal]
+        building = snapshot.organization_buildings[ordinal]
+        phones = snapshot.related("organization.phones", ordinal)
+        first_phone = snapshot.sections["organization.phones.offsets"][ordinal]
+        return SnapshotOrganization(
+            id=org_id,
+            name=snapshot.string("organization.name", ordinal),
+            building_id=snapshot.building_ids[building] if building != NONE else None,
+            building=self._building(building) if building != NONE else None,
+            activities=[self._activity(activity) for activity in snapshot.related("organization.activities", ordinal)],
+            phones=[
+                SnapshotPhone(phone_id, snapshot.string("phone.number", first_phone + i), org_id)
+                for i, phone_id in enumerate(phones)
+            ],
+            created_at=EPOCH + timedelta(microseconds=snapshot.sections["organization.created_at"][ordinal]),
+            updated_at=EPOCH + timedelta(microseconds=snapshot.sections["organization.updated_at"][ordinal])
+        )
+
+    def _building(self, ordinal: int) -> SnapshotBuilding:
+        snapshot = self.snapshot
+        return SnapshotBuilding(
+            snapshot.building_ids[ordinal],
+            snapshot.string("building.address", ordinal),
+            snapshot.sections["building.latitude"][ordinal],
+            snapshot.sections["building.longitude"][ordinal]
+        )
+
+    def _activity(self, ordinal: int) -> SnapshotActivity:
+        snapshot = self.snapshot
+        parent = snapshot.sections["activity.parent"][ordinal]
+        return SnapshotActivity(
+            snapshot.activity_ids[ordinal],
+            snapshot.string("activity.name", ordinal),
+            snapshot.string("activity.category", ordinal),
+            snapshot.activity_ids[parent] if parent != NONE else None,
+            snapshot.sections["activity.level"][ordinal]
+        )
+
+
+class SnapshotDocuments:
+    """Замена DocumentRepository при чтении из снимка: готовых документов
+    в снимке нет, карточка собирается из его колонок"""
+
+    def __init__(self, snapshot: Snapshot):
+        self.snapshot = snapshot
+
+    def get(self, org_id: int) -> None:
+        return None
+
+    def get_many(self, org_ids: Sequence[int]) -> dict:
+        return {}
+
+
+snapshot_store = SnapshotStore(settings.SNAPSHOT_PATH, settings.SNAPSHOT_CHECK_INTERVAL)
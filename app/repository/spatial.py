@@ -0,0 +1,154 @@
+from sqlalchemy import and_, or_, func
+from sqlalchemy.sql.elements import ColumnElement
+from typing import List, Optional, Tuple
+import math
+
+# Регулярная сетка поверх координат: ячейка 0.01° (~1.1 км по широте).
+# Номер ячейки = строка * GRID_COLUMNS + столбец, строки идут по широте,
+# поэтому ячейки одной строки образуют непрерывный диапазон номеров.
+# Формула должна совпадать с триггером из миграции add_building_grid_cell.
+GRID_CELLS_PER_DEGREE = 100
+GRID_ROWS = 180 * GRID_CELLS_PER_DEGREE
+GRID_COLUMNS = 360 * GRID_CELLS_PER_DEGREE
+
+# Сколько строк сетки раскладывать на отдельные диапазоны,
+# прежде чем перейти к одному общему диапазону
+GRID_MAX_RANGES = 64
+
+
+def grid_row(latitude: float) -> int:
+    return max(0, min(math.floor((latitude + 90) * GRID_CELLS_PER_DEGREE), GRID_ROWS - 1))
+
+
+def grid_column(longitude: float) -> int:
+    return max(0, min(math.floor((longitude + 180) * GRID_CELLS_PER_DEGREE), GRID_COLUMNS - 1))
+
+
+def grid_cell(latitude: float, longitude: float) -> int:
+    """Номер ячейки сетки для точки"""
+    return grid_row(latitude) * GRID_COLUMNS + grid_column(longitude)
+
+
+def covering_cell_ranges(
+    min_lat: float, min_lon: float, max_lat: float, max_lon: float,
+    max_ranges: int = GRID_MAX_RANGES
+) -> List[Tuple[int, int]]:
+    """Диапазоны номеров ячеек, покрывающих прямоугольник.
+
+    Каждой строке сетки соответствует один диапазон. Если строк больше
+    max_ranges, возвращается один диапазон от первой до последней ячейки:
+    он шире, но всё равно отсекает всё за пределами полосы широт.
+    """
+    first_row, last_row = grid_row(min_lat), grid_row(max_lat)
+    first_col, last_col = grid_column(min_lon), grid_column(max_lon)
+
+    if last_row - first_row + 1 > max_ranges:
+        return [(first_row * GRID_COLUMNS + first_col, last_row * GRID_COLUMNS + last_col)]
+
+    return [
+        (row * GRID_COLUMNS + first_col, row * GRID_COLUMNS + last_col)
+        for row in range(first_row, last_row + 1)
+    ]
+
+
+def grid_cell_filter(
+    column, min_lat: float, min_lon: float, max_lat: float, max_lon: float
+) -> ColumnElement:
+    """Условие отсечения по покрывающим ячейкам (использует индекс по grid_cell)"""
+    ranges = covering_cell_ranges(min_lat, min_lon, max_lat, max_lon)
+    return or_(*[column.between(start, end) for start, end in ranges])
+
+
+def inner_cells(
+    min_lat: float, min_lon: float, max_lat: float, max_lon: float
+) -> Optional[Tuple[int, int, int, int]]:
+    """Блок ячеек (first_row, last_row, first_col, last_col), целиком лежащих в прямоугольнике.
+
+    Ячейки на границе прямоугольника покрыты им лишь частично и в блок не входят.
+    None — прямоугольник не содержит ни одной ячейки целиком.
+    """
+    first_row = max(0, math.ceil((min_lat + 90) * GRID_CELLS_PER_DEGREE))
+    last_row = min(GRID_ROWS, math.floor((max_lat + 90) * GRID_CELLS_PER_DEGREE)) - 1
+    first_col = max(0, math.ceil((min_lon + 180) * GRID_CELLS_PER_DEGREE))
+    last_col = min(GRID_COLUMNS, math.floor((max_lon + 180) * GRID_CELLS_PER_DEGREE)) - 1
+    if first_row > last_row or first_col > last_col:
+        return None
+    return first_row, last_row, first_col, last_col
+
+
+def cell_block_filter(
+    column, first_row: int, last_row: int, first_col: int, last_col: int,
+    max_ranges: int = GRID_MAX_RANGES
+) -> ColumnElement:
+    """Условие «ячейка в блоке строк и столбцов» (точное, в отличие от grid_cell_filter).
+
+    До max_ranges строк — по диапазону на строку, иначе один диапазон
+    с проверкой столбца остатком от деления.
+    """
+    if last_row - first_row + 1 <= max_ranges:
+        return or_(*[
+            column.between(row * GRID_COLUMNS + first_col, row * GRID_COLUMNS + last_col)
+            for row in range(first_row, last_row + 1)
+        ])
+    return and_(
+        column.between(first_row * GRID_COLUMNS + first_col, last_row * GRID_COLUMNS + last_col),
+        (column % GRID_COLUMNS).between(first_col, last_col)
+    )
+
+
+def rect_filter(
+    cell_column, lat_column, lon_column,
+    min_lat: float, min_lon: float, max_lat: float, max_lon: float
+) -> ColumnElement:
+    """Отсечение по ячейкам сетки и точная проверка границ прямоугольника"""
+    return and_(
+        grid_cell_filter(cell_column, min_lat, min_lon, max_lat, max_lon),
+        lat_column.between(min_lat, max_lat),
+        lon_column.between(min_lon, max_lon)
+    )
+
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = EARTH_RADIUS_M * math.pi / 180
+
+
+def bounding_boxes(latitude: float, longitude: float, radius: float) -> List[Tuple[float, float, float, float]]:
+    """Прямоугольники (min_lat, min_lon, max_lat, max_lon), вместе содержащие круг радиуса radius метров.
+
+    Круг, пересекающий антимеридиан, делится на два прямоугольника:
+    до 180° и от -180° долготы.
+    """
+    dlat = radius / METERS_PER_DEGREE
+    min_lat, max_lat = max(-90.0, latitude - dlat), min(90.0, latitude + dlat)
+    # Долготный размах берём по самой близкой к полюсу широте круга
+    cos_lat = math.cos(math.radians(min(90.0, abs(latitude) + dlat)))
+    dlon = 180.0 if cos_lat < 1e-6 else min(180.0, dlat / cos_lat)
+    west, east = longitude - dlon, longitude + dlon
+    if dlon >= 180.0:
+        return [(min_lat, -180.0, max_lat, 180.0)]
+    if west < -180.0:
+        return [(min_lat, west + 360.0, max_lat, 180.0), (min_lat, -180.0, max_lat, east)]
+    if east > 180.0:
+        return [(min_lat, west, max_lat, 180.0), (min_lat, -180.0, max_lat, east - 360.0)]
+    return [(min_lat, west, max_lat, east)]
+
+
+def circle_filter(
+    cell_column, lat_column, lon_column, latitude: float, longitude: float, radius: float
+) -> ColumnElement:
+    """Отсечение кандидатов круга по описанным прямоугольникам (без точной проверки расстояния)"""
+    return or_(*(
+        rect_filter(cell_column, lat_column, lon_column, *box)
+        for box in bounding_boxes(latitude, longitude, radius)
+    ))
+
+
+def haversine_distance(lat_column, lon_column, latitude: float, longitude: float) -> ColumnElement:
+    """SQL-выражение расстояния по большому кругу в метрах (формула гаверсинусов)"""
+    dlat = func.radians(lat_column - latitude) * 0.5
+    dlon = func.radians(lon_column - longitude) * 0.5
+    a = (
+        func.power(func.sin(dlat), 2)
+        + math.cos(math.radians(latitude)) * func.cos(func.radians(lat_column)) * func.power(func.sin(dlon), 2)
+    )
+    return 2 * EARTH_RADIUS_M * func.asin(func.sqrt(func.least(a, 1.0)))
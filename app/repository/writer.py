@@ -0,0 +1,235 @@
+from sqlalchemy.future import select
+from sqlalchemy import delete, func, insert
+from sqlalchemy.orm import selectinload, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Building, Organization, Activity, Phone
+from app.models.models import organization_activity
+from app.repository.activity_tree import activity_tree
+from app.repository.exceptions import EntityNotFound, EntityConflict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Sequence, Set, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ChangeSet:
+    """Сущности, затронутые единицей работы, — по ним строится инвалидация кеша"""
+    organization_ids: Set[int] = field(default_factory=set)
+    building_ids: Set[int] = field(default_factory=set)
+    activity_ids: Set[int] = field(default_factory=set)
+    points: Set[Tuple[float, float]] = field(default_factory=set)
+    search: bool = False
+
+
+class WriteRepository:
+    """Изменение справочника. Коммит выполняет вызывающий код, после чего
+    по накопленному changes сбрасываются зависящие от изменений ключи кеша."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.changes = ChangeSet()
+
+    # ========== Buildings ==========
+    async def create_building(self, data: Dict[str, Any]) -> Building:
+        """Создание здания"""
+        await self._ensure_unique_address(data["address"])
+        building = Building(**data)
+        self.session.add(building)
+        await self.session.flush()
+        self._touch_building(building)
+        return building
+
+    async def update_building(self, building_id: int, data: Dict[str, Any]) -> Building:
+        """Частичное обновление здания"""
+        building = await self._get_building(building_id)
+        if "address" in data and data["address"] != building.address:
+            await self._ensure_unique_address(data["address"])
+
+        self._touch_building(building)
+        for name, value in data.items():
+            setattr(building, name, value)
+        await self.session.flush()
+        self._touch_building(building)
+        return building
+
+    async def delete_building(self, building_id: int) -> None:
+        """Удаление здания без организаций"""
+        building = await self._get_building(building_id)
+        in_use = await self.session.execute(
+            select(func.count(Organization.id)).where(Organization.building_id == building_id)
+        )
+        if in_use.scalar():
+            raise EntityConflict("Building has organizations")
+
+        self._touch_building(building)
+        await self.session.delete(building)
+        await self.session.flush()
+
+    # ========== Organizations ==========
+    async def create_organization(
+        self, name: str, building_id: int, phones: Sequence[str], activity_ids: Sequence[int]
+    ) -> Organization:
+        """Создание организации вместе с телефонами и видами деятельности"""
+        building = await self._get_building(building_id)
+        activities = await self._get_activities(activity_ids)
+        for number in phones:
+            await self._ensure_unique_phone(number)
+
+        org = Organization(
+            name=name,
+            building=building,
+            phones=[Phone(number=number) for number in phones],
+            activities=activities
+        )
+        self.session.add(org)
+        await self.session.flush()
+
+        await self._touch_organization(org)
+        return await self._reload(org.id)
+
+    async def update_organization(self, org_id: int, data: Dict[str, Any]) -> Organization:
+        """Частичное обновление организации (название, здание)"""
+        org = await self._get_organization(org_id)
+        await self._touch_organization(org)
+
+        if "building_id" in data:
+            org.building = await self._get_building(data.pop("building_id"))
+        for name, value in data.items():
+            setattr(org, name, value)
+        await self.session.flush()
+
+        await self._touch_organization(org)
+        return await self._reload(org_id)
+
+    async def delete_organization(self, org_id: int) -> None:
+        """Удаление организации с её телефонами и связями"""
+        org = await self._get_organization(org_id)
+        await self._touch_organization(org)
+
+        # Связи с видами деятельности удалит ORM (коллекция загружена), телефоны — явно
+        await self.session.execute(delete(Phone).where(Phone.organization_id == org_id))
+        await self.session.delete(org)
+        await self.session.flush()
+
+    # ========== Phones ==========
+    async def add_phone(self, org_id: int, number: str) -> Phone:
+        """Добавление телефона организации"""
+        org = await self._get_organization(org_id)
+        await self._ensure_unique_phone(number)
+
+        phone = Phone(number=number, organization_id=org_id)
+        self.session.add(phone)
+        await self.session.flush()
+        await self._touch_organization(org)
+        return phone
+
+    async def delete_phone(self, org_id: int, phone_id: int) -> None:
+        """Удаление телефона организации"""
+        org = await self._get_organization(org_id)
+        result = await self.session.execute(
+            delete(Phone).where(Phone.id == phone_id, Phone.organization_id == org_id)
+        )
+        if not result.rowcount:
+            raise EntityNotFound("Phone not found")
+        await self._touch_organization(org)
+
+    # ========== Activity links ==========
+    async def link_activity(self, org_id: int, activity_id: int) -> None:
+        """Привязка вида деятельности к организации (идемпотентно)"""
+        org = await self._get_organization(org_id)
+        await self._get_activities([activity_id])
+
+        exists = await self.session.execute(
+            select(organization_activity.c.activity_id).where(
+                organization_activity.c.organization_id == org_id,
+                organization_activity.c.activity_id == activity_id
+            )
+        )
+        if exists.first() is None:
+            await self.session.execute(
+                insert(organization_activity).values(organization_id=org_id, activity_id=activity_id)
+            )
+        await self._touch_organization(org, extra_activity_ids=[activity_id])
+
+    async def unlink_activity(self, org_id: int, activity_id: int) -> None:
+        """Отвязка вида деятельности от организации"""
+        org = await self._get_organization(org_id)
+        result = await self.session.execute(
+            delete(organization_activity).where(
+                organization_activity.c.organization_id == org_id,
+                organization_activity.c.activity_id == activity_id
+            )
+        )
+        if not result.rowcount:
+            raise EntityNotFound("Activity link not found")
+        await self._touch_organization(org, extra_activity_ids=[activity_id])
+
+    # ========== Helper Methods ==========
+    async def _get_building(self, building_id: int) -> Building:
+        building = await self.session.get(Building, building_id)
+        if building is None:
+            raise EntityNotFound("Building not found")
+        return building
+
+    async def _get_organization(self, org_id: int) -> Organization:
+        result = await self.session.execute(
+            select(Organization)
+            .options(
+                joinedload(Organization.building),
+                selectinload(Organization.activities)
+            )
+            .where(Organization.id == org_id)
+        )
+        org = result.scalars().first()
+        if org is None:
+            raise EntityNotFound("Organization not found")
+        return org
+
+    async def _get_activities(self, activity_ids: Sequence[int]) -> Sequence[Activity]:
+        if not activity_ids:
+            return []
+        result = await self.session.execute(select(Activity).where(Activity.id.in_(activity_ids)))
+        activities = result.scalars().all()
+        if len(activities) != len(set(activity_ids)):
+            raise EntityNotFound("Activity not found")
+        return activities
+
+    async def _reload(self, org_id: int) -> Organization:
+        """Организация со всеми связями для ответа клиенту"""
+        self.session.expire_all()
+        result = await self.session.execute(
+            select(Organization)
+            .options(
+                joinedload(Organization.building),
+                selectinload(Organization.phones),
+                selectinload(Organization.activities)
+            )
+            .where(Organization.id == org_id)
+        )
+        return result.scalars().one()
+
+    async def _ensure_unique_address(self, address: str) -> None:
+        exists = await self.session.execute(select(Building.id).where(Building.address == address))
+        if exists.first() is not None:
+            raise EntityConflict("Building with this address already exists")
+
+    async def _ensure_unique_phone(self, number: str) -> None:
+        exists = await self.session.execute(select(Phone.id).where(Phone.number == number))
+        if exists.first() is not None:
+            raise EntityConflict("Phone number already exists")
+
+    def _touch_building(self, building: Building) -> None:
+        self.changes.building_ids.add(building.id)
+        if building.latitude is not None and building.longitude is not None:
+            self.changes.points.add((building.latitude, building.longitude))
+
+    async def _touch_organization(self, org: Organization, extra_activity_ids: Sequence[int] = ()) -> None:
+        """Запоминает организацию, её здание и виды деятельности (с предками — для тегов)"""
+        self.changes.organization_ids.add(org.id)
+        self.changes.activity_ids.update(activity.id for activity in org.activities)
+        self.changes.activity_ids.update(extra_activity_ids)
+        self.changes.search = True
+        self._touch_building(org.building)
+        await activity_tree.ensure_fresh(self.session)
@@ -0,0 +1,52 @@
+from pydantic import BaseModel, create_model
+from app.schemas.organization import OrganizationFull
+from functools import lru_cache
+from typing import Optional, Tuple, Type
+
+# Поля, которые можно запросить параметром fields= у эндпоинтов организаций:
+# любое подмножество карточки организации
+ORGANIZATION_FIELDS: Tuple[str, ...] = tuple(OrganizationFull.__fields__)
+
+Fields = Tuple[str, ...]
+
+
+def parse_fields(raw: Optional[str]) -> Optional[Fields]:
+    """Разбор fields=id,name,phones в кортеж полей в порядке схемы.
+
+    Порядок не зависит от порядка в запросе: кортеж входит в ключ кеша.
+    Пустое значение — ответ по умолчанию (None).
+    """
+    if raw is None:
+        return None
+    requested = {name.strip() for name in raw.split(",") if name.strip()}
+    if not requested:
+        return None
+    unknown = requested.difference(ORGANIZATION_FIELDS)
+    if unknown:
+        raise ValueError(
+            f"Unknown fields: {', '.join(sorted(unknown))}. Allowed: {', '.join(ORGANIZATION_FIELDS)}"
+        )
+    return tuple(name for name in ORGANIZATION_FIELDS if name in requested)
+
+
+@lru_cache(maxsize=None)
+def organization_schema(fields: Fields) -> Type[BaseModel]:
+    """Схема организации только с полями fields (создаётся один раз на набор)"""
+    definitions = {
+        name: (OrganizationFull.__fields__[name].annotation, OrganizationFull.__fields__[name].field_info)
+        for name in fields
+    }
+    return create_model(
+        f"OrganizationFields_{'_'.join(fields)}", __config__=OrganizationFull.__config__, **definitions
+    )
+
+
+@lru_cache(maxsize=None)
+def organization_distance_schema(fields: Fields) -> Type[BaseModel]:
+    """OrganizationDistance с урезанной организацией"""
+    return create_model(
+        f"OrganizationDistanceFields_{'_'.join(fields)}",
+        __config__=OrganizationFull.__config__,
+        organization=(organization_schema(fields), ...),
+        distance=(float, ...)
+    )
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime
 
@@ -59,6 +59,12 @@ class BuildingInRect(BaseModel):
     class Config:
         orm_mode = True
 
+class OrganizationShort(OrganizationBase):
+    id: int
+
+class BuildingWithOrganizations(BuildingInRect):
+    organizations: List[OrganizationShort] = []
+
 
 class Activity(ActivitySimple):
     children: List['Activity'] = []
@@ -86,4 +92,104 @@ class OrganizationWithActivities(OrganizationBase):
 class OrganizationWithBuilding(OrganizationBase):
     building: Building
 
+
+class OrganizationWithPhones(OrganizationBase):
+    id: int
+    building: Building
+    phones: List[Phone] = []
+
+    class Config:
+        orm_mode = True
+
+
+class OrganizationBatchItem(BaseModel):
+    id: int
+    found: bool
+    organization: Optional[OrganizationFull] = None
+
+
+class OrganizationDistance(BaseModel):
+    organization: OrganizationWithPhones
+    distance: float  # В метрах
+
+    class Config:
+        orm_mode = True
+
 Activity.update_forward_refs()
+
+
+class ActivityFacet(BaseModel):
+    id: int
+    name: str
+    parent_id: Optional[int] = None
+    level: int
+    organizations: int  # С учётом всего поддерева
+
+    class Config:
+        orm_mode = True
+
+
+class BuildingFacet(BaseModel):
+    id: int
+    address: str
+    organizations: int
+
+    class Config:
+        orm_mode = True
+
+
+class Facets(BaseModel):
+    activities: List[ActivityFacet] = []
+    buildings: List[BuildingFacet] = []
+
+
+class Cluster(BaseModel):
+    latitude: float  # Центроид зданий ячейки
+    longitude: float
+    buildings: int
+    organizations: int
+
+    class Config:
+        orm_mode = True
+
+
+class BuildingMarker(BaseModel):
+    id: int
+    address: str
+    latitude: float
+    longitude: float
+    organizations: int
+
+    class Config:
+        orm_mode = True
+
+
+class Clusters(BaseModel):
+    zoom: int
+    cell_size: float  # Сторона ячейки в градусах
+    clusters: List[Cluster] = []  # Пусто, если здания отданы по отдельности
+    buildings: List[BuildingMarker] = []
+
+
+class BuildingCreate(BaseModel):
+    address: str = Field(..., min_length=1, max_length=255)
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+
+
+class BuildingUpdate(BaseModel):
+    address: Optional[str] = Field(None, min_length=1, max_length=255)
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+
+
+class OrganizationCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=255)
+    building_id: int
+    phones: List[str] = []
+    activity_ids: List[int] = []
+
+
+class OrganizationUpdate(BaseModel):
+    name: Optional[str] = Field(None, min_length=1, max_length=255)
+    building_id: Optional[int] = None
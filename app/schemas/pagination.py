@@ -0,0 +1,12 @@
+from pydantic.generics import GenericModel
+from typing import Generic, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class Page(GenericModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None  # None — последняя страница
+
+    class Config:
+        orm_mode = True
@@ -0,0 +1,61 @@
+from app.cache import response_cache, organization_cache_key, encode_json
+from app.cache.tags import organization_tag, building_tag
+from app.config import settings
+from app.repository import Repository
+from app.repository.documents import DocumentRepository
+from app.repository.fallback import SnapshotFallback, track_snapshot_reads
+from app.repository.snapshot import SnapshotDocuments
+from app.schemas.organization import OrganizationFull
+from typing import Dict, List, Sequence, Tuple
+
+
+async def get_organizations_batch(repo: Repository, org_ids: Sequence[int]) -> bytes:
+    """Пакетное получение организаций в порядке запроса (JSON-массив OrganizationBatchItem).
+
+    Уже закешированные карточки читаются из кеша одним MGET, из БД
+    догружаются только промахи, и они же кладутся в кеш под теми же
+    ключами, что использует GET /api/organizations/{org_id} (кроме карточек
+    из резервного снимка). Ответ собирается из сериализованных карточек
+    без их разбора.
+    """
+    unique_ids = list(dict.fromkeys(org_ids))
+    cached = await response_cache.get_many([organization_cache_key(org_id) for org_id in unique_ids])
+
+    found: Dict[int, bytes] = {
+        org_id: raw
+        for org_id, raw in zip(unique_ids, cached)
+        if raw is not None
+    }
+
+    misses = [org_id for org_id in unique_ids if org_id not in found]
+    if misses:
+        to_cache = {}
+        with track_snapshot_reads() as reads:
+            cards = await _load_cards(repo, misses)
+        for org_id, building_id, raw in cards:
+            found[org_id] = raw
+            to_cache[organization_cache_key(org_id)] = (
+                raw, {organization_tag(org_id), building_tag(building_id)}
+            )
+        if not reads.used:
+            await response_cache.set_many(to_cache, settings.REDIS_CACHE_TTL)
+
+    items = [
+        b'{"id":%d,"found":true,"organization":%s}' % (org_id, found[org_id]) if org_id in found
+        else b'{"id":%d,"found":false,"organization":null}' % org_id
+        for org_id in org_ids
+    ]
+    return b"[" + b",".join(items) + b"]"
+
+
+async def _load_cards(repo: Repository, org_ids: List[int]) -> List[Tuple[int, int, bytes]]:
+    """(id, building_id, JSON карточки) найденных организаций: из read-model,
+    если он включён, остальные — сборкой из таблиц"""
+    cards = []
+    if settings.ORGANIZATION_DOCUMENTS_ENABLED:
+        documents = await SnapshotFallback(DocumentRepository(repo.session), SnapshotDocuments).get_many(org_ids)
+        cards.extend((org_id, doc.building_id, doc.raw) for org_id, doc in documents.items())
+        org_ids = [org_id for org_id in org_ids if org_id not in documents]
+    for org in await repo.get_organizations_by_ids(org_ids):
+        cards.append((org.id, org.building_id, encode_json(OrganizationFull.from_orm(org))))
+    return cards
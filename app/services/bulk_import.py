@@ -0,0 +1,342 @@
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import asyncpg
+import csv
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+COPY_CHUNK_SIZE = 10000
+
+# Промежуточные таблицы без ограничений: COPY в них не проверяет ничего,
+# все проверки ссылок и уникальности выполняются потом одним запросом на правило.
+# line — строка исходного файла для отчёта, seq — порядок загрузки по всем файлам
+STAGING_TABLES = {
+    "staging_buildings": ("seq bigserial, line int, id int, address text, latitude float8, longitude float8",
+                          ["line", "id", "address", "latitude", "longitude"]),
+    "staging_organizations": ("seq bigserial, line int, id int, name text, building_id int",
+                              ["line", "id", "name", "building_id"]),
+    "staging_phones": ("seq bigserial, line int, number text, organization_id int",
+                       ["line", "number", "organization_id"]),
+    "staging_links": ("seq bigserial, line int, organization_id int, activity_id int",
+                      ["line", "organization_id", "activity_id"]),
+}
+
+# Индексы под правила проверки и слияние: создаются после COPY (загрузка не тратит
+# время на их поддержку), затем ANALYZE даёт планировщику реальные размеры таблиц
+STAGING_INDEXES = {
+    "staging_buildings": ["id", "address"],
+    "staging_organizations": ["id"],
+    "staging_phones": ["number"],
+    "staging_links": ["organization_id, activity_id"],
+}
+
+# (промежуточная таблица, причина, условие отбраковки). Порядок важен:
+# организации проверяются по уже отфильтрованным зданиям и т.д.
+# Строки без причины — повторы одной записи (в NDJSON здание повторяется
+# у каждой организации): побеждает последняя, в отчёт они не попадают.
+VALIDATION_RULES = [
+    ("staging_buildings", "invalid building fields",
+     "s.id IS NULL OR coalesce(s.address, '') = '' OR s.latitude IS NULL OR s.longitude IS NULL"
+     " OR s.latitude NOT BETWEEN -90 AND 90 OR s.longitude NOT BETWEEN -180 AND 180"),
+    ("staging_buildings", None,
+     "EXISTS (SELECT 1 FROM staging_buildings t WHERE t.id = s.id AND t.seq > s.seq)"),
+    # Адрес занят зданием БД, которое загрузка не переносит на другой адрес
+    ("staging_buildings", "address belongs to another building",
+     "EXISTS (SELECT 1 FROM buildings b WHERE b.address = s.address AND b.id <> s.id"
+     " AND NOT EXISTS (SELECT 1 FROM staging_buildings t WHERE t.id = b.id AND t.address <> b.address))"),
+    # Адрес уже занят более ранним зданием загрузки
+    ("staging_buildings", "address belongs to another building",
+     "EXISTS (SELECT 1 FROM staging_buildings t WHERE t.address = s.address AND t.id <> s.id AND t.seq < s.seq)"),
+    ("staging_organizations", "invalid organization fields",
+     "s.id IS NULL OR coalesce(s.name, '') = '' OR s.building_id IS NULL"),
+    ("staging_organizations", None,
+     "EXISTS (SELECT 1 FROM staging_organizations t WHERE t.id = s.id AND t.seq > s.seq)"),
+    ("staging_organizations", "unknown building",
+     "NOT EXISTS (SELECT 1 FROM buildings b WHERE b.id = s.building_id)"
+     " AND NOT EXISTS (SELECT 1 FROM staging_buildings b WHERE b.id = s.building_id)"),
+    ("staging_phones", "invalid phone fields",
+     "coalesce(s.number, '') = '' OR s.organization_id IS NULL"),
+    ("staging_phones", None,
+     "EXISTS (SELECT 1 FROM staging_phones t WHERE t.number = s.number AND t.seq > s.seq)"),
+    ("staging_phones", "unknown organization",
+     "NOT EXISTS (SELECT 1 FROM organizations o WHERE o.id = s.organization_id)"
+     " AND NOT EXISTS (SELECT 1 FROM staging_organizations o WHERE o.id = s.organization_id)"),
+    ("staging_links", "invalid link fields",
+     "s.organization_id IS NULL OR s.activity_id IS NULL"),
+    ("staging_links", None,
+     "EXISTS (SELECT 1 FROM staging_links t WHERE t.organization_id = s.organization_id"
+     " AND t.activity_id = s.activity_id AND t.seq > s.seq)"),
+    ("staging_links", "unknown organization",
+     "NOT EXISTS (SELECT 1 FROM organizations o WHERE o.id = s.organization_id)"
+     " AND NOT EXISTS (SELECT 1 FROM staging_organizations o WHERE o.id = s.organization_id)"),
+    ("staging_links", "unknown activity",
+     "NOT EXISTS (SELECT 1 FROM activities a WHERE a.id = s.activity_id)"),
+]
+
+UPSERTS = {
+    "buildings": """
+        INSERT INTO buildings (id, address, latitude, longitude)
+        SELECT id, address, latitude, longitude FROM staging_buildings
+        ON CONFLICT (id) DO UPDATE
+        SET address = EXCLUDED.address, latitude = EXCLUDED.latitude, longitude = EXCLUDED.longitude
+        WHERE (buildings.address, buildings.latitude, buildings.longitude)
+              IS DISTINCT FROM (EXCLUDED.address, EXCLUDED.latitude, EXCLUDED.longitude)
+    """,
+    "organizations": """
+        INSERT INTO organizations (id, name, building_id)
+        SELECT id, name, building_id FROM staging_organizations
+        ON CONFLICT (id) DO UPDATE
+        SET name = EXCLUDED.name, building_id = EXCLUDED.building_id, updated_at = now()
+        WHERE (organizations.name, organizations.building_id)
+              IS DISTINCT FROM (EXCLUDED.name, EXCLUDED.building_id)
+    """,
+    "phones": """
+        INSERT INTO phones (number, organization_id)
+        SELECT number, organization_id FROM staging_phones
+        ON CONFLICT (number) DO UPDATE
+        SET organization_id = EXCLUDED.organization_id
+        WHERE phones.organization_id IS DISTINCT FROM EXCLUDED.organization_id
+    """,
+    "organization_activity": """
+        INSERT INTO organization_activity (organization_id, activity_id)
+        SELECT organization_id, activity_id FROM staging_links
+        ON CONFLICT DO NOTHING
+    """,
+}
+
+# Для организаций из загрузки телефоны и связи приводятся к составу из файла
+REPLACE_RELATIONS = {
+    "phones": """
+        DELETE FROM phones p
+        USING staging_organizations o
+        WHERE p.organization_id = o.id
+          AND NOT EXISTS (SELECT 1 FROM staging_phones s WHERE s.number = p.number AND s.organization_id = o.id)
+    """,
+    "organization_activity": """
+        DELETE FROM organization_activity l
+        USING staging_organizations o
+        WHERE l.organization_id = o.id
+          AND NOT EXISTS (
+              SELECT 1 FROM staging_links s
+              WHERE s.organization_id = o.id AND s.activity_id = l.activity_id
+          )
+    """,
+}
+
+SEQUENCE_TABLES = ["buildings", "organizations", "phones", "activities"]
+
+
+@dataclass
+class ImportReport:
+    staged: Dict[str, int] = field(default_factory=dict)
+    inserted: Dict[str, int] = field(default_factory=dict)
+    updated: Dict[str, int] = field(default_factory=dict)
+    deleted: Dict[str, int] = field(default_factory=dict)
+    rejected: List[Dict[str, Any]] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, Any]:
+        rejected: Dict[str, int] = {}
+        for row in self.rejected:
+            rejected[row["table"]] = rejected.get(row["table"], 0) + 1
+        return {
+            "staged": self.staged,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "deleted": self.deleted,
+            "rejected": rejected,
+        }
+
+
+# ========== Чтение источников ==========
+Record = Tuple[Any, ...]
+
+
+def _int(value: Any) -> Optional[int]:
+    return None if value in (None, "") else int(value)
+
+
+def _float(value: Any) -> Optional[float]:
+    return None if value in (None, "") else float(value)
+
+
+def _str(value: Any) -> Optional[str]:
+    return None if value is None else str(value).strip()
+
+
+CSV_COLUMNS: Dict[str, List[Tuple[str, Callable[[Any], Any]]]] = {
+    "staging_buildings": [("id", _int), ("address", _str), ("latitude", _float), ("longitude", _float)],
+    "staging_organizations": [("id", _int), ("name", _str), ("building_id", _int)],
+    "staging_phones": [("number", _str), ("organization_id", _int)],
+    "staging_links": [("organization_id", _int), ("activity_id", _int)],
+}
+
+
+def read_csv(path: str, table: str, report: ImportReport) -> Iterator[Record]:
+    """Записи промежуточной таблицы из CSV с заголовком"""
+    columns = CSV_COLUMNS[table]
+    with open(path, newline="", encoding="utf-8") as f:
+        for line, row in enumerate(csv.DictReader(f), start=2):
+            try:
+                yield (line, *(convert(row.get(name)) for name, convert in columns))
+            except (TypeError, ValueError) as e:
+                report.rejected.append({"table": table, "line": line, "reason": f"parse error: {e}", "row": row})
+
+
+def read_ndjson(path: str, report: ImportReport) -> Iterator[Tuple[str, Record]]:
+    """Записи всех промежуточных таблиц из NDJSON в формате выгрузки /export"""
+    with open(path, encoding="utf-8") as f:
+        for line, raw in enumerate(f, start=1):
+            if not raw.strip():
+                continue
+            try:
+                doc = json.loads(raw)
+                org_id = _int(doc["id"])
+                building = doc.get("building")
+                building_id = _int(doc.get("building_id") or (building or {}).get("id"))
+                records = []
+                if building:
+                    records.append(("staging_buildings", (
+                        line, _int(building["id"]), _str(building["address"]),
+                        _float(building["latitude"]), _float(building["longitude"])
+                    )))
+                records.append(("staging_organizations", (line, org_id, _str(doc["name"]), building_id)))
+                for phone in doc.get("phones", []):
+                    records.append(("staging_phones", (line, _str(phone["number"]), org_id)))
+                for activity in doc.get("activities", []):
+                    records.append(("staging_links", (line, org_id, _int(activity["id"]))))
+            except (KeyError, TypeError, ValueError) as e:
+                report.rejected.append({"table": "ndjson", "line": line, "reason": f"parse error: {e!r}"})
+                continue
+            yield from records
+
+
+def _chunks(records: Iterable[Record], size: int) -> Iterator[List[Record]]:
+    chunk: List[Record] = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# ========== Загрузка ==========
+class BulkImporter:
+    """Массовая загрузка справочника через COPY в промежуточные таблицы.
+
+    Все шаги идут в одной транзакции: COPY → проверка ссылок и
+    уникальности набором DELETE ... RETURNING (отбракованные строки
+    попадают в отчёт) → upsert в рабочие таблицы. Повторная загрузка
+    того же файла ничего не меняет, поэтому подходит для инкрементальных
+    ночных выгрузок.
+    """
+
+    def __init__(self, conn: asyncpg.Connection, replace_relations: bool = False):
+        self.conn = conn
+        self.replace_relations = replace_relations
+        self.report = ImportReport()
+
+    async def prepare(self) -> None:
+        for table, (columns, _) in STAGING_TABLES.items():
+            await self.conn.execute(f"CREATE TEMP TABLE {table} ({columns}) ON COMMIT DROP")
+
+    async def copy(self, table: str, records: Iterable[Record]) -> None:
+        """COPY записей в промежуточную таблицу пачками по COPY_CHUNK_SIZE"""
+        columns = STAGING_TABLES[table][1]
+        for chunk in _chunks(records, COPY_CHUNK_SIZE):
+            await self.conn.copy_records_to_table(table, records=chunk, columns=columns)
+            self.report.staged[table] = self.report.staged.get(table, 0) + len(chunk)
+
+    async def copy_ndjson(self, path: str) -> None:
+        """NDJSON раскладывается сразу в несколько промежуточных таблиц"""
+        buffers: Dict[str, List[Record]] = {table: [] for table in STAGING_TABLES}
+        for table, record in read_ndjson(path, self.report):
+            buffer = buffers[table]
+            buffer.append(record)
+            if len(buffer) >= COPY_CHUNK_SIZE:
+                await self.copy(table, buffer)
+                buffer.clear()
+        for table, buffer in buffers.items():
+            if buffer:
+                await self.copy(table, buffer)
+
+    async def validate(self) -> None:
+        for table, indexes in STAGING_INDEXES.items():
+            for columns in indexes:
+                await self.conn.execute(f"CREATE INDEX ON {table} ({columns})")
+        for table in STAGING_TABLES:
+            await self.conn.execute(f"ANALYZE {table}")
+
+        for table, reason, condition in VALIDATION_RULES:
+            if reason is None:
+                await self.conn.execute(f"DELETE FROM {table} s WHERE {condition}")
+                continue
+            rows = await self.conn.fetch(
+                f"DELETE FROM {table} s WHERE {condition} RETURNING row_to_json(s)::text AS row"
+            )
+            for row in rows:
+                data = json.loads(row["row"])
+                data.pop("seq")
+                self.report.rejected.append({
+                    "table": table, "line": data.pop("line"), "reason": reason, "row": data
+                })
+
+    async def merge(self) -> None:
+        await self.sync_sequences()
+        for table, sql in UPSERTS.items():
+            counts = await self.conn.fetchrow(f"""
+                WITH upserted AS ({sql} RETURNING (xmax = 0) AS inserted)
+                SELECT count(*) FILTER (WHERE inserted) AS inserted,
+                       count(*) FILTER (WHERE NOT inserted) AS updated
+                FROM upserted
+            """)
+            self.report.inserted[table] = counts["inserted"]
+            self.report.updated[table] = counts["updated"]
+
+        if self.replace_relations:
+            for table, sql in REPLACE_RELATIONS.items():
+                status = await self.conn.execute(sql)
+                self.report.deleted[table] = int(status.split()[-1])
+
+        await self.sync_sequences()
+
+    async def sync_sequences(self) -> None:
+        """Сдвиг последовательностей id за максимальный загруженный id"""
+        for table in SEQUENCE_TABLES:
+            await self.conn.execute(f"""
+                SELECT setval(pg_get_serial_sequence('{table}', 'id'), max(id))
+                FROM {table} HAVING max(id) IS NOT NULL
+            """)
+
+    async def run(
+        self,
+        csv_sources: Sequence[Tuple[str, str]] = (),
+        ndjson_sources: Sequence[str] = (),
+        dry_run: bool = False
+    ) -> ImportReport:
+        """Полный цикл загрузки; при dry_run транзакция откатывается"""
+        transaction = self.conn.transaction()
+        await transaction.start()
+        try:
+            await self.prepare()
+            for table, path in csv_sources:
+                logger.info("Copying %s into %s", path, table)
+                await self.copy(table, read_csv(path, table, self.report))
+            for path in ndjson_sources:
+                logger.info("Copying %s", path)
+                await self.copy_ndjson(path)
+
+            await self.validate()
+            await self.merge()
+        except BaseException:
+            await transaction.rollback()
+            raise
+
+        if dry_run:
+            await transaction.rollback()
+        else:
+            await transaction.commit()
+        return self.report
@@ -0,0 +1,19 @@
+from app.cache import encode_json
+from app.repository import Repository
+from app.schemas.organization import OrganizationFull
+from typing import AsyncIterator, Optional
+from datetime import datetime
+
+
+async def export_ndjson(
+    repo: Repository,
+    batch_size: int,
+    updated_since: Optional[datetime] = None,
+    activity_id: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """Выгрузка организаций в NDJSON: одна организация со связями на строку"""
+    async for batch in repo.stream_organizations(batch_size, updated_since, activity_id):
+        yield b"".join(
+            encode_json(OrganizationFull.from_orm(org)) + b"\n"
+            for org in batch
+        )
@@ -0,0 +1,27 @@
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.repository.facets import FacetRepository
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def run_facet_refresh(sessionmaker: async_sessionmaker, interval: float, batch_size: int) -> None:
+    """Фоновый пересчёт фасетов: грязные ячейки пачками по batch_size.
+
+    Пока пачки полные, следующая берётся сразу (догоняем после массовой
+    загрузки), иначе — пауза interval секунд. Ошибки логируются, цикл
+    продолжается: до пересчёта ячейки просто считаются по связям.
+    """
+    while True:
+        refreshed = 0
+        try:
+            async with sessionmaker() as session:
+                refreshed = await FacetRepository(session).refresh(batch_size)
+                await session.commit()
+            if refreshed:
+                logger.debug("Facet cells refreshed: %d", refreshed)
+        except Exception:
+            logger.exception("Facet refresh failed")
+        if refreshed < batch_size:
+            await asyncio.sleep(interval)
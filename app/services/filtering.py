@@ -0,0 +1,34 @@
+from app.repository import Repository
+from app.repository.filter_index import FilterIndex, Rect
+from app.repository.pagination import Page, decode_cursor, encode_cursor
+from app.config import settings
+from typing import Collection, Optional
+import asyncio
+
+
+async def filter_organizations(
+    repo: Repository,
+    index: FilterIndex,
+    fields: Collection[str],
+    limit: int,
+    cursor: Optional[str] = None,
+    activity_id: Optional[int] = None,
+    rect: Optional[Rect] = None,
+    name: Optional[str] = None
+) -> Page:
+    """Страница организаций по пересечению фильтров.
+
+    ID страницы отбираются битовым индексом, из БД догружается только
+    страница (в порядке индекса). Организация, удалённая после сборки
+    снимка, просто выпадает из страницы. Страница может быть неполной,
+    если подстроку названия проверили у FILTER_MAX_CANDIDATES кандидатов.
+    """
+    snapshot = await index.ensure_fresh(repo.session)
+    after = decode_cursor(cursor, int, int)
+    # Перебор кандидатов — чистый Python: не держим цикл событий
+    org_ids, next_key = await asyncio.to_thread(
+        snapshot.filter, activity_id, rect, name, after, limit, settings.FILTER_MAX_CANDIDATES
+    )
+    loaded = {org.id: org for org in await repo.get_organizations_by_ids(org_ids, fields)}
+    items = [loaded[org_id] for org_id in org_ids if org_id in loaded]
+    return Page(items, encode_cursor(*next_key) if next_key is not None else None)
@@ -0,0 +1,139 @@
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Activity, Building, Organization, Phone
+from app.models.models import organization_activity
+from app.repository.filter_index import build_filter_columns, write_filter_columns
+from app.repository.snapshot import NONE, SnapshotWriter, to_microseconds
+from array import array
+from collections import namedtuple
+from typing import Dict, List, Sequence, Tuple
+
+FilterRow = namedtuple("FilterRow", "id name grid_cell latitude longitude")
+
+
+async def compile_snapshot(session: AsyncSession, path: str) -> Dict[str, int]:
+    """Сборка снимка справочника из БД и атомарная публикация в path.
+
+    Все таблицы читаются в одной транзакции REPEATABLE READ — снимок
+    согласован. Возвращает число строк по таблицам и размер файла.
+    """
+    await session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    buildings = (await session.execute(
+        select(
+            Building.id, Building.address, Building.latitude, Building.longitude, Building.grid_cell
+        ).order_by(Building.id)
+    )).all()
+    organizations = (await session.execute(
+        select(
+            Organization.id, Organization.name, Organization.building_id,
+            Organization.created_at, Organization.updated_at
+        ).order_by(Organization.id)
+    )).all()
+    phones = (await session.execute(
+        select(Phone.id, Phone.organization_id, Phone.number).order_by(Phone.organization_id, Phone.id)
+    )).all()
+    activities = (await session.execute(
+        select(Activity.id, Activity.name, Activity.category, Activity.parent_id, Activity.level).order_by(Activity.id)
+    )).all()
+    links = (await session.execute(
+        select(organization_activity.c.organization_id, organization_activity.c.activity_id)
+        .order_by(organization_activity.c.organization_id, organization_activity.c.activity_id)
+    )).all()
+    return write_snapshot(path, buildings, organizations, phones, activities, links)
+
+
+def write_snapshot(
+    path: str,
+    buildings: Sequence,
+    organizations: Sequence,
+    phones: Sequence,
+    activities: Sequence,
+    links: Sequence
+) -> Dict[str, int]:
+    """Запись снимка из строк таблиц (порядок — как у запросов compile_snapshot)"""
+    building_ordinal = {row.id: i for i, row in enumerate(buildings)}
+    organization_ordinal = {row.id: i for i, row in enumerate(organizations)}
+    activity_ordinal = {row.id: i for i, row in enumerate(activities)}
+
+    writer = SnapshotWriter()
+    writer.add("building.id", array("q", (row.id for row in buildings)))
+    writer.add("building.latitude", array("d", (row.latitude or 0.0 for row in buildings)))
+    writer.add("building.longitude", array("d", (row.longitude or 0.0 for row in buildings)))
+    writer.add_strings("building.address", (row.address for row in buildings))
+
+    writer.add("organization.id", array("q", (row.id for row in organizations)))
+    writer.add("organization.building", array("q", (
+        building_ordinal.get(row.building_id, NONE) for row in organizations
+    )))
+    writer.add_strings("organization.name", (row.name for row in organizations))
+    writer.add("organization.created_at", array("q", (to_microseconds(row.created_at) for row in organizations)))
+    writer.add("organization.updated_at", array("q", (to_microseconds(row.updated_at) for row in organizations)))
+
+    # Организации зданий и видов деятельности — порядковые номера по возрастанию,
+    # потому что организации перебираются в порядке id
+    building_organizations: List[List[int]] = [[] for _ in buildings]
+    for i, row in enumerate(organizations):
+        if row.building_id in building_ordinal:
+            building_organizations[building_ordinal[row.building_id]].append(i)
+    writer.add_relation("building.organizations", building_organizations)
+
+    organization_phones: List[List[int]] = [[] for _ in organizations]
+    phone_rows = [row for row in phones if row.organization_id in organization_ordinal]
+    for row in phone_rows:
+        organization_phones[organization_ordinal[row.organization_id]].append(row.id)
+    # phone.number идёт в том же порядке, что и id телефонов в связи
+    writer.add_relation("organization.phones", organization_phones)
+    writer.add_strings("phone.number", (row.number for row in phone_rows))
+
+    organization_activities: List[List[int]] = [[] for _ in organizations]
+    activity_organizations: List[List[int]] = [[] for _ in activities]
+    for org_id, activity_id in links:
+        if org_id in organization_ordinal and activity_id in activity_ordinal:
+            organization_activities[organization_ordinal[org_id]].append(activity_ordinal[activity_id])
+            activity_organizations[activity_ordinal[activity_id]].append(organization_ordinal[org_id])
+    for group in activity_organizations:
+        group.sort()
+    writer.add_relation("organization.activities", organization_activities)
+    writer.add_relation("activity.organizations", activity_organizations)
+
+    writer.add("activity.id", array("q", (row.id for row in activities)))
+    writer.add("activity.parent", array("q", (activity_ordinal.get(row.parent_id, NONE) for row in activities)))
+    writer.add("activity.level", array("q", (row.level or 1 for row in activities)))
+    writer.add_strings("activity.name", (row.name for row in activities))
+    writer.add_strings("activity.category", (row.category for row in activities))
+    children: List[List[int]] = [[] for _ in activities]
+    for i, row in enumerate(activities):
+        if row.parent_id in activity_ordinal:
+            children[activity_ordinal[row.parent_id]].append(i)
+    writer.add_relation("activity.children", children)
+
+    # Индекс комбинированных фильтров: один на хост вместо сборки в каждом воркере
+    filter_rows = []
+    for row in organizations:
+        building = buildings[building_ordinal[row.building_id]] if row.building_id in building_ordinal else None
+        filter_rows.append(FilterRow(
+            row.id, row.name,
+            *((building.grid_cell, building.latitude, building.longitude) if building else (None, None, None))
+        ))
+    subtrees = {
+        row.id: tuple(activities[node].id for node in _subtree(children, i)) for i, row in enumerate(activities)
+    }
+    write_filter_columns(writer, build_filter_columns(filter_rows, links, subtrees))
+
+    size = writer.write(path)
+    return {
+        "buildings": len(buildings), "organizations": len(organizations), "phones": len(phone_rows),
+        "activities": len(activities), "links": len(links), "bytes": size
+    }
+
+
+def _subtree(children: Sequence[Sequence[int]], root: int) -> Tuple[int, ...]:
+    """Порядковые номера узла и всех его потомков (обход с защитой от циклов)"""
+    seen = {root}
+    stack = [root]
+    while stack:
+        for child in children[stack.pop()]:
+            if child not in seen:
+                seen.add(child)
+                stack.append(child)
+    return tuple(seen)
@@ -0,0 +1,141 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.endpoints import organizations
+from app.repository.activity_tree import activity_tree
+from collections import Counter
+from functools import partial
+from typing import AsyncContextManager, Awaitable, Callable, List, Optional, Tuple
+import asyncio
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+SessionFactory = Callable[[], AsyncContextManager[AsyncSession]]
+Job = Tuple[str, Callable[..., Awaitable]]  # (имя для лога, эндпоинт с аргументами кроме db)
+
+# Строки access-лога uvicorn и nginx: "GET /api/organizations/12 HTTP/1.1"
+ORGANIZATION_REQUEST = re.compile(r'"GET /api/organizations/(\d+)[ ?]')
+BUILDING_REQUEST = re.compile(r'"GET /api/organizations/in_building/(\d+)[ ?]')
+
+
+class WarmupState:
+    """Состояние прогрева для /ready"""
+
+    def __init__(self):
+        self.ready = False
+        self.warmed = 0
+        self.failed = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def snapshot(self) -> dict:
+        duration = None
+        if self.started_at is not None:
+            duration = round((self.finished_at or time.monotonic()) - self.started_at, 3)
+        return {"ready": self.ready, "warmed": self.warmed, "failed": self.failed, "duration": duration}
+
+
+warmup_state = WarmupState()
+
+
+def hot_ids_from_access_log(path: str, top_n: int) -> Tuple[List[int], List[int]]:
+    """Самые запрашиваемые карточки организаций и здания (/in_building) по access-логу"""
+    organization_hits: Counter = Counter()
+    building_hits: Counter = Counter()
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            match = ORGANIZATION_REQUEST.search(line)
+            if match:
+                organization_hits[int(match.group(1))] += 1
+                continue
+            match = BUILDING_REQUEST.search(line)
+            if match:
+                building_hits[int(match.group(1))] += 1
+    return (
+        [org_id for org_id, _ in organization_hits.most_common(top_n)],
+        [building_id for building_id, _ in building_hits.most_common(top_n)]
+    )
+
+
+async def warm_up(
+    session_factory: SessionFactory,
+    organization_ids: List[int],
+    building_ids: List[int],
+    concurrency: int,
+    cache_enabled: bool = True
+) -> None:
+    """Прогрев: индекс видов деятельности, затем ключи кеша горячих ответов.
+
+    Эндпоинты вызываются с теми же аргументами, что подставляет FastAPI
+    для запроса без параметров, поэтому ключи совпадают с ключами живого
+    трафика. Не больше concurrency одновременных сессий; ошибка одного
+    ключа не останавливает прогрев.
+    """
+    async with session_factory() as session:
+        tree = await activity_tree.ensure_fresh(session)
+    if not cache_enabled:
+        return
+
+    limit = organizations.PAGE_LIMIT.default
+    jobs: List[Job] = [
+        (f"by_activity:{activity_id}", partial(
+            organizations.get_orgs_by_activity, activity_id=activity_id, limit=limit, cursor=None, fields=None
+        ))
+        for activity_id in tree.roots()
+    ]
+    jobs.extend(
+        (f"in_building:{building_id}", partial(
+            organizations.get_orgs_in_building, building_id=building_id, limit=limit, cursor=None, fields=None
+        ))
+        for building_id in dict.fromkeys(building_ids)
+    )
+    jobs.extend(
+        (f"organization:{org_id}", partial(organizations.get_organization, org_id=org_id, fields=None))
+        for org_id in dict.fromkeys(organization_ids)
+    )
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(name: str, job: Callable[..., Awaitable]) -> None:
+        async with semaphore:
+            try:
+                async with session_factory() as session:
+                    await job(db=session)
+                warmup_state.warmed += 1
+            except Exception as e:
+                # Например, 404 для удалённой организации из старого лога
+                warmup_state.failed += 1
+                logger.debug("Warm-up of %s failed: %r", name, e)
+
+    await asyncio.gather(*(run(name, job) for name, job in jobs))
+
+
+async def run_warmup(
+    session_factory: SessionFactory,
+    organization_ids: List[int],
+    building_ids: List[int],
+    access_log: Optional[str],
+    top_n: int,
+    concurrency: int,
+    timeout: float,
+    cache_enabled: bool = True
+) -> None:
+    """Фоновый прогрев при старте; по завершении или по таймауту экземпляр готов"""
+    warmup_state.started_at = time.monotonic()
+    try:
+        if access_log:
+            logged_organizations, logged_buildings = hot_ids_from_access_log(access_log, top_n)
+            organization_ids = organization_ids + logged_organizations
+            building_ids = building_ids + logged_buildings
+        await asyncio.wait_for(
+            warm_up(session_factory, organization_ids, building_ids, concurrency, cache_enabled), timeout
+        )
+    except asyncio.TimeoutError:
+        logger.warning("Warm-up timed out after %.0fs, serving with a partially warm cache", timeout)
+    except Exception:
+        logger.exception("Warm-up failed, serving with a cold cache")
+    finally:
+        warmup_state.finished_at = time.monotonic()
+        warmup_state.ready = True
+        logger.info("Warm-up finished: %s", warmup_state.snapshot())
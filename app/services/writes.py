@@ -0,0 +1,27 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.cache import response_cache
+from app.cache.tags import tags_for_changes
+from app.config import settings
+from app.repository.writer import ChangeSet
+from app.repository.documents import DocumentRepository
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def commit_changes(session: AsyncSession, changes: ChangeSet) -> None:
+    """Коммит записи и сброс ровно тех ключей кеша, которые от неё зависят.
+
+    Теги сбрасываются сразу после коммита и ещё раз через
+    CACHE_INVALIDATION_DELAY секунд — на случай параллельного вычисления,
+    прочитавшего данные до коммита. Документы read-model обновляются
+    в той же транзакции, что и данные.
+    """
+    if settings.ORGANIZATION_DOCUMENTS_ENABLED and (changes.organization_ids or changes.building_ids):
+        await session.flush()
+        await DocumentRepository(session).refresh(changes.organization_ids, changes.building_ids)
+    await session.commit()
+    tags = tags_for_changes(changes)
+    invalidated = await response_cache.invalidate_tags(tags)
+    response_cache.invalidate_tags_later(tags, settings.CACHE_INVALIDATION_DELAY)
+    logger.debug("Invalidated %d cache keys for tags %s", invalidated, sorted(tags))
@@ -0,0 +1,38 @@
+"""Сравнение двух прогонов benchmarks.run.
+
+Запуск:
+    python -m benchmarks.compare baseline.json candidate.json --metric p95_ms
+"""
+import argparse
+import json
+from typing import Dict, Iterator, Tuple
+
+
+def operations(report: Dict) -> Iterator[Tuple[str, str, Dict]]:
+    for mode, scenarios in report["results"].items():
+        for operations in scenarios.values():
+            for name, result in operations.items():
+                yield mode, name, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Сравнение результатов двух прогонов")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--metric", default="p95_ms", choices=["rps", "mean_ms", "p50_ms", "p95_ms", "p99_ms"])
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = {(mode, name): r for mode, name, r in operations(json.load(f))}
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = {(mode, name): r for mode, name, r in operations(json.load(f))}
+
+    print(f"{'mode':<10} {'operation':<26} {'baseline':>10} {'candidate':>10} {'change':>8}")
+    for key in sorted(baseline.keys() & candidate.keys()):
+        old, new = baseline[key][args.metric], candidate[key][args.metric]
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"{key[0]:<10} {key[1]:<26} {old:>10} {new:>10} {change:>8}")
+
+
+if __name__ == "__main__":
+    main()
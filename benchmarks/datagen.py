@@ -0,0 +1,177 @@
+"""Генератор синтетического справочника для бенчмарков.
+
+Один и тот же seed и масштаб всегда дают одинаковые данные:
+    activities.csv       — дерево видов деятельности из трёх уровней
+    organizations.ndjson — организации в формате выгрузки /export
+                           (здание, телефоны, виды деятельности в строке)
+    manifest.json        — параметры генерации и выборки для нагрузки
+
+Здания сгруппированы вокруг городов, популярность зданий и видов
+деятельности распределена неравномерно (несколько очень крупных
+выборок и длинный хвост мелких), как в реальном справочнике.
+
+Запуск:
+    python -m benchmarks.datagen --organizations 100000 --seed 42 --output-dir bench_data
+"""
+import argparse
+import csv
+import json
+import os
+import random
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Tuple
+
+CITIES = [
+    ("Москва", 55.7558, 37.6173, 0.12),
+    ("Санкт-Петербург", 59.9343, 30.3351, 0.10),
+    ("Новосибирск", 55.0084, 82.9357, 0.08),
+    ("Екатеринбург", 56.8389, 60.6057, 0.07),
+    ("Казань", 55.7964, 49.1088, 0.06),
+    ("Нижний Новгород", 56.3269, 44.0059, 0.06),
+    ("Сочи", 43.5855, 39.7231, 0.05),
+    ("Владивосток", 43.1155, 131.8855, 0.05),
+]
+# Доля зданий по городам: столицы крупнее
+CITY_WEIGHTS = [40, 20, 8, 8, 8, 6, 5, 5]
+
+STREETS = [
+    "Ленина", "Мира", "Советская", "Садовая", "Лесная", "Школьная", "Центральная", "Молодёжная",
+    "Набережная", "Гагарина", "Пушкина", "Заводская", "Полевая", "Строителей", "Победы", "Кирова",
+]
+
+CATEGORIES = {
+    "Еда": ["Мясная продукция", "Молочная продукция", "Выпечка", "Напитки", "Кондитерские изделия", "Бакалея"],
+    "Автомобили": ["Грузовые", "Легковые", "Запчасти", "Шиномонтаж", "Автомойки", "Аксессуары"],
+    "Здоровье": ["Аптеки", "Стоматология", "Клиники", "Лаборатории", "Оптика", "Массаж"],
+    "Образование": ["Школы", "Курсы", "Репетиторы", "Детские сады", "Языки", "Музыка"],
+    "Строительство": ["Материалы", "Отделка", "Сантехника", "Электрика", "Кровля", "Окна"],
+    "Услуги": ["Ремонт техники", "Химчистка", "Ателье", "Клининг", "Доставка", "Фотостудии"],
+    "Спорт": ["Фитнес", "Бассейны", "Единоборства", "Йога", "Инвентарь", "Секции"],
+    "Красота": ["Парикмахерские", "Маникюр", "Косметология", "Барбершопы", "Солярии", "Спа"],
+}
+SUBTOPICS = ["опт", "розница", "премиум", "эконом", "сеть", "частные"]
+
+NAME_FORMS = ["ООО", "ИП", "АО", "ЗАО"]
+NAME_WORDS = [
+    "Альфа", "Вектор", "Гранит", "Северный", "Дельта", "Восток", "Звезда", "Лидер", "Меридиан",
+    "Орион", "Полярный", "Радуга", "Сфера", "Тайга", "Феникс", "Эталон", "Янтарь", "Родник",
+    "Кедр", "Маяк", "Парус", "Арсенал", "Престиж", "Гармония", "Ветер", "Заря", "Исток",
+]
+
+
+@dataclass
+class Scale:
+    organizations: int
+    organizations_per_building: float = 3.0
+
+    @property
+    def buildings(self) -> int:
+        return max(1, int(self.organizations / self.organizations_per_building))
+
+
+def skewed_index(rng: random.Random, n: int, power: float = 3.0) -> int:
+    """Индекс от 0 до n-1 с тяжёлой головой: маленькие индексы выпадают чаще"""
+    return min(n - 1, int(n * rng.random() ** power))
+
+
+def generate_activities() -> List[Tuple[int, str, str, int, int]]:
+    """Дерево видов деятельности: (id, name, category, parent_id, level)"""
+    rows = []
+    next_id = 1
+    for category, subcategories in CATEGORIES.items():
+        root_id = next_id
+        rows.append((root_id, category, category, None, 1))
+        next_id += 1
+        for subcategory in subcategories:
+            sub_id = next_id
+            rows.append((sub_id, subcategory, category, root_id, 2))
+            next_id += 1
+            for topic in SUBTOPICS:
+                rows.append((next_id, f"{subcategory} ({topic})", category, sub_id, 3))
+                next_id += 1
+    return rows
+
+
+def generate_buildings(rng: random.Random, count: int) -> Iterator[Dict]:
+    for building_id in range(1, count + 1):
+        city, lat, lon, spread = rng.choices(CITIES, weights=CITY_WEIGHTS)[0]
+        yield {
+            "id": building_id,
+            "address": f"г. {city}, ул. {rng.choice(STREETS)}, д. {building_id}",
+            "latitude": round(rng.gauss(lat, spread), 6),
+            "longitude": round(rng.gauss(lon, spread * 1.6), 6),
+        }
+
+
+def generate_organizations(rng: random.Random, scale: Scale, activities: List[Tuple]) -> Iterator[Dict]:
+    buildings = list(generate_buildings(rng, scale.buildings))
+    leaves = [row[0] for row in activities if row[4] == 3]
+    middles = [row[0] for row in activities if row[4] == 2]
+    rng.shuffle(leaves)
+
+    for org_id in range(1, scale.organizations + 1):
+        building = buildings[skewed_index(rng, len(buildings), power=1.5)]
+        activity_ids = {leaves[skewed_index(rng, len(leaves))] for _ in range(rng.randint(1, 3))}
+        if rng.random() < 0.1:
+            activity_ids.add(rng.choice(middles))
+        yield {
+            "id": org_id,
+            "name": f"{rng.choice(NAME_FORMS)} \"{rng.choice(NAME_WORDS)} {rng.choice(NAME_WORDS)}\"",
+            "building_id": building["id"],
+            "building": building,
+            "phones": [{"number": f"+7-{org_id:010d}-{k}"} for k in range(rng.randint(1, 3))],
+            "activities": [{"id": activity_id} for activity_id in sorted(activity_ids)],
+        }
+
+
+def generate(output_dir: str, scale: Scale, seed: int) -> Dict:
+    """Запись набора данных в output_dir; возвращает манифест"""
+    os.makedirs(output_dir, exist_ok=True)
+    rng = random.Random(seed)
+    activities = generate_activities()
+
+    with open(os.path.join(output_dir, "activities.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "category", "parent_id", "level"])
+        writer.writerows(activities)
+
+    with open(os.path.join(output_dir, "organizations.ndjson"), "w", encoding="utf-8") as f:
+        for doc in generate_organizations(rng, scale, activities):
+            f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+
+    manifest = {
+        "seed": seed,
+        "organizations": scale.organizations,
+        "buildings": scale.buildings,
+        "activities": len(activities),
+        "activity_ids_by_level": {
+            str(level): [row[0] for row in activities if row[4] == level] for level in (1, 2, 3)
+        },
+        "activity_names": sorted({row[1] for row in activities}),
+        "name_words": NAME_WORDS,
+        "cities": [{"name": name, "latitude": lat, "longitude": lon} for name, lat, lon, _ in CITIES],
+    }
+    with open(os.path.join(output_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def load_manifest(output_dir: str) -> Dict:
+    with open(os.path.join(output_dir, "manifest.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Генерация синтетического справочника")
+    parser.add_argument("--organizations", type=int, default=100_000)
+    parser.add_argument("--organizations-per-building", type=float, default=3.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output-dir", default="bench_data")
+    args = parser.parse_args()
+    manifest = generate(args.output_dir, Scale(args.organizations, args.organizations_per_building), args.seed)
+    print(f"{manifest['organizations']} organizations, {manifest['buildings']} buildings, "
+          f"{manifest['activities']} activities -> {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
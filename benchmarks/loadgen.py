@@ -0,0 +1,296 @@
+"""Нагрузочные сценарии для эндпоинтов /api/organizations и их прогон.
+
+Каждый сценарий — одна итерация пользователя: один или несколько HTTP-
+запросов с параметрами из манифеста набора данных. Параметры выбираются
+из генератора с фиксированным seed на воркер, поэтому набор запросов
+повторяется от прогона к прогону. Выбор id неравномерный: популярные
+здания и организации запрашиваются чаще, как в живом трафике.
+"""
+import asyncio
+import itertools
+import math
+import random
+import time
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.datagen import skewed_index
+
+Sample = Tuple[str, float, bool]  # (операция, секунды, успех)
+Scenario = Callable[[httpx.AsyncClient, random.Random, Dict], Awaitable[List[Sample]]]
+
+API = "/api/organizations"
+
+
+async def timed(client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs) -> Tuple[Sample, httpx.Response]:
+    started = time.perf_counter()
+    response = await client.request(method, url, **kwargs)
+    await response.aread()
+    elapsed = time.perf_counter() - started
+    return (name, elapsed, response.status_code < 400), response
+
+
+def point(rng: random.Random, manifest: Dict) -> Tuple[float, float]:
+    city = manifest["cities"][skewed_index(rng, len(manifest["cities"]), power=1.5)]
+    return city["latitude"] + rng.gauss(0, 0.05), city["longitude"] + rng.gauss(0, 0.08)
+
+
+def org_id(rng: random.Random, manifest: Dict) -> int:
+    return 1 + skewed_index(rng, manifest["organizations"])
+
+
+def activity_id(rng: random.Random, manifest: Dict) -> int:
+    level = rng.choices(["1", "2", "3"], weights=[1, 3, 6])[0]
+    ids = manifest["activity_ids_by_level"][level]
+    return ids[skewed_index(rng, len(ids), power=2)]
+
+
+async def in_building(client, rng, manifest):
+    building_id = 1 + skewed_index(rng, manifest["buildings"], power=1.5)
+    sample, _ = await timed(client, "in_building", "GET", f"{API}/in_building/{building_id}")
+    return [sample]
+
+
+async def by_activity(client, rng, manifest):
+    sample, _ = await timed(client, "by_activity", "GET", f"{API}/by_activity/{activity_id(rng, manifest)}",
+                            params={"limit": 100})
+    return [sample]
+
+
+async def in_rect(client, rng, manifest):
+    lat, lon = point(rng, manifest)
+    size = rng.choice([0.005, 0.02, 0.05])
+    params = {
+        "lat1": round(lat - size, 4), "lon1": round(lon - size, 4),
+        "lat2": round(lat + size, 4), "lon2": round(lon + size, 4),
+    }
+    name = "in_rect"
+    if rng.random() < 0.3:
+        params["include"] = "organizations"
+        name = "in_rect_with_organizations"
+    sample, _ = await timed(client, name, "GET", f"{API}/in_rect", params=params)
+    return [sample]
+
+
+async def clusters(client, rng, manifest):
+    lat, lon = point(rng, manifest)
+    # Город целиком, район, квартал
+    zoom, size = rng.choice([(10, 0.3), (13, 0.04), (16, 0.005)])
+    params = {
+        "lat1": round(lat - size, 4), "lon1": round(lon - size, 4),
+        "lat2": round(lat + size, 4), "lon2": round(lon + size, 4),
+        "zoom": zoom,
+    }
+    sample, _ = await timed(client, "clusters", "GET", f"{API}/clusters", params=params)
+    return [sample]
+
+
+async def facets(client, rng, manifest):
+    lat, lon = point(rng, manifest)
+    size = rng.choice([0.02, 0.1, 0.5])
+    sample, _ = await timed(client, "facets", "GET", f"{API}/facets", params={
+        "lat1": round(lat - size, 4), "lon1": round(lon - size, 4),
+        "lat2": round(lat + size, 4), "lon2": round(lon + size, 4),
+    })
+    return [sample]
+
+
+async def filtered(client, rng, manifest):
+    lat, lon = point(rng, manifest)
+    size = rng.choice([0.02, 0.1, 0.5])
+    params = {
+        "activity_id": activity_id(rng, manifest),
+        "lat1": round(lat - size, 4), "lon1": round(lon - size, 4),
+        "lat2": round(lat + size, 4), "lon2": round(lon + size, 4),
+    }
+    if rng.random() < 0.3:
+        params["name"] = rng.choice(manifest["name_words"])
+    sample, _ = await timed(client, "filter", "GET", f"{API}/filter", params=params)
+    return [sample]
+
+
+async def near(client, rng, manifest):
+    lat, lon = point(rng, manifest)
+    sample, _ = await timed(client, "near", "GET", f"{API}/near", params={
+        "lat": round(lat, 3), "lon": round(lon, 3), "radius": rng.choice([500, 1000, 3000])
+    })
+    return [sample]
+
+
+async def nearest(client, rng, manifest):
+    lat, lon = point(rng, manifest)
+    sample, _ = await timed(client, "nearest", "GET", f"{API}/nearest", params={
+        "lat": round(lat, 3), "lon": round(lon, 3), "limit": 10
+    })
+    return [sample]
+
+
+async def export(client, rng, manifest):
+    # Выгрузка одного листового вида деятельности — полный справочник слишком долог для цикла
+    leaf = rng.choice(manifest["activity_ids_by_level"]["3"])
+    sample, _ = await timed(client, "export", "GET", f"{API}/export", params={"activity_id": leaf})
+    return [sample]
+
+
+async def batch(client, rng, manifest):
+    ids = [org_id(rng, manifest) for _ in range(20)]
+    sample, _ = await timed(client, "batch", "GET", f"{API}/batch", params=[("ids", i) for i in ids])
+    return [sample]
+
+
+async def organization(client, rng, manifest):
+    sample, _ = await timed(client, "organization", "GET", f"{API}/{org_id(rng, manifest)}")
+    return [sample]
+
+
+async def search_by_activity_name(client, rng, manifest):
+    name = rng.choice(manifest["activity_names"]).split(" (")[0]
+    sample, _ = await timed(client, "search_by_activity_name", "GET", f"{API}/search/by_activity_name", params={
+        "activity_name": name, "fuzzy": str(rng.random() < 0.3).lower()
+    })
+    return [sample]
+
+
+async def search_by_name(client, rng, manifest):
+    word = rng.choice(manifest["name_words"])
+    sample, _ = await timed(client, "search_by_name", "GET", f"{API}/search/by_name/{word}", params={
+        "fuzzy": str(rng.random() < 0.3).lower()
+    })
+    return [sample]
+
+
+async def search(client, rng, manifest):
+    lat, lon = point(rng, manifest)
+    params = {"activity_id": activity_id(rng, manifest), "lat": round(lat, 3), "lon": round(lon, 3),
+              "radius": rng.choice([1000, 3000, 10000])}
+    if rng.random() < 0.5:
+        params["name"] = rng.choice(manifest["name_words"])
+    sample, _ = await timed(client, "search", "GET", f"{API}/search", params=params)
+    return [sample]
+
+
+_write_counter = itertools.count()
+
+
+async def write_lifecycle(client, rng, manifest):
+    """Полный цикл записи: создание, изменение, телефоны, виды деятельности, удаление"""
+    samples = []
+    unique = f"{int(time.time())}-{next(_write_counter)}-{rng.randrange(10 ** 6)}"
+    activity = activity_id(rng, manifest)
+    sample, response = await timed(client, "create_organization", "POST", API, json={
+        "name": f"ООО \"Нагрузка {unique}\"",
+        "building_id": 1 + skewed_index(rng, manifest["buildings"]),
+        "phones": [f"+7-bench-{unique}"],
+        "activity_ids": [activity],
+    })
+    samples.append(sample)
+    if not sample[2]:
+        return samples
+    new_id = response.json()["id"]
+
+    steps = [
+        ("update_organization", "PATCH", f"{API}/{new_id}", {"json": {"name": f"ООО \"Нагрузка {unique} 2\""}}),
+        ("add_phone", "POST", f"{API}/{new_id}/phones", {"json": {"number": f"+7-bench-{unique}-2"}}),
+        ("link_activity", "PUT", f"{API}/{new_id}/activities/{activity_id(rng, manifest)}", {}),
+        ("unlink_activity", "DELETE", f"{API}/{new_id}/activities/{activity}", {}),
+    ]
+    for name, method, url, kwargs in steps:
+        sample, response = await timed(client, name, method, url, **kwargs)
+        samples.append(sample)
+        if name == "add_phone" and sample[2]:
+            phone_id = response.json()["id"]
+            sample, _ = await timed(client, "delete_phone", "DELETE", f"{API}/{new_id}/phones/{phone_id}")
+            samples.append(sample)
+
+    sample, _ = await timed(client, "delete_organization", "DELETE", f"{API}/{new_id}")
+    samples.append(sample)
+    return samples
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "in_building": in_building,
+    "by_activity": by_activity,
+    "in_rect": in_rect,
+    "clusters": clusters,
+    "facets": facets,
+    "filter": filtered,
+    "near": near,
+    "nearest": nearest,
+    "export": export,
+    "batch": batch,
+    "organization": organization,
+    "search_by_activity_name": search_by_activity_name,
+    "search_by_name": search_by_name,
+    "search": search,
+    "write_lifecycle": write_lifecycle,
+}
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Перцентиль методом ближайшего ранга"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples: List[Sample], wall: float) -> Dict[str, Dict]:
+    by_name: Dict[str, List[Sample]] = defaultdict(list)
+    for sample in samples:
+        by_name[sample[0]].append(sample)
+
+    result = {}
+    for name, items in by_name.items():
+        latencies = sorted(item[1] * 1000 for item in items)
+        result[name] = {
+            "requests": len(items),
+            "errors": sum(1 for item in items if not item[2]),
+            "rps": round(len(items) / wall, 1) if wall else 0.0,
+            "mean_ms": round(sum(latencies) / len(latencies), 2),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "max_ms": round(latencies[-1], 2),
+        }
+    return result
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    manifest: Dict,
+    iterations: int,
+    concurrency: int,
+    seed: int,
+    warmup: int = 0
+) -> Dict[str, Dict]:
+    """Прогон сценария iterations раз в concurrency параллельных воркерах.
+
+    Прогрев идёт с другим seed: в кеш попадают популярные ключи, но не
+    ровно те запросы, что будут замерены.
+    """
+    samples: List[Sample] = []
+
+    async def worker(counter, total: int, rng: random.Random, sink: Optional[List[Sample]]):
+        while next(counter) < total:
+            try:
+                result = await scenario(client, rng, manifest)
+            except httpx.HTTPError:
+                result = [("transport_error", 0.0, False)]
+            if sink is not None:
+                sink.extend(result)
+
+    if warmup:
+        counter = itertools.count()
+        await asyncio.gather(*(
+            worker(counter, warmup, random.Random(f"warmup-{seed}-{i}"), None) for i in range(concurrency)
+        ))
+
+    counter = itertools.count()
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        worker(counter, iterations, random.Random(f"{seed}-{i}"), samples) for i in range(concurrency)
+    ))
+    return summarize(samples, time.perf_counter() - started)
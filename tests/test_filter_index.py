@@ -0,0 +1,64 @@
+from app.repository.filter_index import FilterSnapshot
+from app.repository.spatial import grid_cell
+from collections import namedtuple
+import random
+
+Row = namedtuple("Row", "id name grid_cell latitude longitude")
+
+WORDS = ["Рога", "Копыта", "Мясной", "Двор", "Молоко", "Авто", "Сервис", "Аптека", "Книги", "Цветы"]
+
+
+def make_snapshot(size=2000, seed=1):
+    rng = random.Random(seed)
+    rows, links = [], []
+    for org_id in range(1, size + 1):
+        lat, lon = 55.7 + rng.random() * 0.1, 37.5 + rng.random() * 0.2
+        name = " ".join(rng.sample(WORDS, 2))
+        rows.append(Row(org_id, name, grid_cell(lat, lon), lat, lon))
+        links.append((org_id, rng.choice([2, 3])))
+    subtrees = {1: (1, 2, 3), 2: (2,), 3: (3,)}
+    return FilterSnapshot.build(rows, links, subtrees), rows, dict(links)
+
+
+def collect(snapshot, limit, **filters):
+    """Все ID по страницам через ключ курсора"""
+    found, after = [], None
+    while True:
+        ids, after = snapshot.filter(after=after, limit=limit, **filters)
+        found.extend(ids)
+        if after is None:
+            return found
+
+
+def test_name_filter_matches_brute_force():
+    snapshot, rows, _ = make_snapshot()
+    for term in ["двор", "Рога Ко", "о", "ки", "zq", "Аптекарь"]:
+        expected = {row.id for row in rows if term.lower() in row.name.lower()}
+        found = collect(snapshot, 50, activity_id=None, rect=None, name=term)
+        assert set(found) == expected
+        assert len(found) == len(expected)
+
+
+def test_rare_and_short_names_respect_candidate_cap():
+    snapshot, rows, _ = make_snapshot()
+    # Нет ни одного совпадения: каждый вызов проверяет не больше 100 кандидатов
+    ids, after = snapshot.filter(None, None, "zq", None, 20, max_candidates=100)
+    assert ids == [] and after is not None
+    assert collect(snapshot, 20, activity_id=None, rect=None, name="zq", max_candidates=100) == []
+
+    expected = [row.id for row in rows if "ки" in row.name.lower()]
+    found = collect(snapshot, 20, activity_id=None, rect=None, name="ки", max_candidates=100)
+    assert sorted(found) == sorted(expected)
+
+
+def test_combined_filters():
+    snapshot, rows, links = make_snapshot()
+    rect = (55.72, 37.55, 55.76, 37.6)
+    expected = {
+        row.id for row in rows
+        if links[row.id] == 2 and "авто" in row.name.lower()
+        and rect[0] <= row.latitude <= rect[2] and rect[1] <= row.longitude <= rect[3]
+    }
+    assert set(collect(snapshot, 7, activity_id=2, rect=rect, name="Авто")) == expected
+    assert len(collect(snapshot, 100, activity_id=1, rect=None, name=None)) == len(rows)
+    assert collect(snapshot, 10, activity_id=99, rect=None, name=None) == []
@@ -0,0 +1,139 @@
+from app.repository.filter_index import FilterSnapshot, read_filter_columns
+from app.repository.snapshot import Snapshot, SnapshotRepository, SnapshotStore
+from app.repository.pagination import decode_cursor
+from app.repository.spatial import grid_cell
+from app.services.snapshot import FilterRow, write_snapshot
+from collections import namedtuple
+from datetime import datetime
+import os
+import pytest
+
+BuildingRow = namedtuple("BuildingRow", "id address latitude longitude grid_cell")
+OrganizationRow = namedtuple("OrganizationRow", "id name building_id created_at updated_at")
+PhoneRow = namedtuple("PhoneRow", "id organization_id number")
+ActivityRow = namedtuple("ActivityRow", "id name category parent_id level")
+
+BUILDINGS = [
+    BuildingRow(1, "г. Москва, ул. Ленина 1", 55.7558, 37.6173, grid_cell(55.7558, 37.6173)),
+    BuildingRow(5, "г. Казань, ул. Баумана 15", 55.7964, 49.1088, grid_cell(55.7964, 49.1088)),
+]
+ACTIVITIES = [
+    ActivityRow(1, "Еда", "Еда", None, 1),
+    ActivityRow(2, "Мясная продукция", "Еда", 1, 2),
+    ActivityRow(3, "Молочная продукция", "Еда", 1, 2),
+    ActivityRow(7, "Автомобили", "Авто", None, 1),
+]
+
+
+def organizations(count):
+    """ID с пропусками, разное число телефонов и видов деятельности"""
+    rows, phones, links = [], [], []
+    for i in range(count):
+        org_id = 10 + i * 3
+        created = datetime(2024, 1, 1, 12, 0, 0, i)
+        rows.append(OrganizationRow(org_id, f"Организация №{i}", BUILDINGS[i % 2].id, created, created))
+        phones.extend(PhoneRow(org_id * 10 + p, org_id, f"+7-900-{org_id:03d}-{p:02d}") for p in range(i % 3))
+        links.extend((org_id, activity_id) for activity_id in ([1, 2] if i % 2 else [3]))
+    return rows, phones, links
+
+
+@pytest.fixture
+def repo(tmp_path):
+    rows, phones, links = organizations(25)
+    path = str(tmp_path / "snapshot.bin")
+    counts = write_snapshot(path, BUILDINGS, rows, phones, ACTIVITIES, links)
+    assert counts["organizations"] == 25 and counts["bytes"] == os.path.getsize(path)
+    return SnapshotRepository(Snapshot(path)), rows, phones, links
+
+
+def test_get_organization_round_trip(repo):
+    repo, rows, phones, links = repo
+    for row in rows:
+        org = repo.get_organization(row.id)
+        assert (org.id, org.name, org.building_id) == (row.id, row.name, row.building_id)
+        assert org.created_at == row.created_at and org.updated_at == row.updated_at
+        building = next(b for b in BUILDINGS if b.id == row.building_id)
+        assert org.building == (building.id, building.address, building.latitude, building.longitude)
+        assert [(p.id, p.number) for p in org.phones] == [
+            (p.id, p.number) for p in phones if p.organization_id == row.id
+        ]
+        assert {a.id for a in org.activities} == {a for o, a in links if o == row.id}
+    meat = next(a for a in repo.get_organization(13).activities if a.id == 2)
+    assert (meat.name, meat.category, meat.parent_id, meat.level) == ("Мясная продукция", "Еда", 1, 2)
+
+
+def test_missing_ids(repo):
+    repo, rows, _, _ = repo
+    assert repo.get_organization(11) is None
+    assert repo.get_organization(10 ** 9) is None
+    assert [org.id for org in repo.get_organizations_by_ids([13, 11, 10])] == [13, 10]
+    assert repo.get_organizations_by_activity(999, 10).items == []
+    assert repo.get_organizations_in_building(999, 10).items == []
+
+
+def test_activity_pagination_includes_subtree_once(repo):
+    repo, rows, _, links = repo
+    found, cursor = [], None
+    while True:
+        page = repo.get_organizations_by_activity(1, 4, cursor)
+        assert len(page.items) <= 4
+        found.extend(org.id for org in page.items)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+        assert decode_cursor(cursor, int) == (found[-1],)
+    # Организации связаны и с корнем, и с потомком — каждая ровно один раз
+    assert found == sorted({o for o, _ in links})
+
+    dairy = repo.get_organizations_by_activity(3, 100)
+    assert [org.id for org in dairy.items] == [o for o, a in links if a == 3]
+    building = repo.get_organizations_in_building(5, 100)
+    assert [org.id for org in building.items] == [row.id for row in rows if row.building_id == 5]
+
+
+def test_filter_index_from_snapshot_matches_built_one(tmp_path):
+    rows, phones, links = organizations(200)
+    path = str(tmp_path / "snapshot.bin")
+    write_snapshot(path, BUILDINGS, rows, phones, ACTIVITIES, links)
+    shared = FilterSnapshot(read_filter_columns(Snapshot(path)))
+
+    buildings = {b.id: b for b in BUILDINGS}
+    filter_rows = []
+    for row in rows:
+        building = buildings[row.building_id]
+        filter_rows.append(FilterRow(row.id, row.name, building.grid_cell, building.latitude, building.longitude))
+    local = FilterSnapshot.build(filter_rows, links, {1: (1, 2, 3), 2: (2,), 3: (3,), 7: (7,)})
+    assert shared.sparse and shared.dense
+    moscow = (55.7, 37.5, 55.8, 37.7)
+    for activity_id, rect, name in [
+        (None, None, None), (1, None, None), (2, None, "№1"), (None, moscow, None), (3, moscow, "ЦИЯ №"), (7, None, None)
+    ]:
+        after, pages = None, 0
+        while True:
+            page = shared.filter(activity_id, rect, name, after, 30)
+            assert page == local.filter(activity_id, rect, name, after, 30)
+            ids, after = page
+            pages += 1
+            if after is None:
+                break
+        assert pages > 1 or activity_id == 7
+
+
+def test_store_swaps_to_published_file(tmp_path):
+    rows, phones, links = organizations(3)
+    path = str(tmp_path / "snapshot.bin")
+    store = SnapshotStore(path, check_interval=0)
+    assert store.current() is None
+
+    write_snapshot(path, BUILDINGS, rows, phones, ACTIVITIES, links)
+    first = store.current()
+    assert first.organizations == 3
+
+    rows, phones, links = organizations(5)
+    write_snapshot(path, BUILDINGS, rows, phones, ACTIVITIES, links)
+    assert store.current().organizations == 5
+    assert SnapshotRepository(first).get_organization(10).name == "Организация №0"
+
+    with open(path, "wb") as f:
+        f.write(b"garbage")
+    assert store.current().organizations == 5